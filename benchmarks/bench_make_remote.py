@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""Measure the rows/second of make_remote_catalog.
+
+Usage:
+python bench_make_remote.py
+    [--rows <n>]
+    [--repeat <n>]
+    [--catalog_data <reference/zarr-glade>]
+    [--dir <directory>]
+
+Notes:
+- a synthetic {dataset_id}-posix catalog is written in csv and parquet
+  (csv_and_json / parquet output formats) and the https and osdf copies are
+  made from it; the best of --repeat runs is reported for each format.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'generator'))
+import remote_catalog
+from catalog_writer import CatalogWriter, ParquetCatalogWriter
+
+
+FORMATS = {
+    'csv_and_json': ('csv', CatalogWriter),
+    'parquet': ('parquet', ParquetCatalogWriter),
+}
+
+
+def get_parser():
+    """Creates and returns the argparse parser."""
+    parser = argparse.ArgumentParser(description='Benchmark make_remote_catalog of remote_catalog.py.')
+    parser.add_argument('--rows', type=int, default=200000, help='Number of catalog rows.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs per format.')
+    parser.add_argument('--catalog_data', default='reference', choices=['reference', 'zarr-glade'],
+                        help='Catalog data type (reference also renames basenames).')
+    parser.add_argument('--dir', default=None, help='Directory for the catalogs (temporary by default).')
+    return parser
+
+
+def iter_rows(nrows):
+    """Synthetic catalog rows."""
+    start = np.datetime64('2000-01-01T00:00:00')
+    for i in range(nrows):
+        yield {
+            'path': f'/glade/campaign/collections/gdex/data/d000000/{i // 100}/file.{i}.json',
+            'variable': f'var{i % 100}',
+            'format': 'reference',
+            'long_name': f'variable {i % 100}, level {i % 7}',
+            'units': 'K',
+            'start_time': start + np.timedelta64(i, 'h'),
+            'end_time': start + np.timedelta64(i + 6, 'h'),
+            'frequency': np.timedelta64(1, 'h'),
+        }
+
+
+def time_format(directory, output_format, nrows, catalog_data, repeat):
+    """Best wall time of make_remote_catalog for an output format."""
+    ext, writer_class = FORMATS[output_format]
+    filename = os.path.join(directory, f'd000000-posix.{ext}')
+    writer = writer_class(filename)
+    writer.write_rows(iter_rows(nrows))
+    writer.close()
+    with open(os.path.join(directory, 'd000000-posix.json'), 'w') as fh:
+        json.dump({'catalog_file': f'd000000-posix.{ext}'}, fh)
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            remote_catalog.make_remote_catalog(filename, catalog_data=catalog_data, output_format=output_format)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(args_list):
+    args = get_parser().parse_args(args_list)
+    for output_format in FORMATS:
+        with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+            elapsed = time_format(directory, output_format, args.rows, args.catalog_data, args.repeat)
+        print(f'{output_format:>12}: {args.rows / elapsed:12.0f} rows/s ({elapsed:.3f} s for {args.rows} rows, 2 copies)')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
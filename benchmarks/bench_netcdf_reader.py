@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Compare the files/second of the xarray and native netCDF metadata readers.
+
+Usage:
+python bench_netcdf_reader.py
+    [--files <n>]
+    [--ntime <n>]
+    [--repeat <n>]
+    [--dir <directory>]
+
+Notes:
+- synthetic netCDF files are written to --dir (a temporary directory by
+  default). Point --dir to a Lustre/GPFS scratch directory to measure the
+  per file open cost of a parallel file system.
+- every file is parsed with create_catalog.file_parser for each reader and
+  the best of --repeat runs is reported.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'generator'))
+import create_catalog
+from fixtures import write_netcdf_files
+
+
+READERS = ['xarray', 'native']
+
+
+def get_parser():
+    """Creates and returns the argparse parser."""
+    parser = argparse.ArgumentParser(description='Benchmark the netCDF metadata readers of create_catalog.py.')
+    parser.add_argument('--files', type=int, default=50, help='Number of synthetic files.')
+    parser.add_argument('--ntime', type=int, default=1000, help='Length of the time axis of each file.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs per reader.')
+    parser.add_argument('--dir', default=None, help='Directory for the synthetic files (temporary by default).')
+    return parser
+
+
+def time_reader(paths, reader, repeat):
+    """Best wall time to parse all paths with a reader.
+
+    Returns:
+        (float, list): seconds and catalog rows of the last run.
+    """
+    best = None
+    for _ in range(repeat):
+        create_catalog.DECODE_POLICY_CACHE.clear()
+        start = time.perf_counter()
+        # silence the per file progress messages
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            rows = [create_catalog.file_parser(path, use_cftime=True, reader=reader) for path in paths]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def main(args_list):
+    args = get_parser().parse_args(args_list)
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        paths = write_netcdf_files(directory, args.files, ntime=args.ntime)
+        results = {}
+        for reader in READERS:
+            results[reader] = time_reader(paths, reader, args.repeat)
+
+    if results['native'][1] != results['xarray'][1]:
+        print('Warning: native and xarray readers produced different rows')
+    for reader in READERS:
+        elapsed = results[reader][0]
+        print(f'{reader:>8}: {args.files / elapsed:10.1f} files/s ({elapsed:.3f} s for {args.files} files)')
+    print(f' speedup: {results["xarray"][0] / results["native"][0]:.2f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
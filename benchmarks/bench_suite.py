@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+"""Catalog build benchmark suite on synthetic collections.
+
+Measures:
+- file_parser: files/second of create_catalog.file_parser for every
+  format and reader,
+- create_catalog: end-to-end seconds and peak memory (max RSS) of a
+  csv_and_json build, run in a fresh process,
+- make_remote_catalog: rows/second of the remote copies of a csv and a
+  parquet catalog (see bench_make_remote.py).
+
+Usage:
+python bench_suite.py
+    [--files <n>]
+    [--variables <n>]
+    [--ntime <n>]
+    [--formats <format> ...]
+    [--readers <xarray/native> ...]
+    [--workers <n>]
+    [--rows <n>]
+    [--repeat <n>]
+    [--benchmarks <file_parser/create_catalog/make_remote_catalog> ...]
+    [--dir <directory>]
+    [--output <json file>]
+    [--compare <json file>]
+    [--tolerance <fraction>]
+
+Notes:
+- the collections are written by fixtures.py to --dir (a temporary
+  directory by default): netcdf, zarr2, zarr3, reference-json and
+  reference-parquet. create_catalog crawls the collection directory, which
+  finds netCDF and JSON files and consolidated zarr v2 stores, the other
+  formats are only measured with file_parser.
+- the results are written to --output as json ({commit, created, config,
+  results: {benchmark/format[/reader]: metrics}}), a failing benchmark is
+  recorded as {error: message}. --compare prints the
+  ratio of every metric to a previous output and exits with status 1 when
+  one is worse by more than --tolerance (e.g. 0.2 for 20%).
+
+Example:
+python bench_suite.py --files 50 --output bench-$(git rev-parse --short HEAD).json
+python bench_suite.py --files 50 --compare bench-1ee9ab5.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import tempfile
+import resource
+import subprocess
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'generator'))
+import create_catalog
+import remote_catalog
+import bench_make_remote
+from fixtures import FORMATS, write_collection
+
+
+BENCHMARKS = ['file_parser', 'create_catalog', 'make_remote_catalog']
+
+READERS = ['xarray', 'native']
+
+# formats found by the create_catalog crawler
+CRAWLED_FORMATS = ['netcdf', 'zarr2', 'reference-json']
+
+# metrics compared with --compare, True when higher is better
+METRICS = {
+    'files_per_second': True,
+    'rows_per_second': True,
+    'seconds': False,
+    'peak_rss_mb': False,
+}
+
+
+def get_parser():
+    """Creates and returns the argparse parser."""
+    parser = argparse.ArgumentParser(description='Benchmark catalog builds on synthetic collections.')
+    parser.add_argument('--files', type=int, default=20, help='Number of files/stores per collection.')
+    parser.add_argument('--variables', type=int, default=5, help='Number of variables per file.')
+    parser.add_argument('--ntime', type=int, default=1000, help='Length of the time axis of each file.')
+    parser.add_argument('--formats', nargs='+', default=list(FORMATS), choices=list(FORMATS),
+                        help='Collection formats.')
+    parser.add_argument('--readers', nargs='+', default=READERS, choices=READERS,
+                        help='Metadata readers of file_parser and create_catalog.')
+    parser.add_argument('--workers', type=int, default=1, help='--workers of create_catalog.')
+    parser.add_argument('--rows', type=int, default=200000, help='Number of catalog rows of make_remote_catalog.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best one is kept.')
+    parser.add_argument('--benchmarks', nargs='+', default=BENCHMARKS, choices=BENCHMARKS,
+                        help='Benchmarks to run.')
+    parser.add_argument('--dir', default=None, help='Directory for the collections (temporary by default).')
+    parser.add_argument('--output', default=None, help='Json file of the results.')
+    parser.add_argument('--compare', default=None, help='Json file of previous results to compare with.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Fraction a metric can get worse before --compare reports a regression.')
+    return parser
+
+
+def best_of(func, repeat):
+    """Best wall time of repeat calls of func (progress messages silenced).
+
+    Returns:
+        (float, object): seconds and result of the last call.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_file_parser(paths, parsing_kwargs, reader, repeat):
+    """files/second of file_parser on a collection."""
+    def parse():
+        create_catalog.DECODE_POLICY_CACHE.clear()
+        return [create_catalog.file_parser(path, reader=reader, **parsing_kwargs) for path in paths]
+
+    elapsed, entries = best_of(parse, repeat)
+    return {
+        'files': len(paths),
+        'rows': sum(len(items) for items in entries),
+        'seconds': elapsed,
+        'files_per_second': len(paths) / elapsed,
+    }
+
+
+def run_create_catalog(args_list, out):
+    """Run create_catalog.py in this (fresh) process.
+
+    Returns:
+        (float, float, int): seconds, max RSS in MB and number of catalog rows.
+    """
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        create_catalog.main(args_list)
+    elapsed = time.perf_counter() - start
+    # kilobytes on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    _, reader = remote_catalog.open_csv_strings(os.path.join(out, 'bench-posix.csv'))
+    nrows = sum(batch.num_rows for batch in reader)
+    return elapsed, peak_rss_mb, nrows
+
+
+def bench_create_catalog(collection, parsing_kwargs, reader, workers, repeat, directory):
+    """End-to-end seconds and peak memory of create_catalog on a collection."""
+    out = os.path.join(directory, 'catalog')
+    os.makedirs(out, exist_ok=True)
+    args_list = [
+        collection, '--data_format', parsing_kwargs['data_format'], '--out', out,
+        '--catalog_name', 'bench-posix', '--depth', '0', '--reader', reader, '--workers', str(workers)
+    ]
+    runs = []
+    # a fresh process per run so the peak memory is the one of the build
+    context = multiprocessing.get_context('spawn')
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            runs.append(pool.submit(run_create_catalog, args_list, out).result())
+    elapsed, peak_rss_mb, nrows = min(runs)
+    return {
+        'rows': nrows,
+        'seconds': elapsed,
+        'peak_rss_mb': max(run[1] for run in runs),
+    }
+
+
+def bench_make_remote_catalog(output_format, nrows, repeat, directory):
+    """rows/second of make_remote_catalog."""
+    elapsed = bench_make_remote.time_format(directory, output_format, nrows, 'reference', repeat)
+    return {'rows': nrows, 'seconds': elapsed, 'rows_per_second': nrows / elapsed}
+
+
+def run_benchmark(name, func, *args):
+    """Run a benchmark, a failure is recorded as its error message.
+
+    Returns:
+        dict: metrics, or {'error': message}.
+    """
+    try:
+        return func(*args)
+    except Exception as e:
+        print(f'{name:>40}: failed, {type(e).__name__}: {e}')
+        return {'error': f'{type(e).__name__}: {e}'}
+
+
+def get_commit():
+    """Current git commit of the repository, None outside of git."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args, directory):
+    """Run the selected benchmarks.
+
+    Returns:
+        dict: name (benchmark/format[/reader]) -> metrics.
+    """
+    results = {}
+    collections = {}
+    if 'file_parser' in args.benchmarks or 'create_catalog' in args.benchmarks:
+        for fmt in args.formats:
+            print(f'Writing the {fmt} collection ({args.files} files)')
+            collections[fmt] = write_collection(directory, fmt, args.files, args.variables, args.ntime)
+
+    if 'file_parser' in args.benchmarks:
+        for fmt, (_, paths) in collections.items():
+            for reader in args.readers:
+                name = f'file_parser/{fmt}/{reader}'
+                results[name] = run_benchmark(name, bench_file_parser, paths, FORMATS[fmt], reader, args.repeat)
+                if 'error' not in results[name]:
+                    print(f'{name:>40}: {results[name]["files_per_second"]:10.1f} files/s')
+
+    if 'create_catalog' in args.benchmarks:
+        for fmt, (collection, _) in collections.items():
+            if fmt not in CRAWLED_FORMATS:
+                continue
+            for reader in args.readers:
+                name = f'create_catalog/{fmt}/{reader}'
+                with tempfile.TemporaryDirectory(dir=directory) as build_dir:
+                    results[name] = run_benchmark(
+                        name, bench_create_catalog, collection, FORMATS[fmt], reader, args.workers, args.repeat, build_dir
+                    )
+                if 'error' not in results[name]:
+                    print(f'{name:>40}: {results[name]["seconds"]:10.3f} s, {results[name]["peak_rss_mb"]:.0f} MB')
+
+    if 'make_remote_catalog' in args.benchmarks:
+        for output_format in bench_make_remote.FORMATS:
+            name = f'make_remote_catalog/{output_format}'
+            with tempfile.TemporaryDirectory(dir=directory) as build_dir:
+                results[name] = run_benchmark(
+                    name, bench_make_remote_catalog, output_format, args.rows, args.repeat, build_dir
+                )
+            if 'error' not in results[name]:
+                print(f'{name:>40}: {results[name]["rows_per_second"]:10.0f} rows/s')
+    return results
+
+
+def compare_results(results, previous, tolerance):
+    """Print the ratio of every metric to previous results.
+
+    Args:
+        results (dict): name -> metrics.
+        previous (dict): name -> metrics of a previous run.
+        tolerance (float): fraction a metric can get worse.
+
+    Returns:
+        list(str): regressions (name and metric).
+    """
+    regressions = []
+    for name, metrics in results.items():
+        if name not in previous:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in metrics or not previous[name].get(metric):
+                continue
+            ratio = metrics[metric] / previous[name][metric]
+            worse = ratio < 1 - tolerance if higher_is_better else ratio > 1 + tolerance
+            if worse:
+                regressions.append(f'{name} {metric}')
+            print(f'{name:>40} {metric:>16}: {ratio:6.2f}x{"  REGRESSION" if worse else ""}')
+    return regressions
+
+
+def main(args_list):
+    args = get_parser().parse_args(args_list)
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        results = run_benchmarks(args, directory)
+
+    config = {key: value for key, value in vars(args).items() if key not in ('dir', 'output', 'compare', 'tolerance')}
+    output = {
+        'commit': get_commit(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': config,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(output, fh, indent=2)
+        print(f'Results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as fh:
+            previous = json.load(fh)
+        if previous.get('config') != config:
+            print(f'Warning: {args.compare} was run with another configuration')
+        print(f'Ratio to {args.compare} (commit {previous.get("commit")}):')
+        regressions = compare_results(results, previous['results'], args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} regressions: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
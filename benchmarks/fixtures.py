@@ -0,0 +1,122 @@
+"""Synthetic collections of the benchmarks.
+
+Every collection has --files datasets of --variables variables on a
+(time, lat, lon) grid of --ntime steps, one file per year of a noleap
+calendar, written as:
+- netcdf: netCDF4 files (bench_{year}.nc),
+- zarr2 / zarr3: consolidated zarr v2 / v3 stores (bench_{year}.zarr),
+- reference-json: kerchunk JSON references of the netCDF files (bench_{year}.json),
+- reference-parquet: kerchunk parquet references of the netCDF files (bench_{year}.parq).
+"""
+
+import os
+import json
+
+import numpy as np
+import xarray
+from kerchunk.hdf import SingleHdf5ToZarr
+from kerchunk.df import refs_to_dataframe
+
+
+# format -> create_catalog parsing arguments of the collection
+FORMATS = {
+    'netcdf': {'data_format': 'netcdf'},
+    'zarr2': {'data_format': 'zarr', 'zarr_format': 2},
+    'zarr3': {'data_format': 'zarr', 'zarr_format': 3},
+    'reference-json': {'data_format': 'reference'},
+    'reference-parquet': {'data_format': 'reference'},
+}
+
+
+def make_dataset(year, nvars, ntime):
+    """Synthetic dataset of a year."""
+    return xarray.Dataset(
+        {
+            f'var{j}': (('time', 'lat', 'lon'), np.zeros((ntime, 4, 8), dtype='f4'),
+                        {'units': 'K', 'long_name': f'variable {j}'})
+            for j in range(nvars)
+        },
+        coords={
+            'time': ('time', np.arange(ntime) * 6, {'units': f'hours since {year}-01-01', 'calendar': 'noleap'}),
+            'lat': ('lat', np.linspace(-90, 90, 4), {'units': 'degrees_north'}),
+            'lon': ('lon', np.linspace(0, 315, 8), {'units': 'degrees_east'}),
+        },
+        attrs={'title': 'benchmark file'},
+    )
+
+
+def write_netcdf_files(directory, nfiles, nvars=5, ntime=1000):
+    """Write nfiles netCDF files.
+
+    Returns:
+        list(str): paths of the files.
+    """
+    paths = []
+    for i in range(nfiles):
+        paths.append(os.path.join(directory, f'bench_{1900 + i}.nc'))
+        make_dataset(1900 + i, nvars, ntime).to_netcdf(paths[-1], encoding={'time': {'chunksizes': (1,)}})
+    return paths
+
+
+def write_zarr_stores(directory, nfiles, nvars=5, ntime=1000, zarr_format=2):
+    """Write nfiles consolidated zarr stores.
+
+    Returns:
+        list(str): paths of the stores.
+    """
+    paths = []
+    for i in range(nfiles):
+        paths.append(os.path.join(directory, f'bench_{1900 + i}.zarr'))
+        ds = make_dataset(1900 + i, nvars, ntime)
+        ds.to_zarr(paths[-1], zarr_format=zarr_format, consolidated=True, encoding={'time': {'chunks': (1,)}})
+    return paths
+
+
+def write_references(directory, netcdf_paths, parquet=False):
+    """Write the kerchunk references of netCDF files.
+
+    Returns:
+        list(str): paths of the JSON files / parquet directories.
+    """
+    paths = []
+    for netcdf_path in netcdf_paths:
+        refs = SingleHdf5ToZarr(netcdf_path, inline_threshold=0).translate()
+        base = os.path.join(directory, os.path.basename(netcdf_path)[:-len('.nc')])
+        if parquet:
+            paths.append(f'{base}.parq')
+            refs_to_dataframe(refs, paths[-1])
+        else:
+            paths.append(f'{base}.json')
+            with open(paths[-1], 'w') as fh:
+                json.dump(refs, fh)
+    return paths
+
+
+def write_collection(directory, fmt, nfiles, nvars=5, ntime=1000):
+    """Write a synthetic collection in its own directory.
+
+    Args:
+        directory (str): parent directory, the collection goes to {directory}/{fmt}.
+        fmt (str): format of FORMATS.
+        nfiles (int): number of files/stores.
+        nvars (int): number of variables per file.
+        ntime (int): length of the time axis.
+
+    Returns:
+        (str, list(str)): directory and asset paths of the collection.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported format {fmt}, expected one of {list(FORMATS)}')
+    collection = os.path.join(directory, fmt)
+    os.makedirs(collection, exist_ok=True)
+    if fmt == 'netcdf':
+        paths = write_netcdf_files(collection, nfiles, nvars, ntime)
+    elif fmt in ('zarr2', 'zarr3'):
+        paths = write_zarr_stores(collection, nfiles, nvars, ntime, zarr_format=FORMATS[fmt]['zarr_format'])
+    else:
+        # references point to netCDF files next to the collection
+        netcdf_dir = os.path.join(directory, f'{fmt}-data')
+        os.makedirs(netcdf_dir, exist_ok=True)
+        netcdf_paths = write_netcdf_files(netcdf_dir, nfiles, nvars, ntime)
+        paths = write_references(collection, netcdf_paths, parquet=fmt == 'reference-parquet')
+    return collection, paths
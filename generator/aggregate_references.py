@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+"""Combine the assets of every catalog group into one virtual reference.
+
+The catalogs aggregate the rows of a group (groupby_attrs, variable and
+short_name) with join_existing on time, so to_dataset_dict() opens every
+asset of a group and concatenates them on the client. This build stage
+writes one kerchunk reference per group instead: the references of the
+group assets (reference JSON files as they are, netCDF4/HDF5 files
+translated with kerchunk), reduced to the variable of the group and its
+coordinates and concatenated along time in start_time order. The
+aggregated_path column of the catalog points to the reference of the row
+group, one lightweight file per variable to open instead of thousands.
+
+Usage:
+
+python aggregate_references.py <json file>
+    [--out_dir <directory>]
+    [--concat_dim <dimension>]
+    [--workers <n>]
+    [--executor <thread/process>]
+    [--make_remote]
+    [--catalog_data <data>]
+    [--protocol_config <json string/filename>]
+    [--protocols <protocol>]
+
+Notes:
+- the references are written to --out_dir (default
+  {catalog directory}/{catalog_name}.aggregated/), one
+  {group values}.json file per group, and the catalog (csv or parquet) is
+  rewritten with the aggregated_path column. The search index of an
+  indexed catalog is written again (and for its remote copies).
+- --make_remote writes the remote copies of the catalog (see
+  remote_catalog.py) and of every reference, with the path prefix replaced
+  in the reference like in the catalog paths. The references must be
+  under the posix path prefix to get remote paths.
+- groups that can not be combined (e.g. no --concat_dim in the variable)
+  are reported and get an empty aggregated_path.
+
+Open a combined reference with:
+xarray.open_dataset('reference://', engine='zarr',
+    backend_kwargs={'consolidated': False, 'storage_options': {'fo': aggregated_path}})
+
+Example:
+python aggregate_references.py /lustre/desc1/scratch/chiaweih/d640000.jra3q/catalog/d640000-posix.json --workers 16 --make_remote
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+
+import fsspec
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from kerchunk.hdf import SingleHdf5ToZarr
+from kerchunk.combine import MultiZarrToZarr
+
+import remote_catalog
+from executor import map_ordered
+from catalog_index import build_index, index_file_of
+from reference_reader import is_parquet_reference
+from protocols import load_protocol_registry, get_remote_protocols
+
+
+# catalog column pointing to the reference of the row group
+AGGREGATED_COLUMN = 'aggregated_path'
+
+# chunks smaller than this many bytes are inlined in the references of netCDF files
+INLINE_THRESHOLD = 100
+
+# separator of the group values in a group key
+KEY_SEPARATOR = '\x1f'
+
+
+def read_groups(catalog_file, groupby_attrs):
+    """Read the assets of every group of a catalog in start_time order.
+
+    Args:
+        catalog_file (str): csv/parquet catalog.
+        groupby_attrs (list(str)): columns defining the groups.
+
+    Returns:
+        dict: group values -> asset paths (each path once).
+    """
+    columns = ['path'] + list(groupby_attrs) + ['start_time']
+    if catalog_file.endswith('.parquet'):
+        table = pq.read_table(catalog_file, columns=columns)
+    else:
+        _, reader = remote_catalog.open_csv_strings(catalog_file)
+        table = pa.Table.from_batches([batch.select(columns) for batch in reader])
+    table = table.sort_by([(column, 'ascending') for column in groupby_attrs + ['start_time', 'path']])
+    groups = {}
+    keys = zip(*(table.column(column).to_pylist() for column in groupby_attrs))
+    for key, path in zip(keys, table.column('path').to_pylist()):
+        paths = groups.setdefault(tuple('' if value is None else str(value) for value in key), [])
+        if not paths or paths[-1] != path:
+            paths.append(path)
+    return groups
+
+
+def load_references(path, data_format):
+    """Load the references of an asset.
+
+    Args:
+        path (str): asset path.
+        data_format (str): 'reference' (JSON references) or 'netcdf'
+            (netCDF4/HDF5 files, translated with kerchunk).
+
+    Returns:
+        dict: version 1 references.
+    """
+    if data_format == 'netcdf':
+        return SingleHdf5ToZarr(path, inline_threshold=INLINE_THRESHOLD).translate()
+    if data_format != 'reference':
+        raise ValueError(f'Unsupported data format {data_format}, only reference and netcdf assets are aggregated')
+    if is_parquet_reference(path):
+        raise ValueError(f'Parquet references are not aggregated: {path}')
+    with fsspec.open(path, 'rb') as fh:
+        references = json.load(fh)
+    if 'refs' not in references:
+        references = {'version': 1, 'refs': references}
+    return references
+
+
+def array_dims(refs, name):
+    """Dimensions of an array of references."""
+    attrs = refs.get(f'{name}/.zattrs', '{}')
+    attrs = json.loads(attrs) if isinstance(attrs, (str, bytes)) else attrs
+    return attrs.get('_ARRAY_DIMENSIONS', []), attrs.get('coordinates', '').split()
+
+
+def select_variable(references, variable):
+    """Reduce references to a variable and its coordinates.
+
+    Args:
+        references (dict): version 1 references.
+        variable (str): variable to keep.
+
+    Returns:
+        (dict, list(str)): references and names of the arrays kept.
+    """
+    refs = references['refs']
+    arrays = {key.split('/')[0] for key in refs if key.endswith('/.zarray')}
+    if variable not in arrays:
+        raise KeyError(f'{variable} is not in the references')
+    dims, coordinates = array_dims(refs, variable)
+    keep = {variable} | (set(dims + coordinates) & arrays)
+    refs = {key: value for key, value in refs.items() if '/' not in key or key.split('/')[0] in keep}
+    return dict(references, refs=refs), sorted(keep)
+
+
+def combine_references(paths, variable, data_format, concat_dim='time'):
+    """Combine the references of the assets of a group.
+
+    Args:
+        paths (list(str)): asset paths in start_time order.
+        variable (str): variable of the group.
+        data_format (str): data format of the assets.
+        concat_dim (str): dimension the assets are concatenated along.
+
+    Returns:
+        dict: combined version 1 references.
+    """
+    selected = [select_variable(load_references(path, data_format), variable) for path in paths]
+    if len(selected) == 1:
+        return selected[0][0]
+    refs, names = selected[0]
+    if concat_dim not in array_dims(refs['refs'], variable)[0]:
+        raise ValueError(f'{variable} has no {concat_dim} dimension to concatenate along')
+    # arrays without the concatenated dimension are the same in every asset
+    identical_dims = [name for name in names
+                      if name != variable and concat_dim not in array_dims(refs['refs'], name)[0]]
+    combined = MultiZarrToZarr(
+        [refs for refs, _ in selected],
+        concat_dims=[concat_dim],
+        identical_dims=identical_dims,
+        coo_map={concat_dim: f'cf:{concat_dim}'}
+    )
+    return combined.translate()
+
+
+def reference_file_name(key):
+    """File name of the reference of a group."""
+    return re.sub(r'[^\w.-]+', '_', '-'.join(key)) + '.json'
+
+
+def write_group_reference(group, data_format, concat_dim):
+    """Write the combined reference of a group (runs inside a worker).
+
+    Args:
+        group (tuple): (reference file, variable, asset paths).
+        data_format (str): data format of the assets.
+        concat_dim (str): dimension the assets are concatenated along.
+
+    Returns:
+        str: error message, None if the reference was written.
+    """
+    reference_file, variable, paths = group
+    try:
+        references = combine_references(paths, variable, data_format, concat_dim=concat_dim)
+    except Exception as exc:
+        return f'{type(exc).__name__}: {exc}'
+    with open(f'{reference_file}.tmp', 'w') as fh:
+        json.dump(references, fh)
+    os.replace(f'{reference_file}.tmp', reference_file)
+    return None
+
+
+def group_keys(table, groupby_attrs):
+    """Group key of every row of a table (group values joined as text)."""
+    columns = []
+    for column in groupby_attrs:
+        values = table.column(column)
+        if not pa.types.is_string(values.type):
+            values = values.cast(pa.string())
+        columns.append(pc.fill_null(values, ''))
+    return pc.binary_join_element_wise(*columns, KEY_SEPARATOR)
+
+
+def add_aggregated_column(catalog_file, groupby_attrs, group_files):
+    """Rewrite a catalog with the aggregated_path column.
+
+    Args:
+        catalog_file (str): csv/parquet catalog, rewritten in place.
+        groupby_attrs (list(str)): columns defining the groups.
+        group_files (dict): group values -> reference file ('' if none).
+    """
+    keys = pa.array([KEY_SEPARATOR.join(key) for key in group_files], pa.string())
+    files = pa.array(list(group_files.values()), pa.string())
+
+    def aggregated_paths(table):
+        return pc.fill_null(pc.take(files, pc.index_in(group_keys(table, groupby_attrs), value_set=keys)), '')
+
+    tmp_file = f'{catalog_file}.tmp'
+    if catalog_file.endswith('.parquet'):
+        parquet_file = pq.ParquetFile(catalog_file)
+        schema = parquet_file.schema_arrow
+        if AGGREGATED_COLUMN in schema.names:
+            schema = schema.remove(schema.get_field_index(AGGREGATED_COLUMN))
+        schema = schema.append(pa.field(AGGREGATED_COLUMN, pa.string()))
+        string_columns = [field.name for field in schema if field.type == 'string']
+        with pq.ParquetWriter(tmp_file, schema, use_dictionary=string_columns, write_statistics=True) as writer:
+            for i in range(parquet_file.num_row_groups):
+                table = parquet_file.read_row_group(i)
+                if AGGREGATED_COLUMN in table.column_names:
+                    table = table.drop_columns([AGGREGATED_COLUMN])
+                table = table.append_column(AGGREGATED_COLUMN, aggregated_paths(table))
+                writer.write_table(table, row_group_size=max(table.num_rows, 1))
+    else:
+        columns, reader = remote_catalog.open_csv_strings(catalog_file)
+        keep = [i for i, column in enumerate(columns) if column != AGGREGATED_COLUMN]
+        with open(tmp_file, 'wb') as fh:
+            header = [columns[i] for i in keep] + [AGGREGATED_COLUMN]
+            remote_catalog.write_csv_lines(fh, [remote_catalog.csv_field(pa.array([column])) for column in header])
+            for batch in reader:
+                if batch.num_rows == 0:
+                    continue
+                fields = [remote_catalog.csv_field(batch.column(i)) for i in keep]
+                fields.append(remote_catalog.csv_field(aggregated_paths(batch)))
+                remote_catalog.write_csv_lines(fh, fields)
+    os.replace(tmp_file, catalog_file)
+
+
+def add_json_attribute(json_file):
+    """Add the aggregated_path column to the attributes of a json file."""
+    with open(json_file) as fh:
+        data = json.load(fh)
+    attributes = data.get('attributes', [])
+    if AGGREGATED_COLUMN not in [attribute['column_name'] for attribute in attributes]:
+        attributes.append({'column_name': AGGREGATED_COLUMN, 'vocabulary': ''})
+        data['attributes'] = attributes
+        with open(json_file, 'w') as fh:
+            json.dump(data, fh)
+
+
+def aggregate_catalog(json_file, out_dir=None, concat_dim='time', workers=1, executor='thread'):
+    """Write the combined reference of every group of a catalog.
+
+    Args:
+        json_file (str): json file of a csv/parquet catalog.
+        out_dir (str): directory of the references (default
+            {catalog directory}/{catalog_name}.aggregated).
+        concat_dim (str): dimension the assets are concatenated along.
+        workers (int): number of groups combined concurrently.
+        executor (str): worker pool used when workers > 1 (thread / process).
+
+    Returns:
+        (str, list(str)): catalog file and reference files written.
+    """
+    with open(json_file) as fh:
+        data = json.load(fh)
+    catalog_name = os.path.basename(json_file)[:-len('.json')]
+    catalog_file = os.path.join(os.path.dirname(json_file), data['catalog_file'])
+    data_format = data['assets'].get('format')
+    groupby_attrs = data['aggregation_control']['groupby_attrs']
+    variable_index = groupby_attrs.index(data['aggregation_control']['variable_column_name'])
+    out_dir = os.path.abspath(out_dir or os.path.join(os.path.dirname(json_file), f'{catalog_name}.aggregated'))
+    os.makedirs(out_dir, exist_ok=True)
+
+    groups = read_groups(catalog_file, groupby_attrs)
+    tasks = [
+        (os.path.join(out_dir, reference_file_name(key)), key[variable_index], paths)
+        for key, paths in groups.items()
+    ]
+    results = map_ordered(
+        write_group_reference, tasks, kwargs={'data_format': data_format, 'concat_dim': concat_dim},
+        executor=executor, workers=workers, chunksize=1
+    )
+    group_files = {}
+    for key, (reference_file, _, paths), error in zip(groups, tasks, results):
+        if error is not None:
+            print(f'Group {key} ({len(paths)} assets) not aggregated: {error}')
+            reference_file = ''
+        group_files[key] = reference_file
+
+    add_aggregated_column(catalog_file, groupby_attrs, group_files)
+    add_json_attribute(json_file)
+    reference_files = [reference_file for reference_file in group_files.values() if reference_file]
+    print(f'Aggregated {len(reference_files)} of {len(groups)} groups of {catalog_file} in {out_dir}')
+    return catalog_file, reference_files
+
+
+def make_remote_references(reference_files, catalog_data='reference', protocols=None, protocol_config=None):
+    """Write the remote copies of combined references.
+
+    The copies are named like the remote catalog paths (see
+    remote_catalog.remote_paths) and the path prefix is replaced in them.
+    Protocols without a basename suffix would overwrite the references,
+    they are skipped.
+
+    Args:
+        reference_files (list(str)): combined references.
+        catalog_data (str): entry of the protocol registry.
+        protocols (list(str)): remote protocols to write.
+        protocol_config (str or dict): added to the protocol registry.
+    """
+    match_str, remote = get_remote_protocols(load_protocol_registry(protocol_config), catalog_data, protocols)
+    for protocol, _, basename_suffix in remote:
+        if not basename_suffix:
+            print(f'No basename suffix for {protocol}, the {protocol} copies of the references are not written')
+    for reference_file in reference_files:
+        base, ext = os.path.splitext(reference_file)
+        targets = [
+            (f'{base}{basename_suffix}{ext}', remote_str, None)
+            for _, remote_str, basename_suffix in remote if basename_suffix
+        ]
+        remote_catalog.make_remote_single_json(reference_file, targets, match_str)
+
+
+def get_parser():
+    """Creates and returns the argparse parser."""
+    parser = argparse.ArgumentParser(description='Combine the assets of every catalog group into one virtual reference.')
+    parser.add_argument('json_file', metavar='<json file>',
+                        help='json file of a csv/parquet catalog of reference or netcdf assets.')
+    parser.add_argument('--out_dir', default=None, metavar='<directory>',
+                        help='Directory of the references (default: {catalog directory}/{catalog_name}.aggregated).')
+    parser.add_argument('--concat_dim', default='time', metavar='<dimension>',
+                        help='Dimension the assets of a group are concatenated along.')
+    parser.add_argument('--workers', '-w', type=int, default=1, metavar='<n>',
+                        help='Number of groups combined concurrently.')
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                        help='Worker pool used when --workers > 1.')
+    parser.add_argument('--make_remote', '-mr', action='store_true', default=False,
+                        help='Write the remote copies of the catalog and of the references.')
+    parser.add_argument('--catalog_data', '-cd', default='reference', metavar='<data>',
+                        help='Protocol registry entry used by --make_remote (see remote_catalog.py).')
+    parser.add_argument('--protocol_config', default=None, metavar='<json string/filename>',
+                        help='Access protocols added to the built-in registry used by --make_remote.')
+    parser.add_argument('--protocols', nargs='+', default=None, metavar='<protocol>',
+                        help='Remote protocols written by --make_remote.')
+    return parser
+
+
+def main(args_list):
+    """Use command line-like arguments to execute."""
+    args = get_parser().parse_args(args_list)
+    catalog_file, reference_files = aggregate_catalog(
+        args.json_file, out_dir=args.out_dir, concat_dim=args.concat_dim,
+        workers=args.workers, executor=args.executor
+    )
+    # the rows moved in the rewritten catalog files
+    indexed = os.path.exists(index_file_of(catalog_file))
+    catalog_files = [catalog_file]
+    if args.make_remote:
+        output_format = 'parquet' if catalog_file.endswith('.parquet') else 'csv_and_json'
+        catalog_files += remote_catalog.make_remote_catalog(
+            catalog_file,
+            catalog_data=args.catalog_data,
+            output_format=output_format,
+            protocols=args.protocols,
+            protocol_config=args.protocol_config
+        )
+        make_remote_references(
+            reference_files, catalog_data=args.catalog_data, protocols=args.protocols,
+            protocol_config=args.protocol_config
+        )
+    if indexed:
+        for catalog_file in catalog_files:
+            build_index(catalog_file)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,258 @@
+"""Per-stage timing and metrics of the catalog builds of create_catalog.py.
+
+A build is split into stages (crawl, parse, assemble, save, remote, index)
+whose wall times are accumulated, and every asset is recorded with its
+open/parse wall time, the number of rows and variables it produced, the
+reader that read it and where its rows came from (parsed, parse cache or
+journal). Stages can be nested: the time of an inner stage is not counted
+in the outer one, e.g. parsed assets are pulled while the rows are being
+written, so the parse time is not counted as assemble time.
+
+With --trace_io, the fsspec requests, bytes, range reads and latency of
+every asset and stage are added to the report (see io_trace.py).
+
+The report is written as json, or as a Prometheus textfile (.prom, for
+the node_exporter textfile collector), with --metrics.
+"""
+
+import os
+import json
+import time
+import heapq
+import platform
+from contextlib import contextmanager
+
+
+# number of slowest assets listed in the report
+DEFAULT_SLOWEST = 20
+
+# file extension of the Prometheus textfile format, any other file is json
+PROMETHEUS_EXT = '.prom'
+
+PROMETHEUS_PREFIX = 'gdex_catalog_build'
+
+# columns of the per-asset records, the I/O columns are None without --trace_io
+FILE_COLUMNS = (
+    'path', 'source', 'reader', 'open_seconds', 'parse_seconds', 'rows', 'variables', 'error',
+    'requests', 'bytes', 'range_reads', 'io_seconds'
+)
+IO_COLUMNS = ('requests', 'bytes', 'range_reads', 'seconds')
+
+
+class BuildMetrics:
+    """Timing and counts of a catalog build.
+
+    Args:
+        catalog_name (str): name of the catalog being built.
+        slowest (int): number of slowest assets listed in the report.
+        io_tracer (IOTracer): I/O tracer of the build (see io_trace.py),
+            its stage follows the stages of the build.
+    """
+
+    def __init__(self, catalog_name, slowest=DEFAULT_SLOWEST, io_tracer=None):
+        self.catalog_name = catalog_name
+        self.slowest = slowest
+        self.io_tracer = io_tracer
+        self.started = time.time()
+        self.finished = None
+        self.status = 'running'
+        self.stages = {}
+        self.files = []
+        self.counts = {'parsed': 0, 'cache': 0, 'journal': 0, 'failed': 0, 'fallback': 0}
+        self.rows = 0
+        self.total_seconds = None
+        self._start = time.perf_counter()
+        self._stack = []
+
+    @contextmanager
+    def stage(self, name):
+        """Accumulate the wall time of a block in a stage.
+
+        The time of the stages nested in the block is only counted in
+        the nested stages.
+
+        Args:
+            name (str): stage name.
+        """
+        entry = [time.perf_counter(), 0.]
+        self._stack.append(entry)
+        if self.io_tracer is not None:
+            outer_stage, self.io_tracer.stage = self.io_tracer.stage, name
+        try:
+            yield
+        finally:
+            if self.io_tracer is not None:
+                self.io_tracer.stage = outer_stage
+            self._stack.pop()
+            elapsed = time.perf_counter() - entry[0]
+            self.stages[name] = self.stages.get(name, 0.) + elapsed - entry[1]
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def timed(self, name, iterable):
+        """Yield the items of an iterable, counting the wait for each item in a stage."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def add_file(self, path, items=None, timings=None, error=None, source='parsed'):
+        """Record an asset.
+
+        Args:
+            path (str): asset path.
+            items (list(dict)): catalog items of the asset, None when it failed.
+            timings (dict): 'open' and 'seconds' (open + parse) wall times,
+                'reader' used by file_parser and 'io' stats with --trace_io
+                (see timed_file_parser).
+            error (Exception): exception raised by file_parser.
+            source (str): 'parsed', 'cache' or 'journal'.
+        """
+        timings = timings or {}
+        rows = [item for item in items or [] if item]
+        open_seconds = timings.get('open')
+        parse_seconds = None
+        if 'seconds' in timings:
+            parse_seconds = timings['seconds'] - (open_seconds or 0.)
+        nvariables = len({item.get('variable') for item in rows})
+        io_stats = timings.get('io')
+        if io_stats is not None and self.io_tracer is not None:
+            self.io_tracer.add('parse', io_stats)
+        self.files.append((
+            path, source, timings.get('reader'), open_seconds, parse_seconds, len(rows), nvariables,
+            None if error is None else f'{type(error).__name__}: {error}',
+            *(io_stats[column] if io_stats is not None else None for column in IO_COLUMNS)
+        ))
+        self.rows += len(rows)
+        if error is not None:
+            self.counts['failed'] += 1
+        else:
+            self.counts[source] += 1
+        if timings.get('fallback'):
+            self.counts['fallback'] += 1
+
+    def finish(self, status='ok'):
+        """Mark the build as finished ('ok' or 'failed')."""
+        self.status = status
+        self.finished = time.time()
+        self.total_seconds = time.perf_counter() - self._start
+
+    def slowest_files(self):
+        """Records of the slowest parsed assets, slowest first."""
+        return heapq.nlargest(
+            self.slowest,
+            (record for record in self.files if record[3] is not None),
+            key=lambda record: record[3] + (record[4] or 0.)
+        )
+
+    def most_bytes_files(self):
+        """Records of the assets that read the most bytes, largest first."""
+        return heapq.nlargest(
+            self.slowest, (record for record in self.files if record[9] is not None), key=lambda record: record[9]
+        )
+
+    def to_dict(self):
+        """Report as a json serializable dict."""
+        timed = [record for record in self.files if record[3] is not None]
+        report = {
+            'catalog_name': self.catalog_name,
+            'status': self.status,
+            'started': self.started,
+            'finished': self.finished,
+            'host': platform.node(),
+            'total_seconds': self.total_seconds,
+            'stages': self.stages,
+            'assets': dict(self.counts, total=len(self.files)),
+            'rows': self.rows,
+            'open_seconds': sum(record[3] for record in timed),
+            'parse_seconds': sum(record[4] for record in timed),
+            'failures': [
+                {'path': record[0], 'error': record[7]} for record in self.files if record[7] is not None
+            ],
+            'slowest': [dict(zip(FILE_COLUMNS, record)) for record in self.slowest_files()],
+            'files': {'columns': list(FILE_COLUMNS), 'rows': self.files},
+        }
+        if self.io_tracer is not None:
+            report['io'] = self.io_tracer.to_dict()
+            report['most_bytes'] = [dict(zip(FILE_COLUMNS, record)) for record in self.most_bytes_files()]
+        return report
+
+    def to_prometheus(self):
+        """Report in the Prometheus text exposition format (totals only)."""
+        label = f'catalog="{self.catalog_name}"'
+        report = self.to_dict()
+        lines = [
+            f'# HELP {PROMETHEUS_PREFIX}_stage_seconds Wall time of each stage of the last build.',
+            f'# TYPE {PROMETHEUS_PREFIX}_stage_seconds gauge',
+        ]
+        lines += [
+            f'{PROMETHEUS_PREFIX}_stage_seconds{{{label},stage="{stage}"}} {seconds:.6f}'
+            for stage, seconds in self.stages.items()
+        ]
+        lines += [
+            f'# HELP {PROMETHEUS_PREFIX}_assets Assets of the last build by source (parsed/cache/journal/failed/fallback).',
+            f'# TYPE {PROMETHEUS_PREFIX}_assets gauge',
+        ]
+        lines += [
+            f'{PROMETHEUS_PREFIX}_assets{{{label},source="{source}"}} {count}'
+            for source, count in self.counts.items()
+        ]
+        for name, help_text, value in [
+            ('seconds', 'Wall time of the last build.', self.total_seconds or 0),
+            ('rows', 'Catalog rows of the last build.', self.rows),
+            ('open_seconds', 'Time spent opening assets in the last build.', report['open_seconds']),
+            ('parse_seconds', 'Time spent parsing opened assets in the last build.', report['parse_seconds']),
+            ('success', '1 if the last build succeeded.', int(self.status == 'ok')),
+            ('finished_timestamp_seconds', 'Unix time the last build finished.', self.finished or 0),
+        ]:
+            lines += [
+                f'# HELP {PROMETHEUS_PREFIX}_{name} {help_text}',
+                f'# TYPE {PROMETHEUS_PREFIX}_{name} gauge',
+                f'{PROMETHEUS_PREFIX}_{name}{{{label}}} {value}',
+            ]
+        if self.io_tracer is not None:
+            for column in IO_COLUMNS:
+                name = f'{PROMETHEUS_PREFIX}_io_{column}'
+                lines += [
+                    f'# HELP {name} fsspec I/O {column.replace("_", " ")} of each stage of the last build.',
+                    f'# TYPE {name} gauge',
+                ]
+                lines += [
+                    f'{name}{{{label},stage="{stage}"}} {stats[column]}'
+                    for stage, stats in self.io_tracer.stages.items()
+                ]
+        return '\n'.join(lines) + '\n'
+
+    def report(self):
+        """Summary string of the stage times and asset counts."""
+        stages = ', '.join(f'{stage} {seconds:.2f}s' for stage, seconds in self.stages.items())
+        if self.total_seconds is not None:
+            stages += f' (total {self.total_seconds:.2f}s)'
+        counts = ', '.join(f'{count} {source}' for source, count in self.counts.items() if count)
+        report = f'Build metrics {self.catalog_name} ({self.status}): {stages}; assets: {counts or "none"}'
+        if self.io_tracer is not None:
+            report += f'; io: {self.io_tracer.report()}'
+        return report
+
+    def write(self, filenames):
+        """Write the report, as a Prometheus textfile for .prom files and as json otherwise.
+
+        Files are written to a temporary file first and renamed, so a
+        collector never reads a partial report.
+
+        Args:
+            filenames (list(str)): report files.
+        """
+        for filename in filenames:
+            tmp_file = f'{filename}.tmp'
+            with open(tmp_file, 'w') as fh:
+                if filename.endswith(PROMETHEUS_EXT):
+                    fh.write(self.to_prometheus())
+                else:
+                    json.dump(self.to_dict(), fh, indent=1)
+            os.replace(tmp_file, filename)
+            print(f'Build metrics written to {filename}')
@@ -0,0 +1,644 @@
+#!/usr/bin/env python
+"""Sidecar search index of csv/parquet catalogs.
+
+The index ({catalog file without extension}.index, next to the catalog
+file) holds:
+- an inverted index of the variable, short_name, long_name and units
+  columns: the sorted row numbers of every distinct value,
+- the rows sorted by start_time with their end_time, to find the rows
+  overlapping a time range,
+- where the rows are in the catalog file: the byte offset of every
+  BLOCK_ROWS rows of a csv file, the row groups of a parquet file.
+
+It is a small json header followed by the binary arrays, so a search
+(CatalogIndex.search or search_catalog) reads the header, the arrays of
+the searched values and the row ranges holding the matching rows only,
+with range requests when the catalog is remote (https://, s3://, ...).
+
+Values are matched like intake-esm does: strings with wildcards (*, ?, ^,
+$) are regular expressions, other values are compared as text, a list
+matches any of its values and all the columns have to match. Searches on
+other columns are applied to the rows read. Numeric times (undecoded, the
+default of create_catalog.py) are compared as numbers, other times as the
+text of the catalog (YYYY-MM-DD HH:MM:SS) where a bound covers the times
+it is a prefix of (e.g. a whole day). Numeric times sort before text
+times and rows without start_time never match a time range.
+
+Usage:
+
+python catalog_index.py <json file/catalog file> [<json file/catalog file> ...]
+
+Example:
+python catalog_index.py catalog/d640000-posix.json catalog/d640000-https.json
+
+from catalog_index import search_catalog
+cat = search_catalog('https://data.gdex.ucar.edu/d640000/catalogs/d640000-https.json', long_name='temp*')
+"""
+
+import io
+import os
+import re
+import csv
+import sys
+import json
+import bisect
+import struct
+import argparse
+
+import numpy as np
+import fsspec
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+
+# columns with an inverted index
+INDEX_COLUMNS = ('variable', 'short_name', 'long_name', 'units')
+
+# time bounds of the rows
+TIME_COLUMNS = ('start_time', 'end_time')
+
+# rows between two byte offsets of a csv catalog
+BLOCK_ROWS = 1024
+
+INDEX_MAGIC = b'GDEXIDX1'
+INDEX_VERSION = 2
+INDEX_EXT = '.index'
+
+# bytes read at once for the index header
+HEADER_READ_SIZE = 1 << 16
+
+# text of the typed (parquet) time columns, as written in csv catalogs
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def index_file_of(catalog_file):
+    """Index file of a csv/parquet catalog file."""
+    return os.path.splitext(catalog_file)[0] + INDEX_EXT
+
+
+def csv_row_offsets(fh, block_rows=BLOCK_ROWS, block_size=1 << 24):
+    """Find where the rows of a csv catalog start.
+
+    A new line inside a quoted field does not end a row: a new line ends a
+    row when the number of quotes before it is even.
+
+    Args:
+        fh (file): csv catalog opened in binary mode.
+        block_rows (int): keep the offset of every block_rows rows.
+        block_size (int): number of bytes read at once.
+
+    Returns:
+        (bytes, int, numpy.ndarray): header line, number of rows and byte
+            offsets of rows 0, block_rows, 2 * block_rows, ... followed by
+            the size of the file.
+    """
+    offsets = []
+    nrecords = 0
+    nquotes = 0
+    size = 0
+    last = b'\n'
+    while True:
+        data = fh.read(block_size)
+        if not data:
+            break
+        values = np.frombuffer(data, dtype=np.uint8)
+        quotes = np.cumsum(values == ord('"'))
+        newlines = np.flatnonzero(values == ord('\n'))
+        ends = newlines[(quotes[newlines] + nquotes) % 2 == 0]
+        # record 0 is the header, row i starts after the end of record i
+        records = nrecords + np.arange(len(ends))
+        offsets.append(ends[records % block_rows == 0] + size + 1)
+        nrecords += len(ends)
+        nquotes += int(quotes[-1])
+        size += len(data)
+        last = data[-1:]
+    if last != b'\n':
+        # last row without a new line
+        nrecords += 1
+    nrows = max(nrecords - 1, 0)
+    offsets = np.concatenate(offsets) if offsets else np.zeros(0, dtype=np.int64)
+    offsets = offsets[:(nrows + block_rows - 1) // block_rows]
+    fh.seek(0)
+    header = fh.read(int(offsets[0]) if len(offsets) else size)
+    return header, nrows, np.append(offsets, size).astype('<u8')
+
+
+def read_index_columns(catalog_file, ext):
+    """Read the indexed and time columns of a catalog as text.
+
+    Args:
+        catalog_file (str): csv/parquet catalog.
+        ext (str): 'csv' or 'parquet'.
+
+    Returns:
+        (list(str), pyarrow.Table): columns of the catalog and the indexed
+            columns it has, empty cells are null.
+    """
+    if ext == 'parquet':
+        parquet_file = pq.ParquetFile(catalog_file)
+        columns = parquet_file.schema_arrow.names
+        table = parquet_file.read(columns=[c for c in INDEX_COLUMNS + TIME_COLUMNS if c in columns])
+        arrays = []
+        for column in table.columns:
+            if pa.types.is_timestamp(column.type):
+                column = pc.strftime(pc.cast(column, pa.timestamp('s'), safe=False), format=TIME_FORMAT)
+            column = column.cast(pa.string())
+            arrays.append(pc.if_else(pc.equal(column, ''), None, column))
+        return columns, pa.table(arrays, names=table.column_names)
+
+    with open(catalog_file, newline='', encoding='utf-8') as fh:
+        columns = next(csv.reader(fh), [])
+    include = [c for c in INDEX_COLUMNS + TIME_COLUMNS if c in columns]
+    if not include:
+        return columns, pa.table({})
+    table = pcsv.read_csv(
+        catalog_file,
+        parse_options=pcsv.ParseOptions(newlines_in_values=True),
+        convert_options=pcsv.ConvertOptions(
+            include_columns=include,
+            column_types={column: pa.string() for column in include},
+            strings_can_be_null=True
+        )
+    )
+    return columns, table
+
+
+def postings(column):
+    """Inverted index of a column.
+
+    Args:
+        column (pyarrow.ChunkedArray): text column.
+
+    Returns:
+        (list, numpy.ndarray): [value, start, count] of every distinct
+            value (null first, then sorted) and the row numbers of every
+            value one after the other, value rows start at start.
+    """
+    encoded = pc.dictionary_encode(column.combine_chunks(), null_encoding='encode')
+    values = encoded.dictionary.to_pylist()
+    codes = encoded.indices.to_numpy(zero_copy_only=False)
+    # renumber the values in sorted order
+    order = sorted(range(len(values)), key=lambda i: (values[i] is not None, values[i] or ''))
+    rank = np.empty(len(values), dtype=np.int64)
+    rank[order] = np.arange(len(values))
+    codes = rank[codes]
+    rows = np.argsort(codes, kind='stable').astype('<u4')
+    counts = np.bincount(codes, minlength=len(values))
+    starts = np.cumsum(counts) - counts
+    entries = [[values[i], int(starts[r]), int(counts[r])] for r, i in enumerate(order)]
+    return entries, rows
+
+
+def time_value(value):
+    """Time of a cell or search bound: a number for numeric times, text otherwise."""
+    if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+        number = float(value)
+    else:
+        value = str(value)
+        try:
+            number = float(value)
+        except ValueError:
+            return value
+    if not np.isfinite(number):
+        return str(value)
+    return int(number) if number.is_integer() else number
+
+
+def time_key(value):
+    """Sort key of a time value, numbers (undecoded times) before text."""
+    if isinstance(value, str):
+        return (1, 0., value)
+    return (0, float(value), '')
+
+
+def time_bounds(start, end):
+    """Rows sorted by start time and their end times.
+
+    Args:
+        start (pyarrow.ChunkedArray): start times (text).
+        end (pyarrow.ChunkedArray): end times (text), the start time is
+            used when it is missing.
+
+    Returns:
+        (list, list(int), numpy.ndarray, numpy.ndarray): sorted distinct
+            times (numbers then text, see time_value), number of rows
+            starting before every time (cumulative, one more than times),
+            rows with a start time sorted by start time and the positions of
+            their end times in times.
+    """
+    texts = pc.unique(pa.chunked_array(start.chunks + end.chunks, pa.string())).drop_null().to_pylist()
+    values = [time_value(text) for text in texts]
+    times = sorted(set(values), key=time_key)
+    positions = {value: i for i, value in enumerate(times)}
+    # position in times of every distinct text (e.g. '6' and '6.0' are the same time)
+    text_codes = np.array([positions[value] for value in values] + [0], dtype=np.int64)
+    value_set = pa.array(texts, pa.string())
+    start_codes = pc.index_in(start, value_set=value_set).to_numpy(zero_copy_only=False)
+    end_codes = pc.index_in(end, value_set=value_set).to_numpy(zero_copy_only=False)
+    has_start = ~np.isnan(start_codes)
+    end_codes = np.where(np.isnan(end_codes), start_codes, end_codes)
+    rows = np.flatnonzero(has_start)
+    start_codes = text_codes[start_codes[rows].astype(np.int64)]
+    end_codes = text_codes[np.nan_to_num(end_codes, nan=len(texts)).astype(np.int64)]
+    order = np.argsort(start_codes, kind='stable')
+    counts = np.bincount(start_codes, minlength=len(times))
+    cumulative = [0] + np.cumsum(counts).tolist()
+    return times, cumulative, rows[order].astype('<u4'), end_codes[rows][order].astype('<u4')
+
+
+def build_index(catalog_file, index_file=None):
+    """Write the search index of a csv/parquet catalog.
+
+    Args:
+        catalog_file (str): csv/parquet catalog.
+        index_file (str): index file, next to the catalog by default.
+
+    Returns:
+        str: index file.
+    """
+    index_file = index_file or index_file_of(catalog_file)
+    ext = catalog_file.rsplit('.', 1)[-1]
+    if ext not in ('csv', 'parquet'):
+        raise ValueError(f'Unsupported catalog file {catalog_file}, only csv and parquet catalogs are indexed')
+    columns, table = read_index_columns(catalog_file, ext)
+
+    header = {
+        'version': INDEX_VERSION,
+        'catalog_file': os.path.basename(catalog_file),
+        'format': ext,
+        'columns': columns,
+        'sections': {},
+        'postings': {},
+    }
+    sections = []
+    offset = 0
+
+    def add_section(name, array):
+        nonlocal offset
+        header['sections'][name] = [offset, len(array), array.dtype.str]
+        sections.append(array.tobytes())
+        offset += array.nbytes
+
+    if ext == 'parquet':
+        metadata = pq.ParquetFile(catalog_file).metadata
+        header['nrows'] = metadata.num_rows
+        header['row_groups'] = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    else:
+        with open(catalog_file, 'rb') as fh:
+            csv_header, header['nrows'], offsets = csv_row_offsets(fh)
+        header['csv_header'] = csv_header.decode('utf-8')
+        header['block_rows'] = BLOCK_ROWS
+        add_section('row_blocks', offsets)
+
+    for column in INDEX_COLUMNS:
+        if column in table.column_names:
+            entries, rows = postings(table.column(column))
+            header['postings'][column] = entries
+            add_section(f'postings:{column}', rows)
+
+    if 'start_time' in table.column_names:
+        end = table.column('end_time') if 'end_time' in table.column_names else table.column('start_time')
+        times, cumulative, rows, end_codes = time_bounds(table.column('start_time'), end)
+        header['times'] = times
+        header['time_counts'] = cumulative
+        add_section('time_rows', rows)
+        add_section('time_end', end_codes)
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    tmp_file = f'{index_file}.tmp'
+    with open(tmp_file, 'wb') as fh:
+        fh.write(INDEX_MAGIC + struct.pack('<Q', len(header_bytes)))
+        fh.write(header_bytes)
+        for section in sections:
+            fh.write(section)
+    os.replace(tmp_file, index_file)
+    print(f'Wrote search index {index_file} ({header["nrows"]} rows)')
+    return index_file
+
+
+def is_pattern(value):
+    """Check if a searched value is a regular expression, like intake-esm."""
+    if isinstance(value, re.Pattern):
+        return True
+    if not isinstance(value, str):
+        return False
+    for char in '*?$^':
+        value = value.replace(f'\\{char}', '')
+    return any(char in value for char in '*?$^')
+
+
+def is_null(value):
+    """Check if a searched value matches empty cells."""
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def as_list(values):
+    """Searched values of a column as a list."""
+    return list(values) if isinstance(values, (list, tuple, set)) else [values]
+
+
+def match_values(vocabulary, values):
+    """Positions of the vocabulary entries matched by searched values.
+
+    Args:
+        vocabulary (list): distinct values of a column (None for empty cells).
+        values (list): searched values.
+
+    Returns:
+        list(int): positions in vocabulary.
+    """
+    matched = set()
+    for value in values:
+        if is_pattern(value):
+            pattern = re.compile(value)
+            matched.update(i for i, entry in enumerate(vocabulary)
+                           if entry is not None and pattern.search(entry))
+        elif is_null(value):
+            matched.update(i for i, entry in enumerate(vocabulary) if entry is None)
+        else:
+            matched.update(i for i, entry in enumerate(vocabulary) if entry == str(value))
+    return sorted(matched)
+
+
+def filter_frame(df, query):
+    """Apply a search to a DataFrame of catalog rows, like intake-esm."""
+    mask = np.ones(len(df), dtype=bool)
+    for column, values in query.items():
+        if column not in df.columns:
+            return df.iloc[:0]
+        local_mask = np.zeros(len(df), dtype=bool)
+        for value in as_list(values):
+            if is_pattern(value) and df[column].dtype == object:
+                local_mask |= df[column].str.contains(value, regex=True, na=False).to_numpy(dtype=bool)
+            elif is_null(value):
+                local_mask |= df[column].isnull().to_numpy()
+            else:
+                local_mask |= (df[column] == value).to_numpy()
+        mask &= local_mask
+    return df.loc[mask].reset_index(drop=True)
+
+
+def merge_ranges(ranges):
+    """Merge (start, end) byte ranges that touch, ranges must be sorted."""
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class CatalogIndex:
+    """Search index of a csv/parquet catalog (see build_index).
+
+    Only the header of the index is read when it is opened.
+
+    Args:
+        index_file (str): index file (local path or url).
+        catalog_file (str): catalog file, the file of the index header next
+            to the index file by default.
+        storage_options (dict): fsspec options of remote files.
+
+    Raises:
+        ValueError: if index_file is not a catalog index.
+    """
+
+    def __init__(self, index_file, catalog_file=None, storage_options=None):
+        self.fs, self.index_file = fsspec.core.url_to_fs(index_file, **(storage_options or {}))
+        with self.fs.open(self.index_file, 'rb') as fh:
+            data = fh.read(HEADER_READ_SIZE)
+            if data[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+                raise ValueError(f'{index_file} is not a catalog index')
+            header_size = struct.unpack('<Q', data[len(INDEX_MAGIC):len(INDEX_MAGIC) + 8])[0]
+            self.data_offset = len(INDEX_MAGIC) + 8 + header_size
+            if len(data) < self.data_offset:
+                data += fh.read(self.data_offset - len(data))
+        self.header = json.loads(data[len(INDEX_MAGIC) + 8:self.data_offset])
+        if self.header['version'] != INDEX_VERSION:
+            raise ValueError(f'{index_file} has index version {self.header["version"]}, expected {INDEX_VERSION}')
+        self.nrows = self.header['nrows']
+        self.columns = self.header['columns']
+        # sort keys of the times, see time_rows
+        self._time_keys = None
+        if catalog_file is None:
+            self.catalog_file = os.path.join(os.path.dirname(self.index_file), self.header['catalog_file'])
+        else:
+            _, self.catalog_file = fsspec.core.url_to_fs(catalog_file, **(storage_options or {}))
+
+    def read_ranges(self, path, ranges):
+        """Read (start, end) byte ranges of a file in one call."""
+        if not ranges:
+            return []
+        return self.fs.cat_ranges([path] * len(ranges), [start for start, _ in ranges],
+                                  [end for _, end in ranges])
+
+    def read_section(self, name, parts):
+        """Read parts of a section of the index.
+
+        Args:
+            name (str): section name.
+            parts (list(tuple)): (start, count) in elements of the section.
+
+        Returns:
+            list(numpy.ndarray): the parts.
+        """
+        offset, _, dtype = self.header['sections'][name]
+        itemsize = np.dtype(dtype).itemsize
+        ranges = merge_ranges(sorted(
+            (self.data_offset + offset + start * itemsize, self.data_offset + offset + (start + count) * itemsize)
+            for start, count in parts if count
+        ))
+        chunks = self.read_ranges(self.index_file, [tuple(r) for r in ranges])
+        range_starts = [start for start, _ in ranges]
+        arrays = []
+        for start, count in parts:
+            if not count:
+                arrays.append(np.zeros(0, dtype=dtype))
+                continue
+            begin = self.data_offset + offset + start * itemsize
+            i = bisect.bisect_right(range_starts, begin) - 1
+            arrays.append(np.frombuffer(chunks[i], dtype=dtype, count=count, offset=begin - range_starts[i]))
+        return arrays
+
+    def value_rows(self, column, values):
+        """Sorted rows where a column matches any of the searched values."""
+        entries = self.header['postings'][column]
+        matched = match_values([entry[0] for entry in entries], values)
+        parts = [(entries[i][1], entries[i][2]) for i in matched]
+        rows = self.read_section(f'postings:{column}', parts)
+        return np.unique(np.concatenate(rows)) if rows else np.zeros(0, dtype='<u4')
+
+    def time_rows(self, time_range):
+        """Sorted rows whose start_time/end_time overlap a time range.
+
+        Args:
+            time_range (tuple): (start, end) time, either can be None.
+
+        Returns:
+            numpy.ndarray: rows.
+        """
+        times = self.header.get('times')
+        if times is None:
+            return np.zeros(0, dtype='<u4')
+        if self._time_keys is None:
+            self._time_keys = [time_key(time) for time in times]
+        keys = self._time_keys
+        start, end = [None if bound is None else time_value(bound) for bound in time_range]
+        # rows starting before the end of the range, the text times the end
+        # is a prefix of (e.g. the whole day of a date) are in the range
+        if end is None:
+            # a numeric range does not cover the text times
+            last = len(times) if start is None or isinstance(start, str) else bisect.bisect_right(keys, (0, np.inf, ''))
+        elif isinstance(end, str):
+            last = bisect.bisect_right(keys, (1, 0., end + '\uffff'))
+        else:
+            last = bisect.bisect_right(keys, time_key(end))
+        count = self.header['time_counts'][last]
+        rows, end_codes = self.read_section('time_rows', [(0, count)]) + self.read_section('time_end', [(0, count)])
+        if start is not None:
+            rows = rows[end_codes >= bisect.bisect_left(keys, time_key(start))]
+        return np.sort(rows)
+
+    def rows(self, time_range=None, **query):
+        """Rows matching the indexed columns of a search.
+
+        Args:
+            time_range (tuple): (start, end) time overlapping the rows.
+            query: column=value(s) searched (only the indexed columns are used).
+
+        Returns:
+            numpy.ndarray: sorted row numbers, None if nothing is indexed.
+        """
+        rows = None
+        for column, values in query.items():
+            if column in self.header['postings']:
+                matched = self.value_rows(column, as_list(values))
+                rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        if time_range is not None:
+            matched = self.time_rows(time_range)
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        return rows
+
+    def read_rows(self, rows):
+        """Read catalog rows.
+
+        Only the csv row blocks or the parquet row groups holding the rows
+        are read.
+
+        Args:
+            rows (numpy.ndarray): sorted row numbers.
+
+        Returns:
+            pandas.DataFrame: the rows.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.header['format'] == 'parquet':
+            counts = self.header['row_groups']
+        else:
+            block_rows = self.header['block_rows']
+            counts = [block_rows] * (self.nrows // block_rows)
+            if self.nrows % block_rows:
+                counts.append(self.nrows % block_rows)
+        starts = np.cumsum([0] + counts)
+        row_blocks = np.searchsorted(starts, rows, side='right') - 1
+        blocks = np.unique(row_blocks)
+        # positions of the rows in the blocks read, one after the other
+        sizes = np.array([counts[block] for block in blocks], dtype=np.int64)
+        positions = np.cumsum(sizes) - sizes
+        local = positions[np.searchsorted(blocks, row_blocks)] + rows - starts[row_blocks]
+
+        if self.header['format'] == 'parquet':
+            with self.fs.open(self.catalog_file, 'rb') as fh:
+                parquet_file = pq.ParquetFile(fh)
+                if len(blocks):
+                    table = parquet_file.read_row_groups([int(block) for block in blocks])
+                else:
+                    table = parquet_file.schema_arrow.empty_table()
+                df = table.to_pandas()
+        else:
+            offsets = self.read_section('row_blocks', [(0, len(counts) + 1)])[0].astype(np.int64)
+            ranges = merge_ranges([(offsets[block], offsets[block + 1]) for block in blocks])
+            chunks = self.read_ranges(self.catalog_file, [tuple(r) for r in ranges])
+            text = self.header['csv_header'].encode('utf-8') + b''.join(chunks)
+            # pandas is only imported by searches, index builds do not need it
+            import pandas as pd
+            df = pd.read_csv(io.BytesIO(text))
+        return df.iloc[local].reset_index(drop=True)
+
+    def search(self, time_range=None, **query):
+        """Search the catalog.
+
+        The indexed columns and the time range select the rows to read, the
+        other columns are searched in the rows read.
+
+        Args:
+            time_range (tuple): (start, end) time overlapping the rows.
+            query: column=value(s) searched, matched like intake-esm.
+
+        Returns:
+            pandas.DataFrame: matching rows.
+        """
+        rows = self.rows(time_range=time_range, **query)
+        if rows is None:
+            rows = np.arange(self.nrows)
+        df = self.read_rows(rows)
+        others = {column: values for column, values in query.items() if column not in self.header['postings']}
+        return filter_frame(df, others) if others else df
+
+
+def search_catalog(json_file, time_range=None, storage_options=None, **query):
+    """Search a csv/parquet catalog with its index, without reading it whole.
+
+    Args:
+        json_file (str): intake-esm json file (local path or url) of a
+            catalog with an index next to its catalog file.
+        time_range (tuple): (start, end) time overlapping the rows.
+        storage_options (dict): fsspec options of remote files.
+        query: column=value(s) searched, matched like intake-esm.
+
+    Returns:
+        intake_esm.esm_datastore: catalog of the matching rows.
+    """
+    # only needed to return the catalog
+    import intake
+
+    fs, path = fsspec.core.url_to_fs(json_file, **(storage_options or {}))
+    with fs.open(path) as fh:
+        esmcat = json.load(fh)
+    catalog_file = esmcat.pop('catalog_file')
+    if '://' not in catalog_file and not os.path.isabs(catalog_file):
+        catalog_file = os.path.join(os.path.dirname(json_file), catalog_file)
+    index = CatalogIndex(index_file_of(catalog_file), catalog_file=catalog_file, storage_options=storage_options)
+    df = index.search(time_range=time_range, **query)
+    return intake.open_esm_datastore({'esmcat': esmcat, 'df': df})
+
+
+def catalog_file_of(source):
+    """csv/parquet catalog file of a json file (or the catalog file itself)."""
+    if not source.endswith('.json'):
+        return source
+    with open(source) as fh:
+        catalog_file = json.load(fh)['catalog_file']
+    return os.path.join(os.path.dirname(source), catalog_file)
+
+
+def get_parser():
+    """Creates and returns the argparse parser."""
+    parser = argparse.ArgumentParser(description='Write the search index of csv/parquet catalogs')
+    parser.add_argument('sources', nargs='+', metavar='<json file/catalog file>',
+                        help='Catalogs to index.')
+    return parser
+
+
+def main(args_list):
+    """Use command line-like arguments to execute."""
+    args = get_parser().parse_args(args_list)
+    for source in args.sources:
+        build_index(catalog_file_of(source))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,406 @@
+"""Streaming catalog writers used by create_catalog.py.
+
+Catalog rows are written to disk in batches as they are parsed instead of
+being collected into a DataFrame, so memory is bounded by the batch size and
+not by the number of rows in the catalog.
+
+The CSV columns are the union of the row keys in order of first appearance
+(the column order of pandas.DataFrame.from_records). Rows are spooled
+unformatted and the CSV file is written when the writer is closed.
+
+pandas.DataFrame.to_csv formats a whole column at once from its dtype, so
+the writer collects the cell types of every column while spooling (see
+CsvColumn) and formats the cells the same way: datetime64 columns as dates
+only when every time is midnight, with the finest sub-second precision of
+the column otherwise, timedelta64 columns as '1 days' when every value is
+whole days, int columns holding floats or missing values as floats and
+mixed (object) columns with str(). Missing values are empty cells, keys a
+row does not have (including every row before a column first appears) are
+NaN cells as in pandas.DataFrame.from_records.
+
+ParquetCatalogWriter writes the same rows to a parquet file with typed
+columns (timestamp, duration, int64, float64), dictionary encoded strings and
+row group statistics, optionally with row groups clustered by variable so
+readers can skip the row groups of other variables.
+"""
+
+import os
+import csv
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# number of rows formatted and written at once
+DEFAULT_BATCH_SIZE = 10000
+
+# missing cell value written by create_catalog
+NO_DATA_STR = ''
+
+
+# nanoseconds of a day and of the units of the sub-second datetime precisions
+DAY_NS = 86400 * 10**9
+SUBSECOND_UNITS = [('s', 10**9), ('ms', 10**6), ('us', 10**3), ('ns', 1)]
+
+
+def is_missing(value):
+    """Check if a cell is written as an empty cell (None, NaN or NaT)."""
+    if value is None:
+        return True
+    if isinstance(value, (float, np.floating)):
+        return bool(np.isnan(value))
+    if isinstance(value, (np.datetime64, np.timedelta64)):
+        return bool(np.isnat(value))
+    return False
+
+
+class CsvColumn:
+    """Cells of a catalog column, to format them like pandas.DataFrame.to_csv.
+
+    The dtype pandas infers for a column only depends on the types of its
+    cells (and on which of them are missing), so it is inferred from one
+    sample cell of each type. The datetime and timedelta formats depend on
+    every value of the column.
+
+    Args:
+        rows_before (int): number of rows written before the column first
+            appeared, they are NaN cells of the column.
+    """
+
+    def __init__(self, rows_before=0):
+        # (type, missing) -> first cell of that type
+        self.samples = {}
+        self.rows_before = rows_before
+        if rows_before:
+            self.add(float('nan'))
+        # every datetime is midnight / every timedelta is whole days
+        self.dates_only = True
+        self.even_days = True
+        # finest sub-second precision of the datetimes
+        self.unit = 's'
+
+    def add(self, value):
+        """Add a cell of the column."""
+        missing = is_missing(value)
+        self.samples.setdefault((type(value), missing), value)
+        if missing:
+            return
+        if isinstance(value, np.datetime64):
+            nanoseconds = int(value.astype('datetime64[ns]').astype(np.int64))
+            self.dates_only = self.dates_only and nanoseconds % DAY_NS == 0
+            units = [unit for unit, _ in SUBSECOND_UNITS]
+            for unit, size in SUBSECOND_UNITS[units.index(self.unit):]:
+                if nanoseconds % size == 0:
+                    self.unit = unit
+                    break
+        elif isinstance(value, np.timedelta64):
+            nanoseconds = int(value.astype('timedelta64[ns]').astype(np.int64))
+            self.even_days = self.even_days and nanoseconds % DAY_NS == 0
+
+    def dtype(self):
+        """dtype of the column in pandas.DataFrame.from_records."""
+        return pd.DataFrame.from_records([{'cell': value} for value in self.samples.values()])['cell'].dtype
+
+    def formatter(self):
+        """Function formatting a (non missing) cell of the column."""
+        dtype = self.dtype()
+        if dtype.kind == 'M':
+            if self.dates_only:
+                return lambda value: np.datetime_as_string(value, unit='D')
+            return lambda value: np.datetime_as_string(
+                value.astype('datetime64[ns]'), unit=self.unit
+            ).replace('T', ' ')
+        if dtype.kind == 'm':
+            if self.even_days:
+                return lambda value: f'{pd.Timedelta(value).days} days'
+            return lambda value: str(pd.Timedelta(value))
+        if dtype.kind == 'f':
+            return lambda value: str(dtype.type(value))
+        return str
+
+
+def format_cell(value):
+    """Format a single catalog cell as text (string cells of parquet catalogs).
+
+    Args:
+        value: cell value.
+
+    Returns:
+        str: formatted cell.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and np.isnan(value):
+        return ''
+    if isinstance(value, (np.datetime64, np.timedelta64)):
+        if np.isnat(value):
+            return ''
+        if isinstance(value, np.datetime64):
+            return str(pd.Timestamp(value))
+        return str(pd.Timedelta(value))
+    return str(value)
+
+
+def cell_kind(value):
+    """Kind of a catalog cell used to type parquet columns.
+
+    Args:
+        value: cell value.
+
+    Returns:
+        str: 'datetime', 'timedelta', 'int', 'float' or 'str', None for a
+            missing value.
+    """
+    if value is None or (isinstance(value, str) and value == NO_DATA_STR):
+        return None
+    if isinstance(value, np.datetime64):
+        return None if np.isnat(value) else 'datetime'
+    if isinstance(value, np.timedelta64):
+        return None if np.isnat(value) else 'timedelta'
+    if isinstance(value, (bool, np.bool_)):
+        return 'str'
+    if isinstance(value, (int, np.integer)):
+        return 'int'
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else 'float'
+    return 'str'
+
+
+def column_type(kinds):
+    """Arrow type of a parquet column from the kinds of its cells.
+
+    Args:
+        kinds (set(str)): cell kinds of the column (see cell_kind).
+
+    Returns:
+        pyarrow.DataType: column type, string for mixed columns.
+    """
+    kinds = kinds - {None}
+    if kinds == {'datetime'}:
+        return pa.timestamp('ns')
+    if kinds == {'timedelta'}:
+        return pa.duration('ns')
+    if kinds == {'int'}:
+        return pa.int64()
+    if kinds and kinds <= {'int', 'float'}:
+        return pa.float64()
+    return pa.string()
+
+
+class CatalogWriter:
+    """Write catalog rows to a CSV file in batches.
+
+    Rows are spooled next to the output file and the final CSV (header with
+    the union of the columns, then the rows) is written by close().
+
+    Args:
+        out_file (str): path of the output file.
+        batch_size (int): number of rows kept in memory before being written.
+    """
+
+    def __init__(self, out_file, batch_size=DEFAULT_BATCH_SIZE):
+        self.out_file = out_file
+        self.batch_size = max(int(batch_size), 1)
+        self.columns = []
+        self.nrows = 0
+        self._column_set = set()
+        self._batch = []
+        # cell types of every column, see CsvColumn
+        self.csv_columns = {}
+        self._spool = self._open_spool()
+
+    def _open_spool(self):
+        """Open the spool file next to the output file."""
+        return tempfile.NamedTemporaryFile(
+            'w+b', suffix='.spool', dir=os.path.dirname(os.path.abspath(self.out_file)), delete=False
+        )
+
+    def write(self, row):
+        """Add a row (dict of column -> value) to the catalog."""
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def write_rows(self, rows):
+        """Add every row of an iterable to the catalog."""
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        """Write the current batch of rows to the spool file."""
+        if not self._batch:
+            return
+        for row in self._batch:
+            for column in row:
+                if column not in self._column_set:
+                    self._column_set.add(column)
+                    self.columns.append(column)
+        self._write_batch(self._batch)
+        self.nrows += len(self._batch)
+        self._batch = []
+
+    def _write_batch(self, batch):
+        """Collect the cell types of a batch of rows and pickle it to the spool file."""
+        for column in self.columns:
+            if column not in self.csv_columns:
+                self.csv_columns[column] = CsvColumn(rows_before=self.nrows)
+            csv_column = self.csv_columns[column]
+            for row in batch:
+                # a key missing from a row is a NaN cell in pandas
+                csv_column.add(row.get(column, float('nan')))
+        pickle.dump(batch, self._spool, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _iter_spool(self, spool):
+        """Load the pickled batches of a spool file."""
+        spool.seek(0)
+        while True:
+            try:
+                yield pickle.load(spool)
+            except EOFError:
+                return
+
+    def _format_row(self, row, formatters):
+        """CSV cells of a row, formatted by the formatters of the columns."""
+        cells = []
+        for column, formatter in zip(self.columns, formatters):
+            value = row.get(column)
+            cells.append('' if is_missing(value) else formatter(value))
+        return cells
+
+    def close(self):
+        """Write the final CSV file and remove the spool file.
+
+        Returns:
+            list(str): columns of the catalog.
+        """
+        self.flush()
+        formatters = [self.csv_columns[column].formatter() for column in self.columns]
+        tmp_file = f'{self.out_file}.tmp'
+        try:
+            with open(tmp_file, 'w', newline='', encoding='utf-8') as fh:
+                writer = csv.writer(fh, lineterminator='\n')
+                writer.writerow(self.columns)
+                for batch in self._iter_spool(self._spool):
+                    writer.writerows(self._format_row(row, formatters) for row in batch)
+            os.replace(tmp_file, self.out_file)
+        finally:
+            self.discard()
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        return self.columns
+
+    def discard(self):
+        """Remove the spool file without writing the catalog."""
+        if not self._spool.closed:
+            self._spool.close()
+        if os.path.exists(self._spool.name):
+            os.remove(self._spool.name)
+
+
+class ParquetCatalogWriter(CatalogWriter):
+    """Write catalog rows to a parquet file in batches.
+
+    Batches are pickled to the spool file while the kinds of the cells of
+    each column are collected, the column types are decided by close(). Each
+    batch becomes (at most) one row group.
+
+    Args:
+        out_file (str): path of the output parquet file.
+        batch_size (int): number of rows kept in memory and rows per row group.
+        partition_by (str): column whose values never share a row group
+            (e.g. 'variable'), rows are clustered by its sorted values.
+    """
+
+    def __init__(self, out_file, batch_size=DEFAULT_BATCH_SIZE, partition_by=None):
+        self.partition_by = partition_by
+        self.kinds = {}
+        super().__init__(out_file, batch_size=batch_size)
+
+    def _write_batch(self, batch):
+        for column in self.columns:
+            kinds = self.kinds.setdefault(column, set())
+            for row in batch:
+                kinds.add(cell_kind(row.get(column)))
+        pickle.dump(batch, self._spool, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def get_schema(self):
+        """Arrow schema of the catalog (call once every row is written)."""
+        return pa.schema([(column, column_type(self.kinds[column])) for column in self.columns])
+
+    def _iter_partitions(self, tmpdir):
+        """Batches of rows clustered by the partition column.
+
+        The spooled rows are split into one spool file per partition value
+        first, so memory stays bounded by the batch size.
+        """
+        partitions = {}
+        for batch in self._iter_spool(self._spool):
+            groups = {}
+            for row in batch:
+                groups.setdefault(format_cell(row.get(self.partition_by)), []).append(row)
+            for value, rows in groups.items():
+                if value not in partitions:
+                    partitions[value] = os.path.join(tmpdir, f'{len(partitions)}.spool')
+                with open(partitions[value], 'ab') as fh:
+                    pickle.dump(rows, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+        for value in sorted(partitions):
+            rows = []
+            with open(partitions[value], 'rb') as fh:
+                for part in self._iter_spool(fh):
+                    rows.extend(part)
+                    while len(rows) >= self.batch_size:
+                        yield rows[:self.batch_size]
+                        rows = rows[self.batch_size:]
+            if rows:
+                yield rows
+            os.remove(partitions[value])
+
+    def to_table(self, rows, schema):
+        """Convert a batch of rows to an arrow table with the catalog schema."""
+        arrays = []
+        for field in schema:
+            values = [row.get(field.name) for row in rows]
+            if pa.types.is_string(field.type):
+                values = [None if cell_kind(value) is None else format_cell(value) for value in values]
+            elif pa.types.is_timestamp(field.type) or pa.types.is_duration(field.type):
+                # arrow only converts numpy datetime64/timedelta64 scalars in ns, us, ms and s
+                unit = 'datetime64[ns]' if pa.types.is_timestamp(field.type) else 'timedelta64[ns]'
+                values = [None if cell_kind(value) is None else value.astype(unit) for value in values]
+            else:
+                values = [None if cell_kind(value) is None else value for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def close(self):
+        """Write the final parquet file and remove the spool file.
+
+        Returns:
+            list(str): columns of the catalog.
+        """
+        self.flush()
+        schema = self.get_schema()
+        string_columns = [field.name for field in schema if pa.types.is_string(field.type)]
+        tmp_file = f'{self.out_file}.tmp'
+        try:
+            with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(self.out_file))) as tmpdir:
+                if self.partition_by in self._column_set:
+                    batches = self._iter_partitions(tmpdir)
+                else:
+                    batches = self._iter_spool(self._spool)
+                with pq.ParquetWriter(tmp_file, schema, use_dictionary=string_columns,
+                                      write_statistics=True) as writer:
+                    for rows in batches:
+                        writer.write_table(self.to_table(rows, schema), row_group_size=self.batch_size)
+            os.replace(tmp_file, self.out_file)
+        finally:
+            self.discard()
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        return self.columns
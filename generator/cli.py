@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Single entry point of the catalog tools, one subcommand per tool.
+
+Usage:
+
+python cli.py <subcommand> [<args> ...]
+
+Subcommands:
+    build      create a catalog (create_catalog.py)
+    remote     make the remote copies of posix catalogs (remote_catalog.py)
+    modify     replace paths in catalog files (modify_catalog.py)
+    merge      merge sharded catalogs or compact catalogs (merge_catalog.py)
+    inspect    print a summary of catalogs (inspect_catalog.py)
+
+Notes:
+- the arguments of a subcommand are the arguments of its module, e.g.
+  `python cli.py build <directory> --out catalog` runs
+  `python create_catalog.py <directory> --out catalog`, and
+  `python cli.py <subcommand> --help` lists them.
+- the module of a subcommand is only imported when the subcommand runs.
+  remote, modify and inspect do not import xarray, pandas or ecgtools, so
+  they start in a fraction of the time of build; scripts running a tool
+  once per dataset (e.g. examples/d640000.jra3q.py) do not pay the import
+  cost of create_catalog.py every time.
+
+Example:
+python cli.py remote catalog/d640000-posix.json --catalog_data reference
+python cli.py inspect https://data.gdex.ucar.edu/d640000/catalogs/d640000-https.json
+"""
+
+import sys
+import argparse
+import importlib
+
+
+# subcommand -> (module, description)
+SUBCOMMANDS = {
+    'build': ('create_catalog', 'create a catalog'),
+    'remote': ('remote_catalog', 'make the remote copies of posix catalogs'),
+    'modify': ('modify_catalog', 'replace paths in catalog files'),
+    'merge': ('merge_catalog', 'merge sharded catalogs or compact catalogs'),
+    'inspect': ('inspect_catalog', 'print a summary of catalogs'),
+}
+
+
+def load_subcommand(name):
+    """Import the module of a subcommand.
+
+    Args:
+        name (str): subcommand.
+
+    Returns:
+        module: module of the subcommand, with a main(args_list) function.
+    """
+    return importlib.import_module(SUBCOMMANDS[name][0])
+
+
+def get_parser():
+    """Creates and returns the argparse parser."""
+    subcommands = '\n'.join(
+        f'  {name:<10} {description} ({module}.py)' for name, (module, description) in SUBCOMMANDS.items()
+    )
+    parser = argparse.ArgumentParser(
+        description='Catalog tools, see `<subcommand> --help` for the arguments of each subcommand.',
+        epilog=f'subcommands:\n{subcommands}',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('subcommand', choices=list(SUBCOMMANDS), metavar='<subcommand>',
+                        help=f"One of {', '.join(SUBCOMMANDS)}.")
+    parser.add_argument('args', nargs=argparse.REMAINDER, metavar='<args>',
+                        help='Arguments of the subcommand.')
+    return parser
+
+
+def main(args_list):
+    """Use command line-like arguments to execute."""
+    args = get_parser().parse_args(args_list)
+    load_subcommand(args.subcommand).main(args.args)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
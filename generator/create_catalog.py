@@ -19,12 +19,105 @@ python create_catalog.py <directory>
     [--ignore_vars <var name>]
     [--var_metadata <json string/filename>]
     [--global_metadata <json string/filename>]
-    [--output_format <csv_and_json/single_json>]
+    [--output_format <csv_and_json/single_json/parquet>]
+    [--decode_times]
     [--make_remote]
+    [--cache <sqlite file>]
+    [--rebuild]
+    [--workers <n>]
+    [--executor <thread/process>]
+    [--reader <xarray/native>]
+    [--batch_size <n>]
+    [--partition_by <column>]
+    [--protocol_config <json string/filename>]
+    [--protocols <protocol>]
+    [--journal <sqlite file>]
+    [--resume]
+    [--shard <i/N>]
+    [--index]
+    [--metrics <json/prom file> ...]
+    [--trace_io]
+    [--cache_dir <directory>]
+    [--cache_max_bytes <n>]
+    [--max_connections <n>]
+    [--crawl_workers <n>]
+    [--pipeline]
+    [--queue_size <n>]
 
 Notes:
 - if --make_remote is set, the catalog naming convention must be followed:
     {dataset_id}-{protocol}
+- if --cache is set, parsed rows are kept in the given SQLite file and reused
+  for assets whose mtime/size (or ETag for s3://) did not change.
+  --rebuild re-parses every asset and refreshes the cache.
+- --workers > 1 parses assets concurrently with a thread or process pool
+  (--executor). Rows are kept in asset order, so the catalog does not
+  depend on the number of workers.
+- time is written undecoded (raw values of the time coordinate) unless
+  --use_cftime True decodes it to cftime objects or --decode_times decodes
+  it to numpy datetime64.
+- --reader native builds the rows from the zarr consolidated metadata
+  (.zmetadata / zarr.json) and the first and last time chunks only,
+  without xarray.open_dataset. For references it reads the inline
+  .zattrs/.zarray entries of the JSON (or the parquet .zmetadata) and
+  resolves only the time chunks it needs. netCDF files (.nc) are read
+  with netCDF4 directly, reading only the first, second and last time
+  values. The rows match the xarray reader.
+- with csv_and_json, rows are streamed to the csv file in batches of
+  --batch_size rows, the json file is written once all rows are parsed.
+- --output_format parquet writes {catalog_name}.parquet (typed time columns,
+  dictionary encoded strings, row group statistics) next to the json file.
+  --partition_by variable keeps the rows of each variable in their own row
+  groups so readers only fetch the row groups of the variables they search.
+- --make_remote writes one copy of the catalog per remote protocol of the
+  --catalog_data entry of the protocol registry (see protocols.py), all of
+  them from a single read of the posix catalog (see remote_catalog.py,
+  `cli.py remote` makes them for an existing catalog). --protocol_config
+  adds catalog_data entries and protocols (e.g. s3) to the built-in
+  registry, --protocols selects the protocols to write.
+- --journal records every parsed asset (rows or error) in a SQLite file as
+  soon as it is parsed. If the build dies, rerun it with --resume to skip
+  the journaled assets and finalize the catalog from the journal plus the
+  remaining assets ({out}/{catalog_name}.journal when --journal is not set).
+- --shard i/N only parses the assets of shard i of N (partitioned by a hash
+  of the asset path) and writes {catalog_name}.shard-i-of-N.csv/.parquet/.json.
+  Run the N shards as independent jobs (e.g. a PBS array job) and combine
+  them with merge_catalog.py, which also makes the remote copies.
+- --index writes the search index {catalog_name}.index of the csv/parquet
+  catalog and of its remote copies (see catalog_index.py), searches read
+  the index and the matching row ranges instead of the whole catalog.
+- --metrics writes a report of the build (see build_metrics.py): wall time
+  of each stage (crawl, parse, assemble, save, remote, index), open/parse
+  time, rows and variables of every asset, the slowest assets and the
+  failures. Files ending in .prom get the totals in the Prometheus textfile
+  format, other files the full json report. It is also written when the
+  build fails.
+- --trace_io counts the fsspec requests, bytes, range reads and latency of
+  every asset and stage (see io_trace.py), printed with the build summary
+  and added to the --metrics report. netCDF files read with netCDF4
+  directly are not traced.
+- --cache_dir keeps the remote reads of the native reader (consolidated
+  metadata, reference files, time chunks) in a SQLite file of the directory
+  (see read_cache.py), so rebuilds and dry runs read them from local disk.
+  Cached reads are reused while the ETag/Last-Modified of their asset does
+  not change, the least recently used reads are evicted past
+  --cache_max_bytes. The hit rate is printed at the end of the parse.
+  The xarray reader is not cached, --cache_dir needs --reader native.
+- remote assets (the Boreas https endpoint of s3:// zarr stores, s3 with
+  the BOREAS storage_options) are read through one shared filesystem per
+  protocol (see session_pool.py): connections are kept alive and reused by
+  every asset of the build, at most --max_connections at a time.
+  --max_connections 0 gives every asset its own filesystem.
+- assets are discovered by a parallel crawler (see crawler.py) listing
+  --crawl_workers directories at a time. --exclude globs prune the
+  matching directories, and zarr stores are not walked into, so files
+  inside zarr stores are never assets.
+- --pipeline runs the crawl, parse and write stages concurrently with
+  bounded queues of --queue_size items between them (see pipeline.py):
+  assets are parsed while the tree is still crawled and rows go to the
+  posix and, with --make_remote, remote catalog writers as soon as they
+  are parsed. Rows are in the order the assets are discovered instead of
+  the sorted asset order.
 
 Testing example:
 python create_catalog.py /lustre/desc1/scratch/chiaweih/d640000.jra3q/kerchunk_test/ --data_format reference --out /lustre/desc1/scratch/chiaweih/d640000.jra3q/catalog --output_format csv_and_json --catalog_name d640000_catalog --description "JRA3Q kerchunk catalog" --depth 0 --make_remote
@@ -39,27 +132,49 @@ import sys
 import os
 import re
 import json
+import time
+import hashlib
 import logging
+import itertools
 import argparse
+from contextlib import nullcontext
 from packaging import version
 from dotenv import load_dotenv
 
 import xarray
+import numpy as np
 import pandas as pd
 import ecgtools
 import fsspec
 
+from parse_cache import ParseCache
+from parse_journal import ParseJournal
+from executor import map_ordered
+from zarr_reader import ZarrHeader
+from reference_reader import ReferenceHeader
+from netcdf_reader import NetCDFHeader
+from catalog_index import build_index
+from build_metrics import BuildMetrics
+from io_trace import IOTracer, trace_asset, enable_tracing, disable_tracing
+from read_cache import DEFAULT_MAX_BYTES, enable_read_cache, disable_read_cache
+from session_pool import DEFAULT_MAX_CONNECTIONS, enable_session_pool, disable_session_pool, pooled_store
+from crawler import DEFAULT_CRAWL_WORKERS, Crawler
+from pipeline import DEFAULT_QUEUE_SIZE, RemoteCatalogWriter, produce, unique, tee_rows
+from catalog_writer import CatalogWriter, ParquetCatalogWriter, DEFAULT_BATCH_SIZE
+from protocols import BOREAS_BUCKET_NAME, BOREAS_ENDPOINT_URL, load_protocol_registry, get_remote_protocols
+from remote_catalog import (
+    PATH_COLUMNS, get_output_ext, get_remote_targets, make_remote_json, make_remote_catalog
+)
+
 
-# setup logging
-logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # constant definitions
 NO_DATA_STR = ""
 
-# setup global variables for BOREAS S3 bucket
-BOREAS_BUCKET_NAME = 'gdex-data'
-BOREAS_ENDPOINT_URL = 'https://boreas.hpc.ucar.edu:6443'
+# time decoding policy (cftime / numpy / off) chosen for each file family,
+# sibling files start from the remembered policy instead of probing again
+DECODE_POLICY_CACHE = {}
 
 def load_env():
     """
@@ -123,8 +238,7 @@ def get_parser():
             type=str,
             required=False,
             metavar='<data>',
-            choices=['reference', 'zarr-glade', 'zarr-boreas'],
-            help='The data format of the catalog (reference / zarr-glade / zarr-boreas).',
+            help='The data format of the catalog (reference / zarr-glade / zarr-boreas or an entry of --protocol_config).',
             default='reference')
     parser.add_argument('--catalog_name', '-n',
             type=str,
@@ -185,8 +299,8 @@ def get_parser():
             type=str,
             required=False,
             metavar='<format>',
-            choices=['csv_and_json', 'single_json'],
-            help='The output format of the catalog (csv_and_json / single_json).',
+            choices=['csv_and_json', 'single_json', 'parquet'],
+            help='The output format of the catalog (csv_and_json / single_json / parquet).',
             default='csv_and_json')
     parser.add_argument('--use_cftime',
             type=lambda x: x.lower() == 'true',
@@ -194,7 +308,136 @@ def get_parser():
             required=False,
             help='Use cftime objects for time decoding instead of numpy datetime64.',
             default=False)
-   
+    parser.add_argument('--decode_times',
+            action='store_true',
+            required=False,
+            help='Decode time to numpy datetime64 (time is left undecoded by default, --use_cftime takes precedence).',
+            default=False)
+    parser.add_argument('--cache',
+            type=str,
+            required=False,
+            metavar='<file>',
+            default=None,
+            help='SQLite file caching parsed rows between runs. Unchanged assets are not reopened.')
+    parser.add_argument('--rebuild',
+            action='store_true',
+            required=False,
+            help='Ignore cached rows and re-parse every asset (the cache is refreshed).',
+            default=False)
+    parser.add_argument('--reader',
+            type=str,
+            required=False,
+            metavar='<reader>',
+            choices=['xarray', 'native'],
+            help='Metadata reader (xarray / native). native reads zarr consolidated metadata, reference files and netCDF files directly.',
+            default='xarray')
+    parser.add_argument('--workers', '-w',
+            type=int,
+            required=False,
+            metavar='<n>',
+            default=1,
+            help='Number of workers parsing assets concurrently (1 parses serially).')
+    parser.add_argument('--executor',
+            type=str,
+            required=False,
+            metavar='<executor>',
+            choices=['thread', 'process'],
+            help='Worker pool used when --workers > 1 (thread / process).',
+            default='thread')
+    parser.add_argument('--batch_size',
+            type=int,
+            required=False,
+            metavar='<n>',
+            help='Number of catalog rows held in memory before being written to the csv/parquet file.',
+            default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--partition_by',
+            type=str,
+            required=False,
+            metavar='<column>',
+            help='With --output_format parquet, column (e.g. variable) whose values get their own row groups.',
+            default=None)
+    parser.add_argument('--protocol_config',
+            type=str,
+            required=False,
+            metavar='<json string/filename>',
+            help='Access protocols (prefix and basename rule) added to the built-in registry used by --make_remote.',
+            default=None)
+    parser.add_argument('--protocols',
+            type=str,
+            nargs='+',
+            required=False,
+            metavar='<protocol>',
+            help='Remote protocols written by --make_remote (e.g. https osdf s3), default protocols of --catalog_data by default.',
+            default=None)
+    parser.add_argument('--journal',
+            type=str,
+            required=False,
+            metavar='<file>',
+            default=None,
+            help='SQLite file journaling every parsed asset as soon as it is parsed (see --resume).')
+    parser.add_argument('--resume',
+            action='store_true',
+            required=False,
+            help='Skip the assets journaled by a previous run that died (default journal {out}/{catalog_name}.journal).',
+            default=False)
+    parser.add_argument('--shard',
+            type=parse_shard,
+            required=False,
+            metavar='<i/N>',
+            default=None,
+            help='Only parse shard i of N (0 <= i < N) of the assets, combine the shards with merge_catalog.py.')
+    parser.add_argument('--index',
+            action='store_true',
+            required=False,
+            help='Write the search index of the catalog (and of its remote copies) next to the catalog file.',
+            default=False)
+    parser.add_argument('--metrics',
+            type=str,
+            nargs='+',
+            required=False,
+            metavar='<file>',
+            default=None,
+            help='Write the per-stage timings and per-asset metrics of the build (json, Prometheus textfile for .prom files).')
+    parser.add_argument('--trace_io',
+            action='store_true',
+            required=False,
+            help='Count the fsspec requests, bytes, range reads and latency of every asset and stage (added to --metrics).',
+            default=False)
+    parser.add_argument('--cache_dir',
+            type=str,
+            required=False,
+            metavar='<directory>',
+            default=None,
+            help='Directory caching the remote metadata and chunk reads of the native reader between runs (needs --reader native).')
+    parser.add_argument('--cache_max_bytes',
+            type=int,
+            required=False,
+            metavar='<n>',
+            default=DEFAULT_MAX_BYTES,
+            help=f'Size limit of the read cache, least recently used reads are evicted past it (default {DEFAULT_MAX_BYTES}).')
+    parser.add_argument('--max_connections',
+            type=int,
+            required=False,
+            metavar='<n>',
+            default=DEFAULT_MAX_CONNECTIONS,
+            help=f'Maximum number of concurrent connections of the shared https/s3 sessions (default {DEFAULT_MAX_CONNECTIONS}, 0 disables the shared sessions).')
+    parser.add_argument('--crawl_workers',
+            type=int,
+            required=False,
+            metavar='<n>',
+            default=DEFAULT_CRAWL_WORKERS,
+            help=f'Number of directories listed concurrently when crawling the assets (default {DEFAULT_CRAWL_WORKERS}).')
+    parser.add_argument('--pipeline',
+            action='store_true',
+            required=False,
+            help='Run the crawl, parse and write stages concurrently (rows in discovery order).',
+            default=False)
+    parser.add_argument('--queue_size',
+            type=int,
+            required=False,
+            metavar='<n>',
+            default=DEFAULT_QUEUE_SIZE,
+            help=f'Number of assets/rows held between two stages of --pipeline (default {DEFAULT_QUEUE_SIZE}).')
 
     return parser
 
@@ -208,7 +451,7 @@ def get_engine(file_path):
         engine(str): xarray engine string.
     """
     if re.match('.*\.nc$', file_path):
-        return 'netcdf'
+        return 'netcdf4'
     elif re.match('.*\.grib$', file_path) or re.match('.*\.grb$', file_path):
         return 'cfgrib'
     elif re.match('.*\.zarr$', file_path):
@@ -220,21 +463,132 @@ def get_engine(file_path):
     else:
         raise ValueError(f'Cannot determine engine for file: {file_path}')
 
-def get_var_attrs(var):
+def is_time_coord(coord, attrs):
+    """Check if a coordinate is the time coordinate.
+
+    Args:
+        coord (str): coordinate name.
+        attrs (dict): coordinate attributes.
+
+    Returns:
+        bool: True for a time coordinate.
+    """
+    return attrs.get('standard_name') == 'time' or coord.lower() == 'time'
+
+def read_flat_values(var, flat_indices):
+    """Read single elements of a lazily indexed variable.
+
+    Args:
+        var (xarray.DataArray): variable to index, only the requested
+            elements are read from the backend.
+        flat_indices (list(int)): indices into the flattened variable.
+
+    Returns:
+        list: values at the requested indices.
+    """
+    values = []
+    for flat_index in flat_indices:
+        index = np.unravel_index(flat_index, var.shape)
+        values.append(var[index].values[()])
+    return values
+
+def get_time_summary(head, last, size):
+    """Build start_time, end_time and frequency from the time values needed.
+
+    Args:
+        head (list): first (and second) value of the flattened time coordinate.
+        last: last value of the flattened time coordinate.
+        size (int): number of time values.
+
+    Returns:
+        dict: start_time, end_time and frequency (only if size > 1).
+    """
+    time_summary = {'start_time': head[0], 'end_time': last}
+    if size > 1:
+        time_summary['frequency'] = head[1] - head[0]
+    return time_summary
+
+def get_coord_attrs(coord, attrs, size, read_values):
+    """Gets time and vertical level metadata of a single coordinate.
+
+    Only the first two and the last elements of a time coordinate are read.
+
+    Args:
+        coord (str): coordinate name.
+        attrs (dict): coordinate attributes.
+        size (int): number of elements of the coordinate.
+        read_values (callable): reads the (decoded) values at a list of
+            flat indices of the coordinate.
+
+    Returns:
+        dict: start_time/end_time/frequency for time coordinates and
+            level/level_units for vertical coordinates.
+    """
+    coord_attrs = {}
+    if is_time_coord(coord, attrs) and size > 0:
+        head = read_values(list(range(min(size, 2))))
+        last = read_values([size - 1])[0]
+        coord_attrs.update(get_time_summary(head, last, size))
+    if 'vertical_orientation' in attrs:
+        if 'standard_name' in attrs:
+            coord_attrs['level'] = attrs['standard_name']
+        if 'units' in attrs:
+            coord_attrs['level_units'] = attrs['units']
+    return coord_attrs
+
+def get_coord_summary(ds):
+    """Computes time and vertical level metadata once for every coordinate.
+
+    Args:
+        ds (xarray.Dataset): dataset (or DataArray) with coordinates.
+
+    Returns:
+        dict: coordinate name -> coordinate metadata (see get_coord_attrs).
+    """
+    coord_summary = {}
+    for coord in ds.coords:
+        cur_var = ds[coord]
+        coord_summary[coord] = get_coord_attrs(
+            coord,
+            cur_var.attrs,
+            cur_var.size,
+            lambda flat_indices, cur_var=cur_var: read_flat_values(cur_var, flat_indices)
+        )
+    return coord_summary
+
+def get_var_attrs(var, coord_summary=None):
     """Gets relevant metadata from xarray DataArray-like object.
 
     Args:
         var (xarray.core.dataarray.DataArray): Variable from which to pull attributes.
+        coord_summary (dict): Coordinate metadata shared by all variables of
+            the dataset (see get_coord_summary). Computed from var if None.
+
+    Returns:
+        dict: Contains variable level metadata
+    """
+    if coord_summary is None:
+        coord_summary = get_coord_summary(var)
+    return make_var_attrs(var.name, var.attrs, var.coords, coord_summary)
+
+def make_var_attrs(var_name, attrs, coords, coord_summary):
+    """Gets relevant metadata from the name, attributes and coordinates of a variable.
+
+    Args:
+        var_name (str): variable name.
+        attrs (dict): variable attributes.
+        coords (list(str)): coordinate names of the variable.
+        coord_summary (dict): coordinate metadata (see get_coord_summary).
 
     Returns:
         dict: Contains variable level metadata
     """
     var_attrs = {}
-    var_attrs['short_name'] = var.attrs.get('short_name', var.name)
-    var_attrs['long_name'] = var.attrs.get('long_name', NO_DATA_STR)
+    var_attrs['short_name'] = attrs.get('short_name', var_name)
+    var_attrs['long_name'] = attrs.get('long_name', NO_DATA_STR)
     if var_attrs['long_name'] == NO_DATA_STR:
-        var_attrs['long_name'] = var.attrs.get('description', NO_DATA_STR)
-    var_attrs['units'] = var.attrs.get('units', NO_DATA_STR)
+        var_attrs['long_name'] = attrs.get('description', NO_DATA_STR)
+    var_attrs['units'] = attrs.get('units', NO_DATA_STR)
     
     # Initialize time and level
     var_attrs['start_time'] = ''
@@ -242,23 +596,268 @@ def get_var_attrs(var):
     var_attrs['level'] = ''
     var_attrs['level_units'] = ''
     var_attrs['frequency'] = ''
-    for coord in var.coords:
-        cur_var = var[coord]
-        if 'standard_name' in cur_var.attrs and cur_var.standard_name == 'time' \
-                or coord.lower() == 'time':
-            time = cur_var.data.flatten()
-            var_attrs['start_time'] = time[0]
-            var_attrs['end_time'] = time[-1]
-            if len(time) > 1:
-                var_attrs['frequency'] = time[1] - time[0]
-        if 'vertical_orientation' in cur_var.attrs:
-            if 'standard_name' in cur_var.attrs:
-                var_attrs['level'] = cur_var.attrs['standard_name']
-            if 'units' in cur_var.attrs:
-                var_attrs['level_units'] = cur_var.attrs['units']
+    for coord in coords:
+        var_attrs.update(coord_summary[coord])
     return var_attrs
 
-def file_parser(file_path, data_format='netcdf', zarr_format:int=None, ignore_vars=None, var_metadata=None, global_metadata=None, use_cftime=False):
+def make_catalog_items(path_str, data_format, global_attrs, variables, coord_summary,
+                       ignore_vars, var_metadata, global_metadata):
+    """Builds the catalog items (one per data variable) of a dataset.
+
+    Args:
+        path_str (str): path written in the catalog.
+        data_format (str): data format written in the catalog.
+        global_attrs (dict): global attributes of the dataset.
+        variables (iterable): (name, attrs, coords) of every data variable.
+        coord_summary (dict): coordinate metadata (see get_coord_summary).
+        ignore_vars (list(str)): Variable names to ignore.
+        var_metadata (list(str)): Extra variable level metadata to pull.
+        global_metadata (list(str)): Extra global level metadata to pull.
+
+    Returns:
+        list(dict): catalog items.
+    """
+    catalog_items = []
+    for var_name, attrs, coords in variables:
+        # skip ignored variables
+        if var_name in ignore_vars:
+            continue
+
+        # create basic catalog item
+        # catalog_item = {'path':path_str, 'variable':var_name, 'format':data_format} # version before 2024.7.31
+        catalog_item = {'path':path_str, 'variable':var_name, 'format':data_format}
+
+        # add extra metadata(catalog columns) and its value for each variable
+        if len(var_metadata) > 0:
+            for attr in var_metadata:
+                if attr in attrs:
+                    catalog_item.update({attr:attrs[attr]})
+
+        # add extra global metadata(catalog columns) and its value for each variable
+        if len(global_metadata) > 0:
+            for attr in global_metadata:
+                # if attr in ds.attrs:
+                globalmeta= global_attrs.get(attr, NO_DATA_STR)
+                catalog_item.update({attr:globalmeta})
+
+        # add standard variable attributes
+        catalog_item.update(make_var_attrs(var_name, attrs, coords, coord_summary))
+        catalog_items.append(catalog_item)
+    return catalog_items
+
+def get_time_decoder(policy):
+    """Get the xarray decode_times argument of a time decoding policy.
+
+    Args:
+        policy (str): 'cftime', 'numpy' or 'off'.
+
+    Returns:
+        bool or xarray.coders.CFDatetimeCoder: decode_times argument.
+    """
+    if policy == 'cftime':
+        return xarray.coders.CFDatetimeCoder(use_cftime=True)
+    return policy == 'numpy'
+
+def decode_header(header, policy):
+    """Apply xarray CF decoding to the metadata of a dataset header.
+
+    The variables are decoded with placeholder data (only dtype and shape
+    matter), so attributes, coordinates and data variables come out exactly
+    as xarray.open_dataset would build them, without reading any data.
+
+    Args:
+        header (DatasetHeader): dataset header.
+        policy (str): time decoding policy ('cftime', 'numpy' or 'off').
+
+    Returns:
+        (dict, dict, list(str)): global attributes, decoded variables and
+            coordinate names.
+    """
+    placeholders = {
+        name: xarray.Variable(
+            var.dims, np.broadcast_to(np.zeros((), dtype=var.dtype), var.shape), var.attrs
+        )
+        for name, var in header.variables.items()
+    }
+    variables, attrs, coord_names = xarray.conventions.decode_cf_variables(
+        placeholders, header.attrs, decode_times=get_time_decoder(policy)
+    )
+    dims = set()
+    for var in variables.values():
+        dims.update(var.dims)
+    coords = [name for name in variables if name in coord_names or name in dims]
+    return attrs, variables, coords
+
+def read_header_values(header, name, flat_indices, policy):
+    """Read and CF decode values of a header variable.
+
+    Args:
+        header (DatasetHeader): dataset header.
+        name (str): variable name.
+        flat_indices (list(int)): indices into the flattened variable.
+        policy (str): time decoding policy ('cftime', 'numpy' or 'off').
+
+    Returns:
+        list: decoded values.
+    """
+    var = header.variables[name]
+    raw = xarray.Variable(('flat',), header.read_values(name, flat_indices), var.attrs)
+    decoded = xarray.conventions.decode_cf_variable(name, raw, decode_times=get_time_decoder(policy))
+    return list(decoded.values)
+
+def header_items(header, path_str, data_format, policy, ignore_vars, var_metadata, global_metadata):
+    """Builds the catalog items of a dataset header with a time decoding policy."""
+    attrs, variables, coords = decode_header(header, policy)
+    coord_summary = {}
+    for coord in coords:
+        coord_summary[coord] = get_coord_attrs(
+            coord,
+            variables[coord].attrs,
+            variables[coord].size,
+            lambda flat_indices, coord=coord: read_header_values(header, coord, flat_indices, policy)
+        )
+
+    # coordinates of a variable, in dataset order (as xarray DataArray.coords)
+    data_vars = []
+    for var_name, var in variables.items():
+        if var_name in coords:
+            continue
+        var_coords = [coord for coord in coords if set(variables[coord].dims) <= set(var.dims)]
+        data_vars.append((var_name, var.attrs, var_coords))
+
+    return make_catalog_items(
+        path_str, data_format, attrs, data_vars, coord_summary,
+        ignore_vars, var_metadata, global_metadata
+    )
+
+def header_parser(header, path_str, data_format, ignore_vars, var_metadata, global_metadata,
+                  use_cftime=False, decode_times=False, family=None):
+    """Builds the catalog items of a dataset header.
+
+    Produces the same items as file_parser does with xarray.open_dataset,
+    including the cftime fallback and the remembered decoding policy.
+
+    Args:
+        header (DatasetHeader): dataset header from a native reader.
+        path_str (str): path written in the catalog.
+        data_format (str): data format written in the catalog.
+        ignore_vars (list(str)): Variable names to ignore.
+        var_metadata (list(str)): Extra variable level metadata to pull.
+        global_metadata (list(str)): Extra global level metadata to pull.
+        use_cftime (bool): Whether to use cftime for time decoding.
+        decode_times (bool): Whether to decode time to numpy datetime64
+            when cftime is not used.
+        family (tuple): file family key, see get_file_family.
+
+    Returns:
+        list(dict): catalog items.
+    """
+    if not use_cftime:
+        policy = 'numpy' if decode_times else 'off'
+        return header_items(header, path_str, data_format, policy, ignore_vars, var_metadata, global_metadata)
+
+    policy = DECODE_POLICY_CACHE.get(family, 'cftime')
+    if policy == 'cftime':
+        try:
+            catalog_items = header_items(header, path_str, data_format, policy, ignore_vars, var_metadata, global_metadata)
+        except ValueError as e:
+            policy = 'off'
+            print(f'Warning: cftime decoding failed for file {path_str} with error: {e}. Falling back to no time decoding.')
+    if policy == 'off':
+        catalog_items = header_items(header, path_str, data_format, policy, ignore_vars, var_metadata, global_metadata)
+    DECODE_POLICY_CACHE[family] = policy
+    return catalog_items
+
+def get_file_family(file_path):
+    """Get the key grouping sibling files that share the same time encoding.
+
+    Args:
+        file_path(str): path of the file.
+
+    Returns:
+        tuple(str): directory and basename with digits masked.
+    """
+    dirname, basename = os.path.split(str(file_path).rstrip('/'))
+    return (dirname, re.sub('[0-9]+', '#', basename))
+
+def open_dataset_once(file_path, engine, backend_kwargs, use_cftime=False, decode_times=False, family=None):
+    """Open a dataset a single time, decoding time with the remembered policy.
+
+    With use_cftime the file is opened with undecoded time and the cftime
+    decoding is attempted in memory. On a ValueError the undecoded dataset
+    from the same open is used, so the file is never opened twice. The
+    chosen policy is remembered for the file family. Without use_cftime
+    time is decoded to numpy datetime64 with decode_times and left
+    undecoded otherwise.
+
+    Args:
+        file_path(str, mapper): path or mapper passed to xarray.
+        engine(str): xarray engine string.
+        backend_kwargs(dict): backend kwargs (decode_times is set here).
+        use_cftime(bool): whether to use cftime for time decoding.
+        decode_times(bool): whether to decode time to numpy datetime64
+            when cftime is not used.
+        family(tuple): file family key, see get_file_family.
+
+    Returns:
+        (xarray.Dataset, str): dataset and time decoding policy used
+            ('cftime', 'numpy' or 'off').
+    """
+    backend_kwargs = dict(backend_kwargs or {})
+    if not use_cftime:
+        if decode_times:
+            # xarray default decoding to numpy datetime64
+            ds = xarray.open_dataset(file_path, engine=engine, backend_kwargs=backend_kwargs or None)
+            return ds, 'numpy'
+        # time is left undecoded
+        backend_kwargs['decode_times'] = None
+        ds = xarray.open_dataset(file_path, engine=engine, backend_kwargs=backend_kwargs)
+        return ds, 'off'
+
+    backend_kwargs['decode_times'] = False
+    ds = xarray.open_dataset(file_path, engine=engine, backend_kwargs=backend_kwargs)
+    policy = DECODE_POLICY_CACHE.get(family, 'cftime')
+    if policy == 'cftime':
+        time_coder = xarray.coders.CFDatetimeCoder(use_cftime=True)
+        try:
+            decoded = xarray.decode_cf(
+                ds,
+                decode_times=time_coder,
+                mask_and_scale=False,
+                concat_characters=False,
+                decode_coords=False
+            )
+            ds = decoded
+        except ValueError as e:
+            policy = 'off'
+            print(f'Warning: cftime decoding failed for file {file_path} with error: {e}. Falling back to no time decoding.')
+    DECODE_POLICY_CACHE[family] = policy
+    return ds, policy
+
+def open_native_header(file_path, data_format, zarr_format=None):
+    """Open a dataset header with the native metadata reader of a data format.
+
+    Args:
+        file_path (str): path or URL of the asset.
+        data_format (str): data format of the asset.
+        zarr_format (int): zarr version (2 or 3) for zarr stores.
+
+    Returns:
+        DatasetHeader: header of the asset, None if no native reader applies
+            and the xarray path has to be used.
+    """
+    try:
+        if data_format == 'zarr':
+            return ZarrHeader(file_path, zarr_format=zarr_format)
+        if data_format == 'reference':
+            return ReferenceHeader(file_path)
+        if data_format == 'netcdf' and get_engine(file_path) == 'netcdf4':
+            return NetCDFHeader(file_path)
+    except (KeyError, OSError) as e:
+        print(f'Warning: native reader cannot read {file_path} ({e!r}). Falling back to xarray.')
+    return None
+
+def file_parser(file_path, data_format='netcdf', zarr_format:int=None, ignore_vars=None, var_metadata=None, global_metadata=None, use_cftime=False, decode_times=False, reader='xarray', timings=None):
     """File parser used in Builder object to extract column values.
 
     Args:
@@ -271,6 +870,15 @@ def file_parser(file_path, data_format='netcdf', zarr_format:int=None, ignore_va
         global_metadata (list(str)): Extra global level metadata to pull.
             ex: ['title', 'institution']
         use_cftime (bool): Whether to use cftime for time decoding.
+        decode_times (bool): Whether to decode time to numpy datetime64
+            when cftime is not used, time is left undecoded otherwise.
+        reader (str): 'xarray' opens the file with xarray.open_dataset,
+            'native' reads the metadata directly (zarr consolidated metadata,
+            kerchunk JSON/parquet references, netCDF files with netCDF4) and
+            falls back to xarray when it cannot.
+        timings (dict): if given, filled with the wall time spent opening
+            the asset ('open') and the reader used ('reader', 'fallback'
+            when the native reader could not be used).
     Returns:
         dict: Keys are column names and values specific to file.
     """
@@ -281,26 +889,45 @@ def file_parser(file_path, data_format='netcdf', zarr_format:int=None, ignore_va
         var_metadata = []
     if global_metadata is None:
         global_metadata = []
+    if timings is None:
+        timings = {}
 
-    catalog_items = []
     backend_kwargs = {}
 
     print(f'Gathering {file_path}')
     path_str = file_path
 
-    # set backend_kwarg for cftime decoding if option is set
-    if use_cftime:
-        time_coder = xarray.coders.CFDatetimeCoder(use_cftime=True)
-        backend_kwargs['decode_times'] = time_coder
-        try:
-            # test if cftime decoding works for this file
-            with xarray.open_dataset(file_path, engine=get_engine(file_path), backend_kwargs=backend_kwargs) as ds:
-                pass
-        except ValueError as e:
-            backend_kwargs['decode_times'] = False
-            print(f'Warning: cftime decoding failed for file {file_path} with error: {e}. Falling back to no time decoding.')
-    else:
-        backend_kwargs['decode_times'] = None
+    # sibling files share the time decoding policy
+    family = get_file_family(file_path)
+
+    if data_format == 'zarr':
+        if zarr_format is None:
+            zarr_format = 2
+        # change to https:// boreas internal end point if file_path is s3://
+        if re.match('s3://.*', file_path):
+            file_path = file_path.replace(
+                f's3://{BOREAS_BUCKET_NAME}/',
+                f'{BOREAS_ENDPOINT_URL}/{BOREAS_BUCKET_NAME}/'
+            )
+            path_str = file_path
+
+    # read metadata directly without xarray.open_dataset
+    header = None
+    if reader == 'native':
+        start = time.perf_counter()
+        header = open_native_header(file_path, data_format, zarr_format=zarr_format)
+        timings['open'] = time.perf_counter() - start
+        timings['fallback'] = header is None
+    if header is not None:
+        timings['reader'] = 'native'
+        print(f'Reading {data_format} metadata natively for file: {file_path}')
+        with header:
+            catalog_items = header_parser(
+                header, path_str, data_format, ignore_vars, var_metadata, global_metadata,
+                use_cftime=use_cftime, decode_times=decode_times, family=family
+            )
+        print(f'Number of catalog_items:{len(catalog_items)}')
+        return catalog_items
 
     # Handle reference case
     if data_format == 'reference':
@@ -317,28 +944,17 @@ def file_parser(file_path, data_format='netcdf', zarr_format:int=None, ignore_va
     # Handle zarr case with versioning option
     elif data_format == 'zarr':
         engine = 'zarr'
-        if zarr_format is None:
-            zarr_format = 2
         print(f'Handling zarr format for file: {file_path} with zarr_format: {zarr_format}')
         backend_kwargs['consolidated'] = True
         backend_kwargs['zarr_format'] = int(zarr_format)
-        
-        # change to https:// boreas internal end point if file_path is s3://
-        if re.match('s3://.*', file_path):
-            file_path = file_path.replace(
-                f's3://{BOREAS_BUCKET_NAME}/',
-                f'{BOREAS_ENDPOINT_URL}/{BOREAS_BUCKET_NAME}/'
-            )
-            path_str = file_path
+        # remote stores share the connections of the session pool when enabled
+        store = pooled_store(file_path)
+        if store is not None:
+            file_path = store
     else:
         print(f'Handling netcdf/grib format for file: {file_path}')
         engine = get_engine(file_path)
 
-    # if empty reset to None for xarray compatibility
-    if backend_kwargs == {}:
-        backend_kwargs = None
-        
-
     # try:
     #     xarray.open_dataset(file_path, engine=engine, backend_kwargs=backend_kwargs)
     # except Exception:
@@ -346,34 +962,22 @@ def file_parser(file_path, data_format='netcdf', zarr_format:int=None, ignore_va
     #         return catalog_items
     #     raise
 
-
-    with xarray.open_dataset(file_path, engine=engine, backend_kwargs=backend_kwargs) as ds:
-        for var_name in ds.data_vars:
-            # skip ignored variables
-            if var_name in ignore_vars:
-                continue
-
-            # create basic catalog item
-            # catalog_item = {'path':path_str, 'variable':var_name, 'format':data_format} # version before 2024.7.31
-            catalog_item = {'path':path_str, 'variable':var_name, 'format':data_format}
-            var = ds[var_name]
-
-            # add extra metadata(catalog columns) and its value for each variable
-            if len(var_metadata) > 0:
-                for attr in var_metadata:
-                    if attr in var.attrs:
-                        catalog_item.update({attr:var.attrs[attr]})
-
-            # add extra global metadata(catalog columns) and its value for each variable
-            if len(global_metadata) > 0:
-                for attr in global_metadata:
-                    # if attr in ds.attrs:
-                    globalmeta= ds.attrs.get(attr, NO_DATA_STR)
-                    catalog_item.update({attr:globalmeta})
-
-            # add standard variable attributes
-            catalog_item.update(get_var_attrs(var))
-            catalog_items.append(catalog_item)
+    start = time.perf_counter()
+    ds, _ = open_dataset_once(
+        file_path, engine, backend_kwargs, use_cftime=use_cftime, decode_times=decode_times, family=family
+    )
+    timings['open'] = timings.get('open', 0.) + time.perf_counter() - start
+    timings['reader'] = 'xarray'
+    with ds:
+        # time and level metadata shared by all variables
+        coord_summary = get_coord_summary(ds)
+        variables = (
+            (var_name, ds[var_name].attrs, ds[var_name].coords) for var_name in ds.data_vars
+        )
+        catalog_items = make_catalog_items(
+            path_str, data_format, ds.attrs, variables, coord_summary,
+            ignore_vars, var_metadata, global_metadata
+        )
 
     print(f'Number of catalog_items:{len(catalog_items)}')
 
@@ -421,182 +1025,201 @@ def convert_to_parquet(filename_base):
 #     json.dump(cat, open(json_file, 'w'))
 
 
-def make_remote_catalog(filename, catalog_data='reference', output_format='csv_and_json'):
-    """
-    Make OSDF and HTTP versions of a given file.
-
-    Parameters
-    ----------
-    filename : str
-        Local file path to the catalog file (csv or json).
-    catalog_data : str
-        The type of data to be cataloged, which determines how paths are modified.
-        Options are 'reference', 'zarr-boreas', and 'zarr-glade'. Default is 'reference'.
-    output_format : str
-        The format of the catalog file, which determines how the file is read and modified.
-        Options are 'csv_and_json' and 'single_json'. Default is 'csv_and_json'.
-        
-    Raises
-    ------
-    ValueError
-        If the filename does not follow the required naming convention
-        of {dataset_id}-posix{.csv/.json}.
-
-    Notes
-    -----
-    Assumes that the input filename contains paths. Both the OSDF and HTTP
-    versions will be created by replacing the local path prefix with the
-    appropriate remote path prefix. The posix protocol file name must be in
-    the format of 
-
-        {dataset_id}-{protocol}.csv or .json
-
-    Since the catalog file name is not foreced to be in that format,
-    The function will check for the filenaming convention to determine
-    if the file is valid for remote copy creation. if convention is not 
-    met, an error will be raised and the function will exit.
+def try_file_parser(file_path, **kwargs):
+    """Run file_parser, returning the exception instead of raising it.
 
+    Lets the caller know which asset of a worker chunk failed.
+
+    Returns:
+        (list(dict), Exception): catalog items and None, or None and the
+            exception raised by file_parser.
     """
-    print(f'Making remote copies of {filename}')
-    # find name before extension
-    filename_base = os.path.basename(filename)
-    # find output directory path
-    out_dir = os.path.dirname(filename)
-    # based on catalog output format get the dataset number
-    dataset_id = filename_base.split('-')[0]
+    try:
+        return file_parser(file_path, **kwargs), None
+    except Exception as e:
+        return None, e
 
-    # check output format
-    if output_format.lower() == 'csv_and_json':
-        output_ext = '.csv'
-    # elif output_format.lower() == 'parquet':
-    #     output_ext = '.parq'
-    elif output_format.lower() == 'single_json':
-        output_ext = '.json'
-    else:
-        raise ValueError(f'Unsupported output format: {output_format}')
+def timed_file_parser(file_path, trace_io=False, **kwargs):
+    """Run file_parser like try_file_parser, timing it for the build metrics.
 
-    # define output filenames
-    osdf_outfile = filename.replace(f'-posix{output_ext}', f'-osdf{output_ext}')
-    https_outfile = filename.replace(f'-posix{output_ext}', f'-https{output_ext}')
-    # check if catalog filename follows naming convention
-    if osdf_outfile == filename or https_outfile == filename:
-        raise ValueError(
-            f'Filename {filename} does not follow the required naming convention of {{dataset_id}}-posix{{.csv/.json}}'
-        )
+    Args:
+        file_path (str): asset path.
+        trace_io (bool): trace the fsspec I/O of the asset (see io_trace.py).
+        kwargs: file_parser arguments.
 
-    # define replacement strings and write new files
-    if catalog_data == 'reference':
-        match_str = '/glade/campaign/collections/gdex/data/'
-        https_str = 'https://data.gdex.ucar.edu/'
-        # osdf_str = 'https://data-osdf.gdex.ucar.edu/'
-        # osdf_str = 'osdf:///ncar/gdex/'
-        # read reference file from globus end point
-        osdf_str = https_str
-    elif catalog_data == 'zarr-boreas':
-        match_str = f'{BOREAS_ENDPOINT_URL}/{BOREAS_BUCKET_NAME}/'
-        https_str = 'https://osdata.gdex.ucar.edu/'
-        osdf_str = 'osdf:///ncar-gdex/'
-        # osdf_str = 'https://osdf-director.osg-htc.org/ncar-gdex/'
-    elif catalog_data == 'zarr-glade':
-        match_str = '/glade/campaign/collections/gdex/data/'
-        https_str = 'https://data.gdex.ucar.edu/'
-        osdf_str = 'osdf:///ncar/gdex/'
-        # osdf_str = 'https://osdf-director.osg-htc.org/ncar/gdex/'
+    Returns:
+        (list(dict), Exception, dict): catalog items, exception raised by
+            file_parser (or None) and timings of the asset (see file_parser,
+            plus the total wall time 'seconds' and the 'io' stats).
+    """
+    timings = {}
+    start = time.perf_counter()
+    if trace_io:
+        # no-op unless the worker is a fresh (spawned) process
+        enable_tracing()
+        with trace_asset(file_path) as timings['io']:
+            items, error = try_file_parser(file_path, timings=timings, **kwargs)
     else:
-        raise ValueError(f'Unsupported catalog data type: {catalog_data}')
-
-
-    if output_format.lower() == 'csv_and_json' :
-        # modify csv file line by line
-        with open(filename, 'r', encoding='utf-8') as fh:
-            osdf_fh = open(osdf_outfile, 'w', encoding='utf-8')
-            https_fh = open(https_outfile, 'w', encoding='utf-8')
-            for i in fh:
-                if i.split(',')[0].strip() == 'path':
-                    # write header line
-                    osdf_fh.write(i)
-                    https_fh.write(i)
-                    continue
-                # seperate each line by comma (assuming path is the first column)
-                url_https = i.split(',')[0]
-                # change the path (https protocol)
-                url_https = url_https.replace(match_str, https_str)
-                if catalog_data == 'reference':
-                    # change the basename to include protocol
-                    basename_https = os.path.basename(url_https)
-                    rename_basename_elem_https = basename_https.split('.')
-                    rename_basename_elem_https[-2] = rename_basename_elem_https[-2] + '-remote-https'
-                    rename_basename_https = '.'.join(rename_basename_elem_https)
-                    url_https = url_https.replace(basename_https, rename_basename_https)
-                # replace path in line
-                https_new_line = i.replace(i.split(',')[0], url_https)
-                # write new line
-                https_fh.write(https_new_line)
-
-                # seperate each line by comma (assuming path is the first column)
-                url_osdf = i.split(',')[0]
-                # change the path (osdf protocol)
-                url_osdf = url_osdf.replace(match_str, osdf_str)
-                if catalog_data == 'reference':
-                    # change the basename to include protocol
-                    basename_osdf = os.path.basename(url_osdf)
-                    rename_basename_elem_osdf = basename_osdf.split('.')
-                    rename_basename_elem_osdf[-2] = rename_basename_elem_osdf[-2] + '-remote-osdf'
-                    rename_basename_osdf = '.'.join(rename_basename_elem_osdf)
-                    url_osdf = url_osdf.replace(basename_osdf, rename_basename_osdf)
-                # replace path in line
-                osdf_new_line = i.replace(i.split(',')[0], url_osdf)
-                # write new line
-                osdf_fh.write(osdf_new_line)
-
-            osdf_fh.close()
-            https_fh.close()
-
-        # modify json file that is associated with csv
-        json_filename = os.path.join(out_dir, filename_base.replace('.csv', '.json'))
-        with open(json_filename) as fh:
-            data = json.load(fh)
-        # Create OSDF version dir structure need to be
-        #  https://data-osdf.gdex.ucar.edu/{dataset_id}/catalogs/{dataset_id}-osdf.csv
-        # data['catalog_file'] = f'{osdf_str}{dataset_id}/catalogs/{dataset_id}-osdf.csv'
-        data['catalog_file'] = f'{dataset_id}-osdf.csv'
-        osdf_outfile = json_filename.replace('-posix.json', '-osdf.json')
-        with open(osdf_outfile, 'w') as osdf_fh:
-            json.dump(data, osdf_fh)
-        # Create HTTPS version
-        #  https version dir structure need to be
-        #  https://data.gdex.ucar.edu/{dataset_id}/catalogs/{dataset_id}-https.csv
-        # data['catalog_file'] = f'{https_str}{dataset_id}/catalogs/{dataset_id}-https.csv'
-        data['catalog_file'] = f'{dataset_id}-https.csv'
-        https_outfile = json_filename.replace('-posix.json', '-https.json')
-        with open(https_outfile, 'w') as https_fh:
-            json.dump(data, https_fh)
-
-
-    # elif output_format.lower() == 'parquet':
-    #     df = pd.read_parquet(filename)
-    #     df_osdf = df.copy(deep=True)
-    #     df_https = df.copy(deep=True)
-    #     df_osdf['path'] = df_osdf['path'].str.replace(match_str, osdf_str)
-    #     df_https['path'] = df_https['path'].str.replace(match_str, https_str)
-    #     df_osdf.to_parquet(osdf_outfile)
-    #     df_https.to_parquet(https_outfile)
+        items, error = try_file_parser(file_path, timings=timings, **kwargs)
+    timings['seconds'] = time.perf_counter() - start
+    return items, error, timings
 
-    elif output_format.lower() == 'single_json':
-        with open(filename) as fh:
-            data = json.load(fh)
-        # Create OSDF version
-        data_osdf = json.loads(json.dumps(data).replace(match_str, osdf_str))
-        with open(osdf_outfile, 'w') as osdf_fh:
-            json.dump(data_osdf, osdf_fh)
-        # Create HTTPS version
-        data_https = json.loads(json.dumps(data).replace(match_str, https_str))
-        with open(https_outfile, 'w') as https_fh:
-            json.dump(data_https, https_fh)
+def _fingerprint_asset(tagged, cache):
+    """Fingerprint an (asset, journaled) pair of iter_parsed_assets, journaled assets are skipped."""
+    asset, done = tagged
+    return asset, done, None if done else cache.fingerprint(asset)
+
+def iter_parsed_assets(assets, parsing_kwargs, cache=None, executor='thread', workers=1, journal=None, metrics=None):
+    """Run file_parser over every asset, reusing cached rows when available.
+
+    Catalog items are yielded as soon as they are available, in asset order,
+    so only the items of the assets in flight are held in memory. Assets
+    are consumed lazily, they can be streamed by the crawler (--pipeline).
 
+    Args:
+        assets (iterable(str)): asset paths found by the crawler.
+        parsing_kwargs (dict): keyword arguments passed to file_parser.
+        cache (ParseCache): optional parse cache.
+        executor (str): worker pool used to parse assets ('thread' / 'process').
+        workers (int): number of workers, 1 parses serially.
+        journal (ParseJournal): optional journal, assets already journaled
+            are loaded from it and every other asset is journaled as soon as
+            its items are available (or it fails).
+        metrics (BuildMetrics): optional build metrics, every asset is
+            recorded with its timings (see build_metrics.py).
+
+    Yields:
+        list(dict): catalog items of each asset, in asset order.
+    """
+    tagged = ((asset, journal is not None and journal.contains(asset)) for asset in assets)
+    if cache is not None:
+        # fingerprinting is I/O bound (stat / object info), use threads
+        tagged = map_ordered(_fingerprint_asset, tagged, kwargs={'cache': cache}, executor='thread', workers=workers)
     else:
-        raise ValueError(f'Unsupported output format: {output_format}')
+        tagged = ((asset, done, None) for asset, done in tagged)
+    # where the items of each asset come from: journal, cache or parsed
+    sources = (
+        (asset, 'journal' if done else 'cache' if cache is not None and cache.contains(asset, fingerprint) else 'parsed',
+         fingerprint)
+        for asset, done, fingerprint in tagged
+    )
+    sources, todo = itertools.tee(sources)
+
+    # failures are returned so the failing asset can be journaled / recorded
+    guarded = journal is not None or metrics is not None
+    parser_kwargs = parsing_kwargs
+    if metrics is not None and metrics.io_tracer is not None:
+        parser_kwargs = dict(parsing_kwargs, trace_io=True)
+    parsed = map_ordered(
+        timed_file_parser if guarded else file_parser,
+        (asset for asset, source, _ in todo if source == 'parsed'),
+        kwargs=parser_kwargs,
+        executor=executor,
+        workers=workers
+    )
+    for asset, source, fingerprint in sources:
+        if source == 'journal':
+            items = journal.load(asset)
+            if metrics is not None:
+                metrics.add_file(asset, items, source='journal')
+            yield items
+            continue
+        if source == 'cache':
+            items = cache.load(asset)
+            if metrics is not None:
+                metrics.add_file(asset, items, source='cache')
+        else:
+            items = next(parsed)
+            if guarded:
+                items, error, timings = items
+                if metrics is not None:
+                    metrics.add_file(asset, items, timings=timings, error=error)
+                if error is not None:
+                    if journal is not None:
+                        journal.put_error(asset, error)
+                    raise error
+            if cache is not None:
+                cache.put(asset, fingerprint, items)
+        if journal is not None:
+            journal.put(asset, items)
+        yield items
+
+def parse_assets(assets, parsing_kwargs, cache=None, executor='thread', workers=1):
+    """Run file_parser over every asset, see iter_parsed_assets.
+
+    Returns:
+        list(list(dict)): catalog items of each asset, in asset order.
+    """
+    return list(iter_parsed_assets(assets, parsing_kwargs, cache=cache, executor=executor, workers=workers))
+
+def iter_catalog_rows(entries):
+    """Flatten the catalog items of every asset, skipping empty items.
+
+    Args:
+        entries (iterable(list(dict))): catalog items of each asset.
 
+    Yields:
+        dict: catalog row.
+    """
+    for items in entries:
+        for item in items:
+            if item:
+                yield item
+
+def parse_shard(value):
+    """Parse a --shard value 'i/N' (shard i of N, 0 <= i < N).
+
+    Returns:
+        (int, int): shard index and number of shards.
+    """
+    try:
+        index, nshards = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid shard {value!r}, expected i/N e.g. 0/8')
+    if nshards < 1 or not 0 <= index < nshards:
+        raise argparse.ArgumentTypeError(f'invalid shard {value!r}, i must be in 0..N-1')
+    return index, nshards
+
+def shard_assets(assets, index, nshards):
+    """Assets of a shard, partitioned by a hash of their path.
+
+    The hash does not depend on the process or on the other assets, so
+    every job of a sharded build gets a disjoint part of the asset list.
+
+    Args:
+        assets (list(str)): asset paths found by the crawler.
+        index (int): shard index (0 <= index < nshards).
+        nshards (int): number of shards.
+
+    Returns:
+        list(str): assets of the shard, in the order of assets.
+    """
+    return [asset for asset in assets if in_shard(asset, index, nshards)]
+
+def in_shard(asset, index, nshards):
+    """Check if an asset belongs to shard index of nshards, see shard_assets."""
+    return int.from_bytes(hashlib.md5(asset.encode('utf-8')).digest()[:8], 'big') % nshards == index
+
+def shard_catalog_name(catalog_name, index, nshards):
+    """Name of the partial catalog written by a shard (see merge_catalog.py)."""
+    return f'{catalog_name}.shard-{index}-of-{nshards}'
+
+def stage(build_metrics, name):
+    """Context timing a build stage, no-op without build metrics."""
+    if build_metrics is None:
+        return nullcontext()
+    return build_metrics.stage(name)
+
+def write_build_metrics(build_metrics, metrics, status):
+    """Finish the build metrics, print them and write them to the --metrics files."""
+    if build_metrics is None:
+        return
+    build_metrics.finish(status)
+    if build_metrics.io_tracer is not None:
+        disable_tracing()
+    print(build_metrics.report())
+    if metrics:
+        build_metrics.write(metrics)
 
 def create_catalog(
     directories,
@@ -610,6 +1233,26 @@ def create_catalog(
     description='',
     make_remote=False,
     output_format='csv_and_json',
+    cache=None,
+    rebuild=False,
+    workers=1,
+    executor='thread',
+    batch_size=DEFAULT_BATCH_SIZE,
+    partition_by=None,
+    protocols=None,
+    protocol_config=None,
+    journal=None,
+    resume=False,
+    shard=None,
+    index=False,
+    metrics=None,
+    trace_io=False,
+    cache_dir=None,
+    cache_max_bytes=DEFAULT_MAX_BYTES,
+    max_connections=DEFAULT_MAX_CONNECTIONS,
+    crawl_workers=DEFAULT_CRAWL_WORKERS,
+    pipeline=False,
+    queue_size=DEFAULT_QUEUE_SIZE,
     **kwargs
 ):
     """Creates an intake esm catalog from a collection assets.
@@ -623,6 +1266,41 @@ def create_catalog(
         catalog_name (str): filename of catalog
         description (str): short description of catalog.
         make_remote (bool): make OSDF and HTTP versions of this dataset
+        cache (str): SQLite file caching parsed rows between runs
+        rebuild (bool): ignore cached rows and re-parse every asset
+        workers (int): number of workers parsing assets concurrently
+        executor (str): worker pool used when workers > 1 (thread / process)
+        batch_size (int): number of catalog rows held in memory before being
+            written to the csv/parquet file
+        partition_by (str): parquet output only, column whose values get
+            their own row groups (e.g. 'variable')
+        protocols (list(str)): remote protocols written with make_remote,
+            default protocols of catalog_data by default
+        protocol_config (str): json string/file added to the protocol registry
+        journal (str): SQLite file journaling every parsed asset as soon as
+            it is parsed
+        resume (bool): skip the assets of the journal (default
+            {out}/{catalog_name}.journal) parsed by a previous run
+        shard (tuple(int)): (i, N) only parse the assets of shard i of N and
+            write the partial catalog {catalog_name}.shard-i-of-N, the
+            shards are combined by merge_catalog.py
+        index (bool): write the search index of the csv/parquet catalog and
+            of its remote copies (see catalog_index.py)
+        metrics (list(str)): files of the build metrics report, json or
+            Prometheus textfile for .prom files (see build_metrics.py)
+        trace_io (bool): trace the fsspec requests, bytes and latency of
+            every asset and stage, printed with the build metrics (see io_trace.py)
+        cache_dir (str): directory caching the remote reads of the native
+            reader between runs, only with reader='native' (see read_cache.py)
+        cache_max_bytes (int): size limit of the read cache
+        max_connections (int): maximum number of concurrent connections of
+            the shared https/s3 filesystems, 0 disables them (see session_pool.py)
+        crawl_workers (int): number of directories listed concurrently when
+            crawling the assets (see crawler.py)
+        pipeline (bool): run the crawl, parse and write stages concurrently,
+            rows are written in discovery order (see pipeline.py)
+        queue_size (int): number of assets/rows held between two stages
+            of the pipeline
         kwargs: Aditional parsing function arguments
     """
     print(kwargs)
@@ -631,6 +1309,23 @@ def create_catalog(
         if 's3://' in directory and not storage_options:
             raise ValueError(f"Directory {directory} is an s3 path but no storage options were provided.")
 
+    if index and output_format.lower() == 'single_json':
+        raise ValueError('The search index needs the csv_and_json or parquet output format')
+
+    if cache_dir and kwargs.get('reader', 'xarray') != 'native':
+        # xarray.open_dataset reads through its own backends, not the read cache
+        raise ValueError('--cache_dir caches the reads of the native reader, use it with --reader native')
+
+    if make_remote:
+        # fail before parsing when catalog_data or a protocol is not in the registry
+        get_remote_protocols(load_protocol_registry(protocol_config), catalog_data, protocols)
+
+    build_metrics = None
+    if metrics or trace_io:
+        build_metrics = BuildMetrics(catalog_name, io_tracer=IOTracer() if trace_io else None)
+    if trace_io:
+        enable_tracing(build_metrics.io_tracer)
+
     b = ecgtools.Builder(
         paths=directories,
         depth=depth,
@@ -638,79 +1333,199 @@ def create_catalog(
         exclude_patterns=exclude,
         storage_options=storage_options
     )
-    b.build(parsing_func=file_parser, parsing_func_kwargs=kwargs)
-
-
-    # extract individual variables dicts and combine
-    new_df = pd.DataFrame(columns=b.df[0][0].keys())
-    dict_list = []
-    for i,d in b.df.iterrows():
-        for j in d:
-            if j:
-                dict_list.append(j)
-    b.df = new_df.from_records(dict_list)
-    # print(b.df)
+    crawler = Crawler(
+        directories, depth=depth, include=include, exclude=exclude, storage_options=storage_options,
+        workers=crawl_workers
+    )
+    if pipeline:
+        # assets are streamed to the parsers while the tree is crawled
+        assets = produce(unique(crawler.iter_assets()), maxsize=queue_size, name='crawl')
+    else:
+        with stage(build_metrics, 'crawl'):
+            assets = crawler.crawl()
+        print(f'Number of assets: {len(assets)} ({crawler.listed} directories listed)')
+
+    if shard is not None:
+        if output_format.lower() == 'single_json':
+            raise ValueError('Sharded builds need the csv_and_json or parquet output format')
+        if pipeline:
+            assets = (asset for asset in assets if in_shard(asset, *shard))
+        else:
+            assets = shard_assets(assets, *shard)
+            print(f'Shard {shard[0]}/{shard[1]}: {len(assets)} assets')
+        catalog_name = shard_catalog_name(catalog_name, *shard)
 
-    if output_format.lower() == 'csv_and_json':
+    if output_format.lower() in ['csv_and_json', 'parquet']:
         catalog_type = 'file'
     elif output_format.lower() == 'single_json':
         catalog_type = 'dict'
     else:
         raise ValueError(f'Unsupported output format: {output_format}')
 
-    # local ecgtools install from the https://github.com/rpconroy/ecgtools
-    b.save(
-        name=catalog_name,
-        path_column_name='path',
-        variable_column_name='variable',
-        format_column_name='format',
-        data_format=kwargs['data_format'],
-        groupby_attrs=[
-            'variable',
-            'short_name'
-        ],
-        aggregations=[
-            {'type': 'union', 'attribute_name': 'variable'},
-            {
-                'type': 'join_existing',
-                'attribute_name': 'time_range',
-                'options': {'dim': 'time', 'coords': 'minimal', 'compat': 'override'},
-            },
-        ],
-        catalog_type=catalog_type,
-        description=description,
-        directory=out
-    )
-
-
-    
-    # if output_format == 'parquet':
-    #     convert_to_parquet(os.path.join(out,f'{catalog_name}'))
+    # parse assets (only new or changed assets when a parse cache is used)
+    # and stream the rows to the catalog file
+    parse_cache = None
+    if cache:
+        parse_cache = ParseCache(cache, parsing_kwargs=kwargs, rebuild=rebuild, storage_options=storage_options)
+    # journal parsed assets so a build that dies can be resumed
+    parse_journal = None
+    if resume and not journal:
+        journal = os.path.join(out, f'{catalog_name}.journal')
+    if journal:
+        parse_journal = ParseJournal(journal, parsing_kwargs=kwargs, resume=resume)
+    # cache the remote reads of the native reader between runs
+    read_cache = None
+    if cache_dir:
+        read_cache = enable_read_cache(cache_dir, cache_max_bytes, storage_options=storage_options)
+    # share the remote connections between the assets
+    if max_connections:
+        enable_session_pool(storage_options, max_connections)
+    def new_writer(filename):
+        if output_format.lower() == 'parquet':
+            return ParquetCatalogWriter(filename, batch_size=batch_size, partition_by=partition_by)
+        return CatalogWriter(filename, batch_size=batch_size)
+
+    writer = None
+    remote_writers = []
+    try:
+        rows = iter_catalog_rows(iter_parsed_assets(
+            assets, kwargs, cache=parse_cache, executor=executor, workers=workers, journal=parse_journal,
+            metrics=build_metrics
+        ))
+        if pipeline:
+            # rows are streamed to the writers while the assets are parsed
+            rows = produce(rows, maxsize=queue_size, name='parse')
+        if build_metrics is not None:
+            rows = build_metrics.timed('parse', rows)
+        if catalog_type == 'file':
+            writer = new_writer(os.path.join(out, f'{catalog_name}{get_output_ext(output_format)}'))
+        if pipeline and make_remote and shard is None and writer is not None:
+            # the remote copies are written from the streamed rows
+            match_str, remote, targets = get_remote_targets(
+                writer.out_file, catalog_data, output_format, protocols, protocol_config
+            )
+            for outfile, remote_str, basename_suffix in targets:
+                remote_writers.append(RemoteCatalogWriter(
+                    new_writer(outfile), PATH_COLUMNS, match_str, remote_str, basename_suffix
+                ))
+        with stage(build_metrics, 'assemble'):
+            if writer is not None:
+                writer.write_rows(tee_rows(rows, remote_writers))
+                writer.flush()
+                # the json descriptor only needs the columns, rows are in the writer
+                b.df = pd.DataFrame(columns=writer.columns)
+                if shard is not None and not writer.columns:
+                    # an empty shard still writes its (empty) partial catalog
+                    b.df = pd.DataFrame(columns=['path', 'variable', 'short_name'])
+                print(f'Number of catalog rows: {writer.nrows}')
+            else:
+                # rows are embedded in the json file
+                b.df = pd.DataFrame.from_records(list(rows))
+
+        with stage(build_metrics, 'save'):
+            # local ecgtools install from the https://github.com/rpconroy/ecgtools
+            b.save(
+                name=catalog_name,
+                path_column_name='path',
+                variable_column_name='variable',
+                format_column_name='format',
+                data_format=kwargs['data_format'],
+                groupby_attrs=[
+                    'variable',
+                    'short_name'
+                ],
+                aggregations=[
+                    {'type': 'union', 'attribute_name': 'variable'},
+                    {
+                        'type': 'join_existing',
+                        'attribute_name': 'time_range',
+                        'options': {'dim': 'time', 'coords': 'minimal', 'compat': 'override'},
+                    },
+                ],
+                catalog_type=catalog_type,
+                description=description,
+                directory=out
+            )
+            if writer is not None:
+                # replace the empty csv written by save with the streamed rows
+                writer.close()
+                if output_format.lower() == 'parquet':
+                    os.remove(os.path.join(out, f'{catalog_name}.csv'))
+            for remote_writer in remote_writers:
+                remote_writer.close()
+    except BaseException:
+        if writer is not None:
+            writer.discard()
+        for remote_writer in remote_writers:
+            remote_writer.discard()
+        write_build_metrics(build_metrics, metrics, 'failed')
+        raise
+    finally:
+        if parse_cache is not None:
+            parse_cache.close()
+            print(parse_cache.report())
+        if parse_journal is not None:
+            parse_journal.close()
+            print(parse_journal.report())
+        if read_cache is not None:
+            print(read_cache.report())
+            disable_read_cache()
+        disable_session_pool()
 
 
     # check output format
     if output_format.lower() == 'csv_and_json':
         file_ext = 'csv'
-    # elif output_format.lower() == 'parquet':
-    #     output_ext = '.parq'
+    elif output_format.lower() == 'parquet':
+        file_ext = 'parquet'
     elif output_format.lower() == 'single_json':
         file_ext = 'json'
     else:
         raise ValueError(f'Unsupported output format: {output_format}')
     
-    # change the json file catalog_file entry
-    if output_format.lower() == 'csv_and_json':
-        # modify json file
-        jsonfile = os.path.join(out, f"{catalog_name}.json")
-        with open(jsonfile) as fh:
-            data = json.load(fh)
-        data['catalog_file'] = f'{catalog_name}.csv'
-        with open(jsonfile, 'w') as fh:
-            json.dump(data, fh)
-
-    if make_remote:
-        remote_catalog_file = os.path.join(out,f'{catalog_name}.{file_ext}')
-        make_remote_catalog(remote_catalog_file, catalog_data=catalog_data, output_format=output_format)
+    try:
+        with stage(build_metrics, 'save'):
+            # change the json file catalog_file entry
+            if output_format.lower() in ['csv_and_json', 'parquet']:
+                # modify json file
+                jsonfile = os.path.join(out, f"{catalog_name}.json")
+                with open(jsonfile) as fh:
+                    data = json.load(fh)
+                data['catalog_file'] = f'{catalog_name}.{file_ext}'
+                with open(jsonfile, 'w') as fh:
+                    json.dump(data, fh)
+
+        catalog_files = [os.path.join(out, f'{catalog_name}.{file_ext}')]
+        if make_remote and shard is not None:
+            print('Remote copies are made when the shards are merged (merge_catalog.py --make_remote)')
+        elif remote_writers:
+            with stage(build_metrics, 'remote'):
+                # the remote catalog files were written by the pipeline, only their json is missing
+                make_remote_json(
+                    jsonfile, catalog_name.split('-')[0], f'.{file_ext}', [protocol for protocol, _, _ in remote]
+                )
+                catalog_files += [remote_writer.writer.out_file for remote_writer in remote_writers]
+        elif make_remote:
+            with stage(build_metrics, 'remote'):
+                remote_catalog_file = os.path.join(out,f'{catalog_name}.{file_ext}')
+                catalog_files += make_remote_catalog(
+                    remote_catalog_file,
+                    catalog_data=catalog_data,
+                    output_format=output_format,
+                    protocols=protocols,
+                    protocol_config=protocol_config
+                )
+
+        if index and shard is not None:
+            print('The search index is written when the shards are merged (merge_catalog.py --index)')
+        elif index:
+            with stage(build_metrics, 'index'):
+                for catalog_file in catalog_files:
+                    build_index(catalog_file)
+    except BaseException:
+        write_build_metrics(build_metrics, metrics, 'failed')
+        raise
+    write_build_metrics(build_metrics, metrics, 'ok')
 
 
 def main(args_list):
@@ -722,6 +1537,9 @@ def main(args_list):
     Returns:
         (dict, generally) : result of argument call.
     """
+    # setup logging (in main only, importing this module configures nothing)
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
     parser = get_parser()
     if len(args_list) == 0:
         parser.print_help()
@@ -0,0 +1,50 @@
+"""Lightweight dataset headers used by the native metadata readers.
+
+A header holds the global attributes and the dimensions, shape, dtype and
+attributes of every variable of a dataset, as an xarray backend would hand
+them to the CF decoding step. Values are only read on request, by flat
+index, so a reader never has to load a whole coordinate.
+
+create_catalog.header_parser turns a header into the same catalog rows that
+file_parser builds from xarray.open_dataset.
+"""
+
+from collections import namedtuple
+
+
+# dims (tuple(str)), shape (tuple(int)), dtype (numpy.dtype), attrs (dict)
+VariableHeader = namedtuple('VariableHeader', ['dims', 'shape', 'dtype', 'attrs'])
+
+
+class DatasetHeader:
+    """Attributes and variable metadata of a single dataset.
+
+    Args:
+        attrs (dict): global attributes.
+        variables (dict): variable name -> VariableHeader, in dataset order.
+    """
+
+    def __init__(self, attrs, variables):
+        self.attrs = attrs
+        self.variables = variables
+
+    def read_values(self, name, flat_indices):
+        """Read raw (undecoded) values of a variable.
+
+        Args:
+            name (str): variable name.
+            flat_indices (list(int)): indices into the flattened variable.
+
+        Returns:
+            numpy.ndarray: raw values at the requested indices.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resource held by the reader."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
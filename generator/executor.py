@@ -0,0 +1,77 @@
+"""Executor layer used by create_catalog.py to run file_parser concurrently.
+
+Assets are submitted to a thread or process pool in chunks and the results
+are yielded back in submission order, so the catalog content does not
+depend on the number of workers.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+EXECUTORS = {
+    'thread': ThreadPoolExecutor,
+    'process': ProcessPoolExecutor,
+}
+
+# number of assets sent to a worker in a single task
+DEFAULT_CHUNKSIZE = 8
+
+
+def chunked(items, chunksize):
+    """Split an iterable into lists of at most chunksize items.
+
+    Args:
+        items (iterable): items to split.
+        chunksize (int): maximum number of items per chunk.
+
+    Yields:
+        list: consecutive chunks of items.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _run_chunk(func, chunk, kwargs):
+    """Apply func to every item of a chunk (runs inside the worker)."""
+    return [func(item, **kwargs) for item in chunk]
+
+
+def map_ordered(func, items, kwargs=None, executor='thread', workers=1, chunksize=DEFAULT_CHUNKSIZE):
+    """Apply func(item, **kwargs) to every item and yield results in item order.
+
+    Args:
+        func (callable): function to apply, must be picklable for the process executor.
+        items (iterable): items to process.
+        kwargs (dict): extra keyword arguments passed to func.
+        executor (str): 'thread' or 'process'.
+        workers (int): number of workers, 1 runs serially in the calling process.
+        chunksize (int): number of items submitted per task.
+
+    Yields:
+        result of func for each item, in the order of items.
+    """
+    kwargs = kwargs or {}
+    if executor not in EXECUTORS:
+        raise ValueError(f'Unsupported executor: {executor}')
+
+    if workers is None or workers <= 1:
+        for item in items:
+            yield func(item, **kwargs)
+        return
+
+    with EXECUTORS[executor](max_workers=workers) as pool:
+        # bound the number of chunks in flight so results do not pile up
+        pending = deque()
+        for chunk in chunked(items, chunksize):
+            pending.append(pool.submit(_run_chunk, func, chunk, kwargs))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
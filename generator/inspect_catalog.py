@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""Print a summary of intake-esm catalogs of create_catalog.py.
+
+Usage:
+
+python inspect_catalog.py <json file/catalog file> [<json file/catalog file> ...]
+    [--columns <column> ...]
+
+Notes:
+- the summary holds the id, description and catalog file of the json file,
+  then the number of rows, the columns, the number of distinct values of
+  the --columns (default: path and variable) and the time span of the rows
+  (smallest start_time to largest end_time).
+- csv catalogs are streamed with the csv module, parquet catalogs are read
+  one row group at a time (only the needed columns), single json catalogs
+  from their catalog_dict. pyarrow is only imported for parquet catalogs.
+- json and catalog files can be local paths or fsspec URLs, e.g. the https
+  catalogs of data.gdex.ucar.edu.
+
+Example:
+python inspect_catalog.py catalog/d640000-posix.json --columns variable units
+"""
+
+import os
+import csv
+import sys
+import json
+import argparse
+
+import fsspec
+
+
+# columns whose distinct values are counted by default
+DEFAULT_COLUMNS = ['path', 'variable']
+
+# columns of the time span of the rows
+TIME_COLUMNS = ('start_time', 'end_time')
+
+
+def time_key(value):
+    """Sort key of start_time/end_time cells, numbers (undecoded times) before text."""
+    try:
+        return (0, float(value), '')
+    except (TypeError, ValueError):
+        return (1, 0., str(value))
+
+
+def catalog_file_of(json_file, data):
+    """Catalog file referenced by the catalog_file entry of a json file."""
+    catalog_file = data['catalog_file']
+    if '://' in catalog_file or os.path.isabs(catalog_file):
+        return catalog_file
+    return f'{os.path.dirname(json_file)}/{catalog_file}'
+
+
+def iter_csv_rows(catalog_file):
+    """Columns of a csv catalog and an iterator over its rows (dict of text cells)."""
+    with fsspec.open(catalog_file, 'r', newline='', encoding='utf-8') as fh:
+        reader = csv.DictReader(fh)
+        yield reader.fieldnames or []
+        yield from reader
+
+
+def iter_parquet_rows(catalog_file, columns):
+    """Columns of a parquet catalog and an iterator over the given columns of its rows."""
+    import pyarrow.parquet as pq
+    with fsspec.open(catalog_file, 'rb') as fh:
+        parquet_file = pq.ParquetFile(fh)
+        names = parquet_file.schema_arrow.names
+        yield names
+        for i in range(parquet_file.num_row_groups):
+            # decoded in this thread, pyarrow threads reading a python file
+            # object can abort the interpreter at exit
+            table = parquet_file.read_row_group(
+                i, columns=[column for column in columns if column in names], use_threads=False
+            )
+            yield from table.to_pylist()
+
+
+def iter_json_rows(rows):
+    """Columns of single json catalog rows and an iterator over them."""
+    columns = []
+    for row in rows:
+        columns.extend(column for column in row if column not in columns)
+    yield columns
+    yield from rows
+
+
+def inspect_catalog(source, columns=None):
+    """Summary of a catalog.
+
+    Args:
+        source (str): json file, or csv/parquet catalog file.
+        columns (list(str)): columns whose distinct values are counted
+            (default: path and variable).
+
+    Returns:
+        dict: id, description, catalog_file, rows, columns, the distinct
+            value count of each of the columns ('distinct') and the time
+            span ('time_range', None without times).
+    """
+    columns = DEFAULT_COLUMNS if columns is None else columns
+    summary = {'source': source, 'id': None, 'description': None, 'catalog_file': source}
+    rows = None
+    if source.endswith('.json'):
+        with fsspec.open(source, 'r') as fh:
+            data = json.load(fh)
+        summary['id'] = data.get('id')
+        summary['description'] = data.get('description')
+        if 'catalog_dict' in data:
+            # single json catalog, the rows are in the json file
+            summary['catalog_file'] = None
+            rows = iter_json_rows(data['catalog_dict'])
+        else:
+            summary['catalog_file'] = catalog_file_of(source, data)
+    if rows is None:
+        if summary['catalog_file'].endswith('.parquet'):
+            rows = iter_parquet_rows(summary['catalog_file'], list(columns) + list(TIME_COLUMNS))
+        elif summary['catalog_file'].endswith('.csv'):
+            rows = iter_csv_rows(summary['catalog_file'])
+        else:
+            raise ValueError(f"Unsupported catalog file: {summary['catalog_file']}")
+
+    summary['columns'] = next(rows)
+    distinct = {column: set() for column in columns}
+    nrows = 0
+    start = end = None
+    for row in rows:
+        nrows += 1
+        for column, values in distinct.items():
+            values.add(row.get(column))
+        value = row.get('start_time')
+        if value not in (None, ''):
+            start = value if start is None else min(start, value, key=time_key)
+        value = row.get('end_time')
+        if value in (None, ''):
+            value = row.get('start_time')
+        if value not in (None, ''):
+            end = value if end is None else max(end, value, key=time_key)
+    summary['rows'] = nrows
+    summary['distinct'] = {
+        column: len(values - {None, ''}) for column, values in distinct.items() if column in summary['columns']
+    }
+    summary['time_range'] = None if start is None else (str(start), str(end))
+    return summary
+
+
+def format_summary(summary):
+    """Text of a catalog summary, one line per entry."""
+    lines = [summary['source']]
+    for key in ['id', 'description', 'catalog_file', 'rows']:
+        if summary[key] is not None:
+            lines.append(f'  {key}: {summary[key]}')
+    lines.append(f"  columns: {', '.join(summary['columns'])}")
+    for column, count in summary['distinct'].items():
+        lines.append(f'  distinct {column}: {count}')
+    if summary['time_range'] is not None:
+        lines.append(f"  time range: {summary['time_range'][0]} to {summary['time_range'][1]}")
+    return '\n'.join(lines)
+
+
+def get_parser():
+    """Creates and returns the argparse parser."""
+    parser = argparse.ArgumentParser(description='Print a summary of intake-esm catalogs.')
+    parser.add_argument('sources', nargs='+', metavar='<json file/catalog file>',
+                        help='Catalogs to inspect (local paths or fsspec URLs).')
+    parser.add_argument('--columns', nargs='+', default=DEFAULT_COLUMNS, metavar='<column>',
+                        help='Columns whose distinct values are counted.')
+    return parser
+
+
+def main(args_list):
+    """Use command line-like arguments to execute."""
+    args = get_parser().parse_args(args_list)
+    for source in args.sources:
+        print(format_summary(inspect_catalog(source, columns=args.columns)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
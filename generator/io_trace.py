@@ -0,0 +1,310 @@
+"""Opt-in tracing of the fsspec I/O of create_catalog.py (--trace_io).
+
+While tracing is enabled, the I/O methods of the fsspec filesystems
+(local, http/https, s3) and of their file objects are wrapped, and every
+call is recorded as a request with its bytes, whether it is a range read
+and its latency. Reference filesystems are traced through the filesystems
+of the reference file and of its targets, so a chunk read through a
+kerchunk reference is counted once, as the read of its target.
+
+Calls are attributed to:
+- the asset being parsed by the calling thread (or asyncio task, fsspec
+  calls run on the fsspec event loop carry the asset of their caller),
+- else the asset in flight whose path is part of the requested path
+  (e.g. zarr v3 reads a store from its own event loop),
+- else the current stage of the build (crawl, save, remote, ...).
+
+netCDF files read by netCDF4/h5py directly do not go through fsspec and
+are not traced. Nested calls (e.g. LocalFileSystem.cat_file opening the
+file and reading it) are counted once.
+"""
+
+import inspect
+import functools
+import importlib
+import threading
+from time import perf_counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import fsspec
+import fsspec.asyn
+
+
+# protocols whose filesystems are traced
+TRACED_PROTOCOLS = ('file', 'http', 'https', 's3')
+
+# filesystem methods traced: name -> True for reads (bytes counted), False
+# for metadata requests. Async filesystems are traced through their
+# coroutines, the sync methods fsspec generates from them are not wrapped.
+ASYNC_METHODS = {'_cat_file': True, '_info': False, '_ls': False, '_exists': False}
+SYNC_METHODS = {'cat_file': True, 'info': False, 'ls': False}
+
+# file object methods traced (module, class, method)
+FILE_METHODS = [
+    ('fsspec.implementations.local', 'LocalFileOpener', 'read'),
+    ('fsspec.implementations.http', 'HTTPFile', '_fetch_range'),
+    ('s3fs.core', 'S3File', '_fetch_range'),
+]
+
+# I/O stats of the asset being parsed
+_ASSET = ContextVar('io_trace_asset', default=None)
+# > 0 inside a traced call, nested calls are not counted
+_DEPTH = ContextVar('io_trace_depth', default=0)
+
+_lock = threading.Lock()
+# assets in flight: id -> (path without protocol, stats)
+_active = {}
+# (class, method name, original attribute or None if inherited)
+_patched = []
+_original_sync = None
+_tracer = None
+
+
+def new_stats():
+    """Empty I/O stats."""
+    return {'requests': 0, 'bytes': 0, 'range_reads': 0, 'seconds': 0.}
+
+
+def add_stats(total, stats):
+    """Add I/O stats to a total (in place), returns the total."""
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def strip_protocol(path):
+    """Path without its protocol and trailing slash."""
+    path = str(path)
+    if '://' in path:
+        path = path.split('://', 1)[1]
+    return path.rstrip('/')
+
+
+class IOTracer:
+    """I/O of a build by stage.
+
+    The calls that are not made for an asset are counted in the current
+    stage, the stats of every asset are added by the caller (add).
+    """
+
+    def __init__(self):
+        self.stage = None
+        self.stages = {}
+
+    def add(self, stage, stats):
+        """Add I/O stats to a stage."""
+        with _lock:
+            add_stats(self.stages.setdefault(stage, new_stats()), stats)
+
+    def total(self):
+        """I/O stats of the whole build."""
+        total = new_stats()
+        for stats in self.stages.values():
+            add_stats(total, stats)
+        return total
+
+    def to_dict(self):
+        """Stats by stage and total, json serializable."""
+        return {'stages': self.stages, 'total': self.total()}
+
+    def report(self):
+        """Summary string of the I/O of the build."""
+        total = self.total()
+        return (f'{total["requests"]} requests, {total["bytes"] / 1e6:.1f} MB, '
+                f'{total["range_reads"]} range reads, {total["seconds"]:.2f}s')
+
+
+def _record(path, nbytes, is_range, seconds):
+    """Record a traced call, see the module docstring for the attribution."""
+    stats = _ASSET.get()
+    if stats is None and _active:
+        call_path = f'{strip_protocol(path)}/'
+        for asset_path, asset_stats in list(_active.values()):
+            if f'{asset_path}/' in call_path:
+                stats = asset_stats
+                break
+    if stats is None:
+        if _tracer is None or _tracer.stage is None:
+            return
+        with _lock:
+            stats = _tracer.stages.setdefault(_tracer.stage, new_stats())
+    # += on ints is not atomic, assets can be shared by threads (zarr loop)
+    with _lock:
+        stats['requests'] += 1
+        stats['bytes'] += nbytes
+        stats['range_reads'] += int(is_range)
+        stats['seconds'] += seconds
+
+
+def _nbytes(result, is_read):
+    """Number of bytes returned by a traced call."""
+    if is_read and isinstance(result, (bytes, bytearray, memoryview)):
+        return len(result)
+    return 0
+
+
+def _is_range(args, kwargs):
+    """True if a cat_file(path, start, end) call reads a byte range.
+
+    The async methods get start/end as keywords (the positional arguments
+    differ, e.g. s3fs _cat_file(path, version_id, start, end)).
+    """
+    start = kwargs.get('start', args[0] if len(args) > 0 else None)
+    end = kwargs.get('end', args[1] if len(args) > 1 else None)
+    return start is not None or end is not None
+
+
+def _wrap_async(func, is_read):
+    @functools.wraps(func)
+    async def wrapper(self, path, *args, **kwargs):
+        if _DEPTH.get():
+            return await func(self, path, *args, **kwargs)
+        token = _DEPTH.set(1)
+        start = perf_counter()
+        result = None
+        try:
+            result = await func(self, path, *args, **kwargs)
+            return result
+        finally:
+            _DEPTH.reset(token)
+            _record(path, _nbytes(result, is_read), is_read and _is_range((), kwargs), perf_counter() - start)
+    return wrapper
+
+
+def _wrap_sync(func, is_read):
+    @functools.wraps(func)
+    def wrapper(self, path, *args, **kwargs):
+        if _DEPTH.get():
+            return func(self, path, *args, **kwargs)
+        token = _DEPTH.set(1)
+        start = perf_counter()
+        result = None
+        try:
+            result = func(self, path, *args, **kwargs)
+            return result
+        finally:
+            _DEPTH.reset(token)
+            _record(path, _nbytes(result, is_read), is_read and _is_range(args, kwargs), perf_counter() - start)
+    return wrapper
+
+
+def _wrap_file(func, name):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if _DEPTH.get():
+            return func(self, *args, **kwargs)
+        token = _DEPTH.set(1)
+        start = perf_counter()
+        result = None
+        try:
+            result = func(self, *args, **kwargs)
+            return result
+        finally:
+            _DEPTH.reset(token)
+            if name == 'read':
+                # read(size) reads a part of the file
+                size = kwargs.get('size', args[0] if args else -1)
+                is_range = size is not None and size >= 0
+            else:
+                is_range = True
+            _record(self.path, _nbytes(result, True), is_range, perf_counter() - start)
+    return wrapper
+
+
+def _sync(loop, func, *args, timeout=None, **kwargs):
+    """fsspec.asyn.sync running func with the asset of the calling thread."""
+    stats, depth = _ASSET.get(), _DEPTH.get()
+    if stats is None and not depth:
+        return _original_sync(loop, func, *args, timeout=timeout, **kwargs)
+
+    async def run(*args, **kwargs):
+        _ASSET.set(stats)
+        _DEPTH.set(depth)
+        return await func(*args, **kwargs)
+    return _original_sync(loop, run, *args, timeout=timeout, **kwargs)
+
+
+def _patch(cls, name, wrapper):
+    _patched.append((cls, name, cls.__dict__.get(name)))
+    setattr(cls, name, wrapper)
+
+
+def enable_tracing(tracer=None):
+    """Start tracing the fsspec I/O (no-op when already enabled).
+
+    Args:
+        tracer (IOTracer): receives the calls not made for an asset.
+    """
+    global _original_sync, _tracer
+    if tracer is not None:
+        _tracer = tracer
+    if _patched:
+        return
+    for protocol in TRACED_PROTOCOLS:
+        try:
+            cls = fsspec.get_filesystem_class(protocol)
+        except (ImportError, ValueError):
+            # optional backend not installed (e.g. s3fs)
+            continue
+        if any(patched_cls is cls for patched_cls, _, _ in _patched):
+            continue
+        methods = ASYNC_METHODS if cls.async_impl else SYNC_METHODS
+        for name, is_read in methods.items():
+            func = getattr(cls, name, None)
+            if func is None:
+                continue
+            if inspect.iscoroutinefunction(func):
+                _patch(cls, name, _wrap_async(func, is_read))
+            else:
+                _patch(cls, name, _wrap_sync(func, is_read))
+        # cached instances bound the original methods
+        cls.clear_instance_cache()
+    for module_name, class_name, name in FILE_METHODS:
+        try:
+            cls = getattr(importlib.import_module(module_name), class_name)
+        except ImportError:
+            continue
+        _patch(cls, name, _wrap_file(getattr(cls, name), name))
+    _original_sync = fsspec.asyn.sync
+    fsspec.asyn.sync = _sync
+
+
+def disable_tracing():
+    """Stop tracing, the original methods are restored."""
+    global _original_sync, _tracer
+    while _patched:
+        cls, name, original = _patched.pop()
+        if original is None:
+            delattr(cls, name)
+        else:
+            setattr(cls, name, original)
+        if hasattr(cls, 'clear_instance_cache'):
+            cls.clear_instance_cache()
+    if _original_sync is not None:
+        fsspec.asyn.sync = _original_sync
+        _original_sync = None
+    _tracer = None
+
+
+@contextmanager
+def trace_asset(path):
+    """Attribute the I/O of the block (and of its fsspec calls) to an asset.
+
+    Args:
+        path (str): asset path.
+
+    Yields:
+        dict: I/O stats of the asset, filled when the block exits.
+    """
+    stats = new_stats()
+    token = _ASSET.set(stats)
+    key = id(stats)
+    with _lock:
+        _active[key] = (strip_protocol(path), stats)
+    try:
+        yield stats
+    finally:
+        _ASSET.reset(token)
+        with _lock:
+            del _active[key]
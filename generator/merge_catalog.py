@@ -0,0 +1,786 @@
+#!/usr/bin/env python
+"""Merge the partial catalogs of a sharded build (create_catalog.py --shard).
+
+Usage:
+
+python merge_catalog.py <json file/directory> [<json file/directory> ...]
+    [--out <output directory>]
+    [--catalog_name <name>]
+    [--compact]
+    [--sort_by <column>]
+    [--run_size <n>]
+    [--partition_by <column>]
+    [--batch_size <n>]
+    [--make_remote]
+    [--catalog_data <data>]
+    [--protocol_config <json string/filename>]
+    [--protocols <protocol>]
+    [--index]
+
+Notes:
+- the shards ({catalog_name}.shard-i-of-N.json and their csv/parquet files)
+  are found in the given directories or listed explicitly. Every shard i of
+  N must be present, nothing is parsed again.
+- the crawler lists assets in sorted order and every asset belongs to one
+  shard, so the shards are merged by path (by the --partition_by value first
+  for partitioned parquet catalogs) and the rows come out in the order of an
+  unsharded build. Rows are streamed, memory does not grow with the catalog.
+- the columns are the union of the shard columns, cells of columns missing
+  in a shard are empty.
+- --compact combines any catalogs of create_catalog.py (e.g. of separate
+  runs or directories, csv or parquet but not both): one row is kept per
+  (path, variable), the one of the last catalog given, the columns are
+  reconciled as above and the rows are sorted by --sort_by (default: the
+  groupby_attrs of the first catalog then start_time, path and variable
+  break the ties). Numeric csv cells (e.g. undecoded times) sort as
+  numbers ahead of datetime and other text cells. It is an external merge sort, only --run_size rows are
+  held in memory, the sorted runs are spilled next to the output.
+- --make_remote makes the remote copies of the merged catalog, see
+  remote_catalog.py.
+- --index writes the search index of the merged catalog and of its remote
+  copies, see catalog_index.py.
+
+Example (8 PBS array jobs with -J 0-7, then one merge job):
+python create_catalog.py s3://gdex-data/d010096/ --data_format zarr --catalog_data zarr-boreas --out catalog --catalog_name d010096-posix --depth 7 --shard ${PBS_ARRAY_INDEX}/8
+python merge_catalog.py catalog --catalog_name d010096-posix --catalog_data zarr-boreas --make_remote
+python merge_catalog.py old/d010096-posix.json new/d010096-posix.json --compact --out catalog
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import heapq
+import tempfile
+import argparse
+import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import remote_catalog
+from catalog_index import build_index
+from catalog_writer import DEFAULT_BATCH_SIZE
+
+
+# number of rows sorted in memory at once by compact_catalogs
+DEFAULT_RUN_SIZE = 500000
+
+# input order of the rows while compacting catalogs
+SEQ_COLUMN = '__seq__'
+
+# typed sort keys of a text column while compacting catalogs (see add_sort_keys)
+NUMBER_KEY = '__{}_number__'
+TEXT_KEY = '__{}_text__'
+
+# partial catalog json file written by a shard (see create_catalog.shard_catalog_name)
+SHARD_PATTERN = re.compile(r'^(?P<name>.+)\.shard-(?P<index>\d+)-of-(?P<nshards>\d+)\.json$')
+
+
+def find_shards(sources, catalog_name=None):
+    """Find the shard json files of a sharded build.
+
+    Args:
+        sources (list(str)): shard json files or directories holding them.
+        catalog_name (str): only keep the shards of this catalog.
+
+    Returns:
+        (str, list(str)): catalog name and json files of the shards, in
+            shard order.
+
+    Raises:
+        ValueError: if no shard is found, shards of several catalogs or
+            builds are mixed, or a shard is missing.
+    """
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            files.extend(os.path.join(source, name) for name in sorted(os.listdir(source)))
+        else:
+            files.append(source)
+
+    shards = {}
+    for filename in files:
+        match = SHARD_PATTERN.match(os.path.basename(filename))
+        if match is None or (catalog_name and match['name'] != catalog_name):
+            continue
+        key = (match['name'], int(match['nshards']))
+        shards.setdefault(key, {})[int(match['index'])] = filename
+
+    if not shards:
+        raise ValueError(f'No shard json file ({{catalog_name}}.shard-i-of-N.json) found in {sources}')
+    if len(shards) > 1:
+        raise ValueError(f'Shards of several builds found {sorted(shards)}, set --catalog_name')
+    (name, nshards), found = shards.popitem()
+    missing = sorted(set(range(nshards)) - set(found))
+    if missing:
+        raise ValueError(f'Missing shards {missing} of {nshards} for catalog {name}')
+    return name, [found[index] for index in range(nshards)]
+
+
+def catalog_file_of(json_file):
+    """Path of the csv/parquet catalog file of a catalog json file."""
+    with open(json_file) as fh:
+        catalog_file = json.load(fh).get('catalog_file')
+    if not catalog_file:
+        raise ValueError(f'{json_file} has no catalog_file (single_json catalogs cannot be merged)')
+    return os.path.join(os.path.dirname(json_file), os.path.basename(catalog_file))
+
+
+class ShardReader:
+    """Stream the rows of a csv or parquet catalog as arrow record batches.
+
+    csv cells are kept as text (see remote_catalog.open_csv_strings), parquet
+    columns keep their types.
+
+    Args:
+        filename (str): csv or parquet catalog file.
+        batch_size (int): number of rows per parquet batch.
+    """
+
+    def __init__(self, filename, batch_size=DEFAULT_BATCH_SIZE):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.is_parquet = filename.endswith('.parquet')
+        if self.is_parquet:
+            self._file = pq.ParquetFile(filename)
+            self.schema = self._file.schema_arrow
+            self.nrows = self._file.metadata.num_rows
+        else:
+            with open(filename, newline='', encoding='utf-8') as fh:
+                columns = next(csv.reader(fh), [])
+            self.schema = pa.schema([(column, pa.string()) for column in columns])
+            self.nrows = None
+
+    def all_null(self, column):
+        """Check if a parquet column only holds missing values (from its statistics)."""
+        metadata = self._file.metadata
+        index = self.schema.get_field_index(column)
+        for i in range(metadata.num_row_groups):
+            statistics = metadata.row_group(i).column(index).statistics
+            if statistics is None or statistics.null_count != metadata.row_group(i).num_rows:
+                return False
+        return True
+
+    def __iter__(self):
+        if self.is_parquet:
+            yield from self._file.iter_batches(batch_size=self.batch_size)
+        elif self.schema:
+            _, reader = remote_catalog.open_csv_strings(self.filename)
+            yield from reader
+
+
+def merge_schemas(readers):
+    """Union of the columns of the shards with one type per column.
+
+    Columns keep their type when it is the same in every shard, int and
+    float columns become float, columns that are only missing in a shard
+    take the type of the other shards and other mixes become strings.
+
+    Args:
+        readers (list(ShardReader)): readers of the shards.
+
+    Returns:
+        pyarrow.Schema: schema of the merged catalog.
+    """
+    columns = {}
+    for reader in readers:
+        for field in reader.schema:
+            types = columns.setdefault(field.name, set())
+            if reader.is_parquet and pa.types.is_string(field.type) and reader.all_null(field.name):
+                # missing in this shard, written as a string column
+                continue
+            types.add(field.type)
+
+    fields = []
+    for column, types in columns.items():
+        if len(types) == 1:
+            dtype, = types
+        elif not types:
+            dtype = pa.string()
+        elif all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+            dtype = pa.float64()
+        else:
+            dtype = pa.string()
+        fields.append((column, dtype))
+    return pa.schema(fields)
+
+
+def conform(batch, schema, fill=''):
+    """Cast a record batch to the merged schema, adding missing columns.
+
+    Args:
+        batch (pyarrow.RecordBatch): rows of a shard.
+        schema (pyarrow.Schema): schema of the merged catalog.
+        fill (str): value of missing string cells ('' for csv, None for parquet).
+
+    Returns:
+        pyarrow.Table: rows with the columns of schema.
+    """
+    arrays = []
+    for field in schema:
+        index = batch.schema.get_field_index(field.name)
+        if index < 0:
+            if pa.types.is_string(field.type):
+                arrays.append(pa.array([fill] * batch.num_rows, type=field.type))
+            else:
+                arrays.append(pa.nulls(batch.num_rows, type=field.type))
+        else:
+            arrays.append(batch.column(index).cast(field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def iter_runs(reader, schema, key_columns, fill=''):
+    """Split the rows of a shard into runs of rows sharing the same key.
+
+    Yields:
+        (tuple, pyarrow.Table): key and rows of the run.
+    """
+    for batch in reader:
+        if batch.num_rows == 0:
+            continue
+        table = conform(batch, schema, fill=fill)
+        keys = list(zip(*(table.column(column).to_pylist() for column in key_columns)))
+        start = 0
+        for i in range(1, len(keys) + 1):
+            if i == len(keys) or keys[i] != keys[start]:
+                yield sort_key(keys[start]), table.slice(start, i - start)
+                start = i
+
+
+def sort_key(key):
+    """Sort key of the key columns, missing values first."""
+    return tuple((value is not None, '' if value is None else str(value)) for value in key)
+
+
+def merge_catalogs(json_files, out, catalog_name, partition_by=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Merge the partial catalogs of the shards into a single catalog.
+
+    Args:
+        json_files (list(str)): json files of the shards.
+        out (str): output directory.
+        catalog_name (str): name of the merged catalog.
+        partition_by (str): parquet only, column whose values get their own
+            row groups (as in the shards).
+        batch_size (int): number of rows per write (and parquet row group).
+
+    Returns:
+        str: path of the merged csv/parquet catalog file.
+    """
+    ext, readers, schema = open_catalogs(json_files, batch_size=batch_size)
+    is_parquet = ext == '.parquet'
+    key_columns = ['path']
+    if is_parquet and partition_by in schema.names:
+        key_columns = [partition_by, 'path']
+    fill = None if is_parquet else ''
+
+    os.makedirs(out, exist_ok=True)
+    out_file = os.path.join(out, f'{catalog_name}{ext}')
+    runs = heapq.merge(
+        *(iter_runs(reader, schema, key_columns, fill=fill) for reader in readers),
+        key=lambda run: run[0]
+    )
+    nrows = write_catalog(out_file, schema, runs, batch_size, partitioned=len(key_columns) > 1)
+
+    write_json(json_files[0], os.path.join(out, f'{catalog_name}.json'), catalog_name, ext, schema.names)
+    print(f'Merged {len(json_files)} shards into {out_file} ({nrows} rows)')
+    return out_file
+
+
+def open_catalogs(json_files, batch_size=DEFAULT_BATCH_SIZE):
+    """Open the catalog files of catalog json files for streaming.
+
+    Args:
+        json_files (list(str)): catalog json files (csv or parquet catalogs).
+        batch_size (int): number of rows per parquet batch.
+
+    Returns:
+        (str, list(ShardReader), pyarrow.Schema): extension of the catalog
+            files, readers of the non-empty catalogs and merged schema.
+
+    Raises:
+        ValueError: if csv and parquet catalogs are mixed.
+    """
+    catalog_files = [catalog_file_of(json_file) for json_file in json_files]
+    extensions = {os.path.splitext(catalog_file)[1] for catalog_file in catalog_files}
+    if len(extensions) != 1:
+        raise ValueError(f'Catalogs have different formats: {sorted(extensions)}')
+    readers = [ShardReader(catalog_file, batch_size=batch_size) for catalog_file in catalog_files]
+    readers = [reader for reader in readers if len(reader.schema) > 0 and reader.nrows != 0]
+    return extensions.pop(), readers, merge_schemas(readers)
+
+
+def write_catalog(out_file, schema, runs, batch_size, partitioned=False):
+    """Write runs of rows to a csv or parquet catalog file through {out_file}.tmp.
+
+    Args:
+        out_file (str): csv or parquet catalog file.
+        schema (pyarrow.Schema): schema of the catalog.
+        runs (iterable): (key, table) runs in catalog order.
+        batch_size (int): number of rows per write (and parquet row group).
+        partitioned (bool): parquet only, a row group never holds two
+            values of the first key column.
+
+    Returns:
+        int: number of rows written.
+    """
+    tmp_file = f'{out_file}.tmp'
+    try:
+        if out_file.endswith('.parquet'):
+            nrows = write_parquet(tmp_file, schema, runs, batch_size, partitioned)
+        else:
+            nrows = write_csv(tmp_file, schema, runs, batch_size)
+        os.replace(tmp_file, out_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return nrows
+
+
+def write_csv(filename, schema, runs, batch_size):
+    """Write the merged runs of rows to a csv file, returns the number of rows."""
+    nrows = 0
+    with open(filename, 'wb') as fh:
+        remote_catalog.write_csv_lines(fh, [remote_catalog.csv_field(pa.array([name])) for name in schema.names])
+        for table in iter_batches(runs, batch_size):
+            remote_catalog.write_csv_lines(fh, [remote_catalog.csv_field(column.combine_chunks()) for column in table.columns])
+            nrows += table.num_rows
+    return nrows
+
+
+def write_parquet(filename, schema, runs, batch_size, partitioned):
+    """Write the merged runs of rows to a parquet file, returns the number of rows.
+
+    With partitioned runs a row group never holds two partition values.
+    """
+    string_columns = [field.name for field in schema if pa.types.is_string(field.type)]
+    nrows = 0
+    with pq.ParquetWriter(filename, schema, use_dictionary=string_columns, write_statistics=True) as writer:
+        for table in iter_batches(runs, batch_size, partitioned=partitioned):
+            writer.write_table(table, row_group_size=batch_size)
+            nrows += table.num_rows
+    return nrows
+
+
+def iter_batches(runs, batch_size, partitioned=False):
+    """Group runs of rows into tables of at most batch_size rows.
+
+    Args:
+        runs (iterable): (key, table) runs in merged order.
+        batch_size (int): maximum number of rows per table.
+        partitioned (bool): also cut the tables where the first key column
+            (the partition value) changes.
+
+    Yields:
+        pyarrow.Table: rows of the merged catalog.
+    """
+    tables = []
+    nrows = 0
+    partition = None
+    for key, table in runs:
+        if tables and partitioned and key[0] != partition:
+            yield pa.concat_tables(tables)
+            tables, nrows = [], 0
+        partition = key[0]
+        while table.num_rows:
+            part = table.slice(0, batch_size - nrows)
+            tables.append(part)
+            nrows += part.num_rows
+            table = table.slice(part.num_rows)
+            if nrows >= batch_size:
+                yield pa.concat_tables(tables)
+                tables, nrows = [], 0
+    if tables:
+        yield pa.concat_tables(tables)
+
+
+def write_json(shard_json, json_file, catalog_name, ext, columns):
+    """Write the json file of the merged catalog from the json file of a shard."""
+    with open(shard_json) as fh:
+        data = json.load(fh)
+    data['id'] = catalog_name
+    data['attributes'] = [{'column_name': column, 'vocabulary': ''} for column in columns]
+    data['last_updated'] = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    data['catalog_file'] = f'{catalog_name}{ext}'
+    with open(json_file, 'w') as fh:
+        json.dump(data, fh)
+
+
+def find_catalogs(sources):
+    """Find the catalog json files (with a csv/parquet catalog_file) of files and directories.
+
+    Returns:
+        list(str): catalog json files, in the order of sources.
+    """
+    json_files = []
+    for source in sources:
+        if not os.path.isdir(source):
+            json_files.append(source)
+            continue
+        for name in sorted(os.listdir(source)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(source, name)) as fh:
+                try:
+                    catalog_file = json.load(fh).get('catalog_file')
+                except (ValueError, AttributeError):
+                    continue
+            if catalog_file:
+                json_files.append(os.path.join(source, name))
+    if not json_files:
+        raise ValueError(f'No catalog json file found in {sources}')
+    return json_files
+
+
+def default_sort_columns(json_file):
+    """Catalog order: the groupby_attrs of the catalog json file then start_time."""
+    with open(json_file) as fh:
+        data = json.load(fh)
+    groupby_attrs = (data.get('aggregation_control') or {}).get('groupby_attrs') or []
+    return list(groupby_attrs) + ['start_time']
+
+
+def as_number(value):
+    """Value of a numeric cell (e.g. an undecoded time), None for other cells."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def add_sort_keys(table, columns):
+    """Add the typed sort keys of text columns to a table.
+
+    csv cells are text, so every column gets a number key and a text key:
+    numeric cells sort as numbers ahead of the other (datetime or text)
+    cells, as inspect_catalog.time_key, and empty cells sort last.
+
+    Args:
+        table (pyarrow.Table): rows to sort.
+        columns (list(str)): text sort columns.
+
+    Returns:
+        pyarrow.Table: rows with the NUMBER_KEY and TEXT_KEY columns.
+    """
+    for column in columns:
+        values = table.column(column).to_pylist()
+        numbers = [as_number(value) for value in values]
+        texts = [None if number is not None or value == '' else value for value, number in zip(values, numbers)]
+        table = table.append_column(NUMBER_KEY.format(column), pa.array(numbers, pa.float64()))
+        table = table.append_column(TEXT_KEY.format(column), pa.array(texts, pa.string()))
+    return table
+
+
+def row_keys(table, key_columns, descending=()):
+    """Sort keys of the rows of a table, in the order of Table.sort_by.
+
+    Missing values sort last, as with arrow, and numeric descending columns
+    are negated.
+
+    Returns:
+        list(tuple): key of each row.
+    """
+    columns = []
+    for column in key_columns:
+        values = table.column(column).to_pylist()
+        if column in descending:
+            values = [None if value is None else -value for value in values]
+        columns.append([(value is None, value) for value in values])
+    return list(zip(*columns))
+
+
+def write_sorted_runs(tables, tmpdir, prefix, key_columns, descending=(), run_size=DEFAULT_RUN_SIZE,
+                      batch_size=DEFAULT_BATCH_SIZE):
+    """Sort the rows in runs of run_size rows written to arrow files.
+
+    Args:
+        tables (iterable(pyarrow.Table)): rows to sort.
+        tmpdir (str): directory of the run files.
+        prefix (str): name prefix of the run files.
+        key_columns (list(str)): sort columns.
+        descending (list(str)): sort columns sorted in descending order.
+        run_size (int): number of rows sorted in memory at once.
+        batch_size (int): number of rows per record batch of the run files.
+
+    Returns:
+        list(str): run files, each sorted by key_columns.
+    """
+    sorting = [(column, 'descending' if column in descending else 'ascending') for column in key_columns]
+    run_files = []
+    pending = []
+    nrows = 0
+
+    def spill():
+        table = pa.concat_tables(pending).sort_by(sorting)
+        run_file = os.path.join(tmpdir, f'{prefix}-{len(run_files)}.arrow')
+        with pa.OSFile(run_file, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=batch_size)
+        run_files.append(run_file)
+
+    for table in tables:
+        while table.num_rows:
+            part = table.slice(0, run_size - nrows)
+            pending.append(part)
+            nrows += part.num_rows
+            table = table.slice(part.num_rows)
+            if nrows >= run_size:
+                spill()
+                pending, nrows = [], 0
+    if pending:
+        spill()
+    return run_files
+
+
+def iter_run_rows(run_file, key_columns, descending=()):
+    """Rows of a sorted run file as (key, batch table, row index)."""
+    reader = pa.ipc.open_file(run_file)
+    for i in range(reader.num_record_batches):
+        table = pa.Table.from_batches([reader.get_batch(i)])
+        for index, key in enumerate(row_keys(table, key_columns, descending)):
+            yield key, table, index
+
+
+def take_rows(refs):
+    """Table of the rows (table, row index) of refs, in the order of refs."""
+    positions = {}
+    tables = []
+    for table, _ in refs:
+        if id(table) not in positions:
+            positions[id(table)] = len(tables)
+            tables.append(table)
+    offsets = np.cumsum([0] + [table.num_rows for table in tables])
+    indices = [offsets[positions[id(table)]] + index for table, index in refs]
+    return pa.concat_tables(tables).take(pa.array(indices, pa.int64()))
+
+
+def first_key_runs(table, column, partitioned, batch_size):
+    """Split a sorted table in tables of at most batch_size rows.
+
+    With partitioned, a table never holds two values of column.
+
+    Yields:
+        (tuple, pyarrow.Table): key of the first row (its column value) and rows.
+    """
+    if partitioned:
+        values = [(value is None, value) for value in table.column(column).to_pylist()]
+    start = 0
+    while start < table.num_rows:
+        stop = min(start + batch_size, table.num_rows)
+        if partitioned:
+            stop = next((i for i in range(start + 1, stop) if values[i] != values[start]), stop)
+            key = (values[start],)
+        else:
+            key = (None,)
+        yield key, table.slice(start, stop - start)
+        start = stop
+
+
+def duplicated(table, columns):
+    """Mask of the rows of a sorted table with the same values as the previous row."""
+    mask = None
+    for column in columns:
+        values = table.column(column)
+        current, previous = values.slice(1), values.slice(0, len(values) - 1)
+        same = pc.or_(
+            pc.fill_null(pc.equal(current, previous), False),
+            pc.and_(pc.is_null(current), pc.is_null(previous))
+        )
+        mask = same if mask is None else pc.and_(mask, same)
+    return pa.concat_arrays([pa.array([False])] + mask.chunks)
+
+
+def merge_runs(run_files, key_columns, descending=(), unique=0, partitioned=False,
+               batch_size=DEFAULT_BATCH_SIZE):
+    """K-way merge of sorted run files.
+
+    Args:
+        run_files (list(str)): run files sorted by key_columns.
+        key_columns (list(str)): sort columns.
+        descending (list(str)): sort columns sorted in descending order.
+        unique (int): if set, only the first row of the rows sharing their
+            first unique key values is kept.
+        partitioned (bool): a table never holds two values of the first
+            key column.
+        batch_size (int): maximum number of rows per table.
+
+    Yields:
+        (tuple, pyarrow.Table): key of the first row (first key column only)
+            and rows, in merged order.
+    """
+    if len(run_files) == 1:
+        # a single run is already sorted, only remove the duplicates
+        table = pa.ipc.open_file(run_files[0]).read_all()
+        if unique and table.num_rows > 1:
+            table = table.filter(pc.invert(duplicated(table, key_columns[:unique])))
+        yield from first_key_runs(table, key_columns[0], partitioned, batch_size)
+        return
+
+    rows = heapq.merge(
+        *(iter_run_rows(run_file, key_columns, descending) for run_file in run_files),
+        key=lambda row: row[0]
+    )
+    refs = []
+    first = previous = None
+    for key, table, index in rows:
+        if unique and previous is not None and key[:unique] == previous[:unique]:
+            continue
+        previous = key
+        if refs and (len(refs) >= batch_size or (partitioned and key[0] != first)):
+            yield (first,), take_rows(refs)
+            refs = []
+        if not refs:
+            first = key[0]
+        refs.append((table, index))
+    if refs:
+        yield (first,), take_rows(refs)
+
+
+def compact_catalogs(json_files, out, catalog_name, sort_by=None, partition_by=None,
+                     batch_size=DEFAULT_BATCH_SIZE, run_size=DEFAULT_RUN_SIZE):
+    """Combine catalogs into a single deduplicated catalog in canonical order.
+
+    An external merge sort, only run_size rows are held in memory:
+    1. the rows are sorted by (path, variable, latest catalog first) in runs
+       spilled to disk, the merged runs keep one row per (path, variable),
+       the one of the last catalog in json_files.
+    2. the kept rows are sorted by sort_by in runs and merged into the
+       final catalog.
+
+    Args:
+        json_files (list(str)): catalog json files, later catalogs win.
+        out (str): output directory (can be the directory of the catalogs).
+        catalog_name (str): name of the compact catalog.
+        sort_by (list(str)): sort columns, default groupby_attrs of the first
+            catalog then start_time; path and variable break the ties.
+        partition_by (str): parquet only, column sorted first whose values
+            get their own row groups.
+        batch_size (int): number of rows per write (and parquet row group).
+        run_size (int): number of rows sorted in memory at once.
+
+    Returns:
+        str: path of the compact csv/parquet catalog file.
+    """
+    ext, readers, schema = open_catalogs(json_files, batch_size=batch_size)
+    is_parquet = ext == '.parquet'
+    fill = None if is_parquet else ''
+    if 'path' not in schema.names:
+        raise ValueError(f'Catalogs {json_files} have no rows')
+
+    unique = [column for column in ['path', 'variable'] if column in schema.names]
+    if sort_by is None:
+        sort_by = default_sort_columns(json_files[0])
+    sort_by = [column for column in sort_by if column in schema.names]
+    if is_parquet and partition_by in schema.names:
+        sort_by = [partition_by] + [column for column in sort_by if column != partition_by]
+    sort_by += [column for column in unique if column not in sort_by]
+    # text columns (every csv column) are sorted by typed keys, numbers first
+    typed = [
+        column for column in sort_by
+        if pa.types.is_string(schema.field(column).type) and not (is_parquet and column == partition_by)
+    ]
+    sort_keys = []
+    for column in sort_by:
+        if column in typed:
+            sort_keys += [NUMBER_KEY.format(column), TEXT_KEY.format(column)]
+        else:
+            sort_keys.append(column)
+    typed_keys = [key for key in sort_keys if key not in sort_by]
+
+    def iter_tables():
+        # input order of every row, the latest duplicate wins
+        seq = 0
+        for reader in readers:
+            for batch in reader:
+                table = conform(batch, schema, fill=fill)
+                yield table.append_column(SEQ_COLUMN, pa.array(np.arange(seq, seq + table.num_rows, dtype=np.int64)))
+                seq += table.num_rows
+
+    os.makedirs(out, exist_ok=True)
+    out_file = os.path.join(out, f'{catalog_name}{ext}')
+    with tempfile.TemporaryDirectory(dir=out) as tmpdir:
+        dedupe_key = unique + [SEQ_COLUMN]
+        run_files = write_sorted_runs(iter_tables(), tmpdir, 'dedupe', dedupe_key, [SEQ_COLUMN], run_size, batch_size)
+        kept = merge_runs(run_files, dedupe_key, [SEQ_COLUMN], unique=len(unique), batch_size=batch_size)
+        kept_files = write_sorted_runs(
+            (add_sort_keys(table.drop_columns([SEQ_COLUMN]), typed) for _, table in kept),
+            tmpdir, 'sort', sort_keys, (), run_size, batch_size
+        )
+        for run_file in run_files:
+            os.remove(run_file)
+        partitioned = is_parquet and sort_by[0] == partition_by
+        runs = merge_runs(kept_files, sort_keys, partitioned=partitioned, batch_size=batch_size)
+        runs = ((key, table.drop_columns(typed_keys)) for key, table in runs)
+        nrows = write_catalog(out_file, schema, runs, batch_size, partitioned=partitioned)
+
+    write_json(json_files[0], os.path.join(out, f'{catalog_name}.json'), catalog_name, ext, schema.names)
+    print(f'Compacted {len(json_files)} catalogs into {out_file} ({nrows} rows)')
+    return out_file
+
+
+def get_parser():
+    """Creates and returns the argparse parser."""
+    parser = argparse.ArgumentParser(description='Merge the partial catalogs written by create_catalog.py --shard, or compact any catalogs.')
+    parser.add_argument('sources', nargs='+', metavar='<json file/directory>',
+                        help='Shard (or with --compact catalog) json files or directories holding them.')
+    parser.add_argument('--out', '-o', default=None, metavar='<directory>',
+                        help='Directory of the merged catalog (default: directory of the first catalog).')
+    parser.add_argument('--catalog_name', '-n', default=None, metavar='<name>',
+                        help='Name of the merged catalog (default: name of the sharded / first catalog).')
+    parser.add_argument('--compact', action='store_true', default=False,
+                        help='Combine any catalogs: one row per (path, variable), the last catalog wins, sorted by --sort_by.')
+    parser.add_argument('--sort_by', nargs='+', default=None, metavar='<column>',
+                        help='With --compact, sort columns (default: groupby_attrs then start_time).')
+    parser.add_argument('--run_size', type=int, default=DEFAULT_RUN_SIZE, metavar='<n>',
+                        help='With --compact, number of rows sorted in memory at once.')
+    parser.add_argument('--partition_by', default=None, metavar='<column>',
+                        help='Parquet catalogs, column whose values get their own row groups (as in the shards).')
+    parser.add_argument('--batch_size', type=int, default=DEFAULT_BATCH_SIZE, metavar='<n>',
+                        help='Number of rows written at once (and parquet row group size).')
+    parser.add_argument('--make_remote', '-mr', action='store_true', default=False,
+                        help='Additionally make the remote copies of the merged catalog.')
+    parser.add_argument('--catalog_data', '-cd', default='reference', metavar='<data>',
+                        help='Protocol registry entry used by --make_remote (see remote_catalog.py).')
+    parser.add_argument('--protocol_config', default=None, metavar='<json string/filename>',
+                        help='Access protocols added to the built-in registry used by --make_remote.')
+    parser.add_argument('--protocols', nargs='+', default=None, metavar='<protocol>',
+                        help='Remote protocols written by --make_remote.')
+    parser.add_argument('--index', action='store_true', default=False,
+                        help='Write the search index of the merged catalog (and of its remote copies).')
+    return parser
+
+
+def main(args_list):
+    """Use command line-like arguments to execute."""
+    args = get_parser().parse_args(args_list)
+    if args.compact:
+        json_files = find_catalogs(args.sources)
+        name = args.catalog_name or os.path.basename(json_files[0])[:-len('.json')]
+        out = args.out or os.path.dirname(json_files[0])
+        out_file = compact_catalogs(
+            json_files, out, name, sort_by=args.sort_by, partition_by=args.partition_by,
+            batch_size=args.batch_size, run_size=args.run_size
+        )
+    else:
+        name, json_files = find_shards(args.sources, catalog_name=args.catalog_name)
+        out = args.out or os.path.dirname(json_files[0])
+        out_file = merge_catalogs(json_files, out, name, partition_by=args.partition_by, batch_size=args.batch_size)
+    catalog_files = [out_file]
+    if args.make_remote:
+        output_format = 'parquet' if out_file.endswith('.parquet') else 'csv_and_json'
+        catalog_files += remote_catalog.make_remote_catalog(
+            out_file,
+            catalog_data=args.catalog_data,
+            output_format=output_format,
+            protocols=args.protocols,
+            protocol_config=args.protocol_config
+        )
+    if args.index:
+        for catalog_file in catalog_files:
+            build_index(catalog_file)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
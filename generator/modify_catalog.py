@@ -1,40 +1,297 @@
+#!/usr/bin/env python
+"""Replace paths in catalog files.
+
+Usage:
+
+python modify_catalog.py <input file/directory> <output file/directory>
+    [<old path> <new path>]
+    [--rule <old path> <new path>]
+    [--rules <json string/filename>]
+    [--pattern <glob>]
+    [--workers <n>]
+    [--executor <thread/process>]
+    [--block_size <bytes>]
+
+Notes:
+- every rule is applied in a single pass with one compiled matcher. Where
+  old paths overlap the longest one wins, and replaced text is not matched
+  again by the other rules.
+- files are streamed in blocks of --block_size bytes cut at the last line
+  break, so an old path (which cannot contain a line break) is never split
+  between blocks.
+- .gz and .zst files are read and written compressed (.zst needs the
+  zstandard package). The compression of the output follows its extension.
+- when the input is a directory, every file matching --pattern is written
+  under the same name to the output directory, --workers files at a time.
+- outputs are written to {output}.tmp and renamed once complete, so an
+  output is never left half written and input and output can be the same.
+- the bytes processed (uncompressed) and the time are reported per file.
+
+Example:
+python modify_catalog.py catalogs/ relocated/ --pattern "*-posix.*" \\
+    --rule /glade/campaign/collections/gdex/data/ /glade/campaign/collections/gdex/archive/ \\
+    --rule https://data.gdex.ucar.edu/ https://archive.gdex.ucar.edu/ --workers 4
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import fnmatch
 import argparse
 
-def modify_catalog(input_file, output_file, old_path, new_path):
+from executor import map_ordered
+
+
+# number of bytes read at once
+DEFAULT_BLOCK_SIZE = 1 << 24
+
+
+def compile_rules(rules):
+    """Compile replacement rules into a single matcher.
+
+    Args:
+        rules (list(tuple)): (old path, new path) pairs.
+
+    Returns:
+        (re.Pattern, dict): matcher of every old path (longest first) and
+            the new path of each old path, both as bytes.
+
+    Raises:
+        ValueError: if there is no rule or an old path is empty or holds a
+            line break.
+    """
+    mapping = {}
+    for old_path, new_path in rules:
+        if not old_path or '\n' in old_path or '\r' in old_path:
+            raise ValueError(f'Invalid old path: {old_path!r}')
+        mapping[old_path.encode('utf-8')] = new_path.encode('utf-8')
+    if not mapping:
+        raise ValueError('No replacement rule given')
+    pattern = re.compile(b'|'.join(re.escape(old) for old in sorted(mapping, key=len, reverse=True)))
+    return pattern, mapping
+
+
+def replace_block(block, pattern, mapping):
+    """Apply the compiled rules to a block of bytes.
+
+    Returns:
+        (bytes, int): modified block and number of replacements.
+    """
+    if len(mapping) == 1:
+        # plain bytes.replace is faster than the regex for a single rule
+        (old, new), = mapping.items()
+        count = block.count(old)
+        return (block.replace(old, new) if count else block), count
+    return pattern.subn(lambda match: mapping[match.group()], block)
+
+
+def open_catalog(path, mode, name=None):
+    """Open a catalog file in binary mode, (de)compressing .gz and .zst files.
+
+    Args:
+        path (str): file path.
+        mode (str): 'rb' or 'wb'.
+        name (str): file name giving the compression (e.g. of a temporary
+            file), path by default.
+
+    Returns:
+        file object.
+    """
+    name = name or path
+    if name.endswith('.gz'):
+        return gzip.open(path, mode, compresslevel=6)
+    if name.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(f'zstandard is required to read or write {name} (pip install zstandard)')
+        if 'r' in mode:
+            return zstandard.open(path, mode, dctx=zstandard.ZstdDecompressor())
+        return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor())
+    return open(path, mode)
+
+
+def modify_catalog(input_file, output_file, old_path=None, new_path=None, rules=None,
+                   block_size=DEFAULT_BLOCK_SIZE):
     """
-    Reads an input file, replaces the specified old path with the new path, and writes to an output file.
+    Reads an input file, replaces the old paths with the new paths, and writes to an output file.
 
     Parameters:
     - input_file (str): Path to the input file.
     - output_file (str): Path to the output file.
     - old_path (str): The path to be replaced.
     - new_path (str): The replacement path.
+    - rules (list(tuple)): Additional (old path, new path) pairs, applied in the same pass.
+    - block_size (int): Number of bytes read at once.
 
     Outputs:
-    - A single modified file with all occurrences of old_path replaced by new_path.
+    - A single modified file with all occurrences of the old paths replaced by the new paths.
+
+    Returns:
+    - dict: input/output files, bytes processed, replacements and seconds,
+      None if the file could not be modified.
     """
-    try:
-        with open(input_file, 'r') as fh, open(output_file, 'w') as out_fh:
-            for line in fh:
-                new_line = line.replace(old_path, new_path)
-                out_fh.write(new_line)
+    rules = list(rules or [])
+    if old_path is not None:
+        rules.insert(0, (old_path, new_path))
+    pattern, mapping = compile_rules(rules)
 
-        print(f"Successfully created: {output_file}")
+    start = time.perf_counter()
+    nbytes = 0
+    count = 0
+    tmp_file = f'{output_file}.tmp'
+    try:
+        with open_catalog(input_file, 'rb') as fh, open_catalog(tmp_file, 'wb', output_file) as out_fh:
+            carry = b''
+            while True:
+                block = fh.read(block_size)
+                if not block:
+                    break
+                nbytes += len(block)
+                block = carry + block
+                # keep the last partial line for the next block
+                cut = block.rfind(b'\n') + 1
+                if cut == 0:
+                    carry = block
+                    continue
+                carry = block[cut:]
+                new_block, n = replace_block(block[:cut], pattern, mapping)
+                out_fh.write(new_block)
+                count += n
+            if carry:
+                new_block, n = replace_block(carry, pattern, mapping)
+                out_fh.write(new_block)
+                count += n
+        os.replace(tmp_file, output_file)
 
     except FileNotFoundError:
         print(f"Error: File '{input_file}' not found.")
+        return None
     except Exception as e:
         print(f"An error occurred: {e}")
+        return None
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    seconds = time.perf_counter() - start
+    print(
+        f"Successfully created: {output_file} "
+        f"({nbytes} bytes, {count} replacements in {seconds:.3f} s, {nbytes / max(seconds, 1e-9) / 1e6:.1f} MB/s)"
+    )
+    return {
+        'input_file': input_file,
+        'output_file': output_file,
+        'bytes': nbytes,
+        'replacements': count,
+        'seconds': seconds,
+    }
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Replace paths in a file and save the modified version.")
-    parser.add_argument("input_file", help="Input file to process")
-    parser.add_argument("output_file", help="Output file to save the modified content")
-    parser.add_argument("old_path", help="The old path to be replaced")
-    parser.add_argument("new_path", help="The new path to replace with")
 
-    args = parser.parse_args()
+def _modify_pair(paths, rules, block_size):
+    """modify_catalog for an (input file, output file) pair (runs inside the worker)."""
+    return modify_catalog(paths[0], paths[1], rules=rules, block_size=block_size)
 
-    # Run the modify_catalog function
-    modify_catalog(args.input_file, args.output_file, args.old_path, args.new_path)
 
+def modify_catalogs(input_dir, output_dir, rules, pattern='*', workers=1, executor='thread',
+                    block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Applies the replacement rules to every matching file of a directory.
+
+    Parameters:
+    - input_dir (str): Directory of the input files.
+    - output_dir (str): Directory of the output files (created if needed, can be input_dir).
+    - rules (list(tuple)): (old path, new path) pairs.
+    - pattern (str): Glob of the file names to modify.
+    - workers (int): Number of files modified concurrently.
+    - executor (str): Worker pool used when workers > 1 ('thread' / 'process').
+    - block_size (int): Number of bytes read at once.
+
+    Returns:
+    - list(dict): report of each file (see modify_catalog), None for the failed files.
+    """
+    # validate the rules once before starting the workers
+    compile_rules(rules)
+    names = sorted(
+        name for name in os.listdir(input_dir)
+        if fnmatch.fnmatch(name, pattern) and os.path.isfile(os.path.join(input_dir, name))
+        and not name.endswith('.tmp')
+    )
+    os.makedirs(output_dir, exist_ok=True)
+    pairs = [(os.path.join(input_dir, name), os.path.join(output_dir, name)) for name in names]
+
+    start = time.perf_counter()
+    reports = list(map_ordered(
+        _modify_pair, pairs, kwargs={'rules': rules, 'block_size': block_size},
+        executor=executor, workers=workers, chunksize=1
+    ))
+    seconds = time.perf_counter() - start
+    done = [report for report in reports if report is not None]
+    nbytes = sum(report['bytes'] for report in done)
+    print(
+        f"Modified {len(done)} of {len(pairs)} files "
+        f"({nbytes} bytes in {seconds:.3f} s, {nbytes / max(seconds, 1e-9) / 1e6:.1f} MB/s)"
+    )
+    return reports
+
+
+def load_rules(rules):
+    """Load (old path, new path) pairs from a json string or file holding {old: new}."""
+    if os.path.isfile(rules):
+        with open(rules) as fh:
+            rules = json.load(fh)
+    else:
+        rules = json.loads(rules)
+    return list(rules.items())
+
+
+def get_parser():
+    """Creates and returns the argparse parser."""
+    parser = argparse.ArgumentParser(description="Replace paths in a file (or a directory of files) and save the modified version.")
+    parser.add_argument("input_file", help="Input file (or directory) to process")
+    parser.add_argument("output_file", help="Output file (or directory) to save the modified content")
+    parser.add_argument("old_path", nargs='?', default=None, help="The old path to be replaced")
+    parser.add_argument("new_path", nargs='?', default=None, help="The new path to replace with")
+    parser.add_argument("--rule", nargs=2, action='append', default=[], metavar=('<old path>', '<new path>'),
+                        help="Additional replacement (can be repeated), all rules are applied in one pass")
+    parser.add_argument("--rules", default=None, metavar='<json string/filename>',
+                        help="Replacements as a json object {old path: new path}")
+    parser.add_argument("--pattern", default='*', metavar='<glob>',
+                        help="With a directory input, glob of the file names to modify")
+    parser.add_argument("--workers", "-w", type=int, default=1, metavar='<n>',
+                        help="With a directory input, number of files modified concurrently")
+    parser.add_argument("--executor", default='thread', choices=['thread', 'process'],
+                        help="Worker pool used when --workers > 1 (thread / process)")
+    parser.add_argument("--block_size", type=int, default=DEFAULT_BLOCK_SIZE, metavar='<bytes>',
+                        help="Number of bytes read at once")
+    return parser
+
+
+def main(args_list):
+    """Use command line-like arguments to execute."""
+    parser = get_parser()
+    args = parser.parse_args(args_list)
+    if (args.old_path is None) != (args.new_path is None):
+        parser.error('old_path and new_path must be given together')
+
+    rules = [tuple(rule) for rule in args.rule]
+    if args.old_path is not None:
+        rules.insert(0, (args.old_path, args.new_path))
+    if args.rules:
+        rules.extend(load_rules(args.rules))
+    if not rules:
+        parser.error('no replacement given (old_path new_path, --rule or --rules)')
+
+    if os.path.isdir(args.input_file):
+        modify_catalogs(args.input_file, args.output_file, rules, pattern=args.pattern,
+                        workers=args.workers, executor=args.executor, block_size=args.block_size)
+    else:
+        # Run the modify_catalog function
+        modify_catalog(args.input_file, args.output_file, rules=rules, block_size=args.block_size)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
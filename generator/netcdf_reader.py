@@ -0,0 +1,84 @@
+"""Native netCDF metadata reader used by create_catalog.py.
+
+Builds a DatasetHeader of a netCDF/HDF5 file with netCDF4 directly, without
+going through xarray.open_dataset: no CF decoding of the whole dataset, no
+pandas indexes and no dask graphs. Attributes are read as the xarray netCDF4
+backend reads them (root group only, no masking or scaling) and values are
+only read by index on request.
+
+The netCDF-C library is not thread safe, every call into netCDF4 holds
+NETCDF4_LOCK, the lock of the xarray netCDF4 backend, so headers can be
+read by parse threads (--executor thread) while other threads open files
+with xarray (e.g. the xarray fallback of a file).
+"""
+
+import numpy as np
+import netCDF4
+from xarray.backends.locks import HDF5_LOCK, NETCDFC_LOCK, combine_locks
+
+from dataset_header import DatasetHeader, VariableHeader
+
+
+# lock of xarray.open_dataset(engine='netcdf4'), shared with xarray so the
+# netCDF-C calls of the native reader and of xarray never run concurrently
+NETCDF4_LOCK = combine_locks([NETCDFC_LOCK, HDF5_LOCK])
+
+
+def get_variable_header(var):
+    """Dimensions and attributes of a netCDF4 variable as the xarray netCDF4 backend exposes them.
+
+    Args:
+        var (netCDF4.Variable): netCDF4 variable.
+
+    Returns:
+        VariableHeader: header of the variable.
+    """
+    attrs = {key: var.getncattr(key) for key in var.ncattrs()}
+    dtype = var.dtype
+    if dtype is str:
+        # variable length strings are object arrays in xarray
+        dtype = np.dtype(object, metadata={'element_type': str})
+    elif dtype.kind == 'S' and '_FillValue' in attrs:
+        attrs['_FillValue'] = np.bytes_(attrs['_FillValue'])
+    # least_significant_digit is moved to the encoding by xarray
+    attrs.pop('least_significant_digit', None)
+    return VariableHeader(tuple(var.dimensions), var.shape, np.dtype(dtype), attrs)
+
+
+class NetCDFHeader(DatasetHeader):
+    """DatasetHeader of a netCDF/HDF5 file read with netCDF4.
+
+    The file stays open until close() so values can be read on request.
+
+    Args:
+        file_path (str): path of the netCDF file.
+    """
+
+    def __init__(self, file_path):
+        with NETCDF4_LOCK:
+            self.dataset = netCDF4.Dataset(file_path, mode='r')
+            try:
+                attrs = {key: self.dataset.getncattr(key) for key in self.dataset.ncattrs()}
+                variables = {}
+                for name, var in self.dataset.variables.items():
+                    # raw values, CF decoding is done by create_catalog
+                    var.set_auto_maskandscale(False)
+                    var.set_auto_chartostring(False)
+                    variables[name] = get_variable_header(var)
+            except Exception:
+                self.dataset.close()
+                raise
+        super().__init__(attrs, variables)
+
+    def read_values(self, name, flat_indices):
+        with NETCDF4_LOCK:
+            var = self.dataset.variables[name]
+            if var.ndim == 0:
+                return np.asarray([var[...]] * len(flat_indices))
+            # one small read per element, never the whole variable
+            return np.asarray([var[np.unravel_index(flat_index, var.shape)] for flat_index in flat_indices])
+
+    def close(self):
+        with NETCDF4_LOCK:
+            if self.dataset.isopen():
+                self.dataset.close()
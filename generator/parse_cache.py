@@ -0,0 +1,182 @@
+"""Persistent per-file parse cache used by create_catalog.py.
+
+Every asset parsed by `file_parser` is stored in a small SQLite file together
+with a fingerprint of the asset (mtime/size for posix paths, ETag/version for
+object stores). On the next build, assets whose fingerprint did not change
+reuse their cached `catalog_items` rows and are not reopened.
+
+Rows are stored pickled so numpy/cftime time values round-trip unchanged and
+the written catalog is identical to an uncached build.
+"""
+
+import os
+import json
+import pickle
+import sqlite3
+import hashlib
+
+import fsspec
+
+
+# consolidated metadata objects used to fingerprint zarr stores
+ZARR_METADATA_FILES = ['.zmetadata', 'zarr.json']
+
+# fsspec info keys that identify an object version on remote stores
+REMOTE_FINGERPRINT_KEYS = ['ETag', 'VersionId', 'LastModified', 'mtime', 'size']
+
+
+def options_signature(parsing_kwargs):
+    """Hash the parsing options so cached rows are reused only with the same options.
+
+    Args:
+        parsing_kwargs (dict): keyword arguments passed to `file_parser`.
+
+    Returns:
+        str: sha256 hex digest of the options.
+    """
+    options = json.dumps(parsing_kwargs or {}, sort_keys=True, default=str)
+    return hashlib.sha256(options.encode('utf-8')).hexdigest()
+
+
+def _local_fingerprint(path):
+    """Fingerprint a posix file or zarr store directory from its stat info."""
+    target = path
+    if os.path.isdir(path):
+        # a zarr store directory mtime does not change when its metadata does
+        for meta_file in ZARR_METADATA_FILES:
+            meta_path = os.path.join(path, meta_file)
+            if os.path.exists(meta_path):
+                target = meta_path
+                break
+    stat = os.stat(target)
+    return f'{stat.st_mtime_ns}:{stat.st_size}'
+
+
+def _remote_fingerprint(path, storage_options=None):
+    """Fingerprint an object store asset from its ETag/version information."""
+    storage_options = storage_options or {}
+    protocol = path.split('://')[0]
+    fs = fsspec.filesystem(protocol, **storage_options.get(protocol, {}))
+    info = None
+    for meta_file in ZARR_METADATA_FILES:
+        meta_path = f"{path.rstrip('/')}/{meta_file}"
+        if fs.exists(meta_path):
+            info = fs.info(meta_path)
+            break
+    if info is None:
+        info = fs.info(path)
+    values = [f'{key}={info[key]}' for key in REMOTE_FINGERPRINT_KEYS if info.get(key) is not None]
+    return ';'.join(values)
+
+
+def asset_fingerprint(path, storage_options=None):
+    """Get a string that changes whenever the asset content changes.
+
+    Args:
+        path (str): asset path as returned by the crawler (posix or s3://).
+        storage_options (dict): fsspec storage options keyed by protocol.
+
+    Returns:
+        str: fingerprint of the asset.
+    """
+    if '://' in path and not path.startswith('file://'):
+        return _remote_fingerprint(path, storage_options)
+    return _local_fingerprint(path.replace('file://', '', 1))
+
+
+class ParseCache:
+    """SQLite backed cache of parsed catalog rows.
+
+    Args:
+        cache_file (str): path to the SQLite cache file (created if missing).
+        parsing_kwargs (dict): parsing options, cached rows from other options are ignored.
+        rebuild (bool): ignore every cached row but still refresh the cache.
+        storage_options (dict): fsspec storage options used to fingerprint remote assets.
+    """
+
+    def __init__(self, cache_file, parsing_kwargs=None, rebuild=False, storage_options=None):
+        self.cache_file = cache_file
+        self.options = options_signature(parsing_kwargs)
+        self.rebuild = rebuild
+        self.storage_options = storage_options
+        self.hits = 0
+        self.misses = 0
+        # used by the parse thread of a pipelined build, one thread at a time
+        self._conn = sqlite3.connect(cache_file, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS parsed ('
+            'path TEXT PRIMARY KEY, fingerprint TEXT, options TEXT, items BLOB)'
+        )
+        self._conn.commit()
+
+    def fingerprint(self, path):
+        """Fingerprint an asset, returns None if it cannot be determined."""
+        try:
+            return asset_fingerprint(path, self.storage_options)
+        except (OSError, ValueError) as e:
+            print(f'Warning: cannot fingerprint {path} for the parse cache: {e}')
+            return None
+
+    def contains(self, path, fingerprint):
+        """Check if up to date catalog items are cached for an asset.
+
+        The lookup is counted as a cache hit or miss.
+
+        Args:
+            path (str): asset path.
+            fingerprint (str): current fingerprint of the asset.
+
+        Returns:
+            bool: True on a cache hit.
+        """
+        found = False
+        if not self.rebuild and fingerprint is not None:
+            found = self._conn.execute(
+                'SELECT 1 FROM parsed WHERE path = ? AND fingerprint = ? AND options = ?',
+                (path, fingerprint, self.options)
+            ).fetchone() is not None
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found
+
+    def load(self, path):
+        """Load the cached catalog items of an asset found by `contains`."""
+        row = self._conn.execute('SELECT items FROM parsed WHERE path = ?', (path,)).fetchone()
+        return pickle.loads(row[0])
+
+    def get(self, path, fingerprint):
+        """Get cached catalog items for an asset.
+
+        Args:
+            path (str): asset path.
+            fingerprint (str): current fingerprint of the asset.
+
+        Returns:
+            list(dict) or None: cached catalog items, None on a cache miss.
+        """
+        if self.contains(path, fingerprint):
+            return self.load(path)
+        return None
+
+    def put(self, path, fingerprint, items):
+        """Store catalog items for an asset (committed on `close`)."""
+        if fingerprint is None:
+            return
+        self._conn.execute(
+            'INSERT OR REPLACE INTO parsed (path, fingerprint, options, items) VALUES (?, ?, ?, ?)',
+            (path, fingerprint, self.options, pickle.dumps(items))
+        )
+
+    def report(self):
+        """Summary string of cache hits and misses."""
+        total = self.hits + self.misses
+        rate = 100. * self.hits / total if total else 0.
+        return (f'Parse cache {self.cache_file}: {self.hits} hits, '
+                f'{self.misses} misses ({rate:.1f}% hit rate)')
+
+    def close(self):
+        """Commit pending rows and close the cache file."""
+        self._conn.commit()
+        self._conn.close()
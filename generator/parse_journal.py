@@ -0,0 +1,116 @@
+"""Crash-safe journal of the assets parsed by create_catalog.py.
+
+Every asset is appended to a small SQLite file as soon as its catalog items
+are produced, with its status ('ok' with the items, or 'error' with the
+message of the exception), and committed right away. When a long build dies
+(e.g. at the end of a PBS walltime), a new run with --resume skips the
+assets journaled as 'ok' and finalizes the catalog from the journaled items
+plus the assets parsed since.
+
+The journal is append-only: the latest entry of an asset wins, so assets
+that failed are parsed again on resume. Items are stored pickled like in the
+parse cache, the resumed catalog is identical to an uninterrupted build.
+"""
+
+import pickle
+import sqlite3
+
+from parse_cache import options_signature
+
+
+class ParseJournal:
+    """Append-only SQLite journal of parsed assets.
+
+    Args:
+        journal_file (str): path to the SQLite journal file (created if missing).
+        parsing_kwargs (dict): parsing options of the build.
+        resume (bool): keep the entries of a previous run, otherwise the
+            journal is started over.
+
+    Raises:
+        ValueError: when resuming a journal written with other parsing options.
+    """
+
+    def __init__(self, journal_file, parsing_kwargs=None, resume=False):
+        self.journal_file = journal_file
+        self.options = options_signature(parsing_kwargs)
+        self.resumed = 0
+        self.parsed = 0
+        # used by the parse thread of a pipelined build, one thread at a time
+        self._conn = sqlite3.connect(journal_file, check_same_thread=False)
+        # committing every entry stays cheap with a write-ahead log
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT, status TEXT, '
+            'nitems INTEGER, items BLOB, message TEXT)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_path ON entries (path, seq)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'options'").fetchone()
+        if resume and row is not None and row[0] != self.options:
+            self._conn.close()
+            raise ValueError(
+                f'Journal {journal_file} was written with other parsing options, '
+                'run again without --resume to start over'
+            )
+        if not resume:
+            self._conn.execute('DELETE FROM entries')
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('options', ?)", (self.options,)
+        )
+        self._conn.commit()
+
+    def _latest(self, path):
+        """Latest (status, items) entry of an asset, None if not journaled."""
+        return self._conn.execute(
+            'SELECT status, items FROM entries WHERE path = ? ORDER BY seq DESC LIMIT 1', (path,)
+        ).fetchone()
+
+    def contains(self, path):
+        """Check if an asset was journaled as parsed, counted as resumed.
+
+        Args:
+            path (str): asset path.
+
+        Returns:
+            bool: True if the latest entry of the asset is 'ok'.
+        """
+        entry = self._latest(path)
+        found = entry is not None and entry[0] == 'ok'
+        if found:
+            self.resumed += 1
+        return found
+
+    def load(self, path):
+        """Load the journaled catalog items of an asset found by `contains`."""
+        return pickle.loads(self._latest(path)[1])
+
+    def put(self, path, items):
+        """Append the catalog items of a parsed asset and commit."""
+        self._conn.execute(
+            "INSERT INTO entries (path, status, nitems, items) VALUES (?, 'ok', ?, ?)",
+            (path, len(items), pickle.dumps(items))
+        )
+        self._conn.commit()
+        self.parsed += 1
+
+    def put_error(self, path, error):
+        """Append a failed asset and commit, it is parsed again on resume."""
+        self._conn.execute(
+            "INSERT INTO entries (path, status, nitems, message) VALUES (?, 'error', 0, ?)",
+            (path, f'{type(error).__name__}: {error}')
+        )
+        self._conn.commit()
+
+    def report(self):
+        """Summary string of resumed and newly parsed assets."""
+        return (f'Parse journal {self.journal_file}: {self.resumed} assets resumed, '
+                f'{self.parsed} assets journaled')
+
+    def close(self):
+        """Close the journal file."""
+        self._conn.commit()
+        self._conn.close()
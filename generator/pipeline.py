@@ -0,0 +1,171 @@
+"""Pipelined execution of the stages of create_catalog.py (--pipeline).
+
+Without --pipeline the stages of a build run one after the other: the
+whole tree is crawled before the first asset is parsed, and the remote
+copies of the catalog are made by reading the posix catalog back once it
+is saved. With --pipeline the stages run concurrently, connected by
+bounded queues:
+
+    crawler thread --assets--> parse thread (+ its workers) --rows--> writers
+
+- assets flow to the parsers as soon as their directory is listed,
+- rows flow to the posix writer and, with --make_remote, to the writers
+  of the remote copies (paths rewritten row by row, see remote_row),
+- a full queue blocks the stage feeding it (backpressure), so memory is
+  bounded by the queue sizes whatever the size of the collection,
+- an error in any stage stops the others and is raised by the build.
+
+The total build time then approaches the time of the slowest stage. Rows
+are written in the order the assets are discovered, which depends on
+the listing order of the directories, instead of the sorted asset order.
+"""
+
+import re
+import queue
+import threading
+
+
+# default number of items held by each queue between two stages
+DEFAULT_QUEUE_SIZE = 256
+
+# seconds between two checks of the stop flag while a queue is full
+_PUT_TIMEOUT = 0.1
+
+_DONE = object()
+
+
+class _Error:
+    """Exception of a producer, raised by the consumer."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def produce(iterable, maxsize=DEFAULT_QUEUE_SIZE, name='pipeline'):
+    """Iterate over an iterable in a thread, yielding its items through a bounded queue.
+
+    The producer thread blocks while the queue is full. When the consumer
+    stops early (error, close), the producer is stopped, the iterable is
+    closed in the producer thread and the thread is joined.
+
+    Args:
+        iterable (iterable): items of the producing stage.
+        maxsize (int): maximum number of items in the queue.
+        name (str): name of the producer thread.
+
+    Yields:
+        items of the iterable, in order.
+    """
+    items = queue.Queue(max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=_PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    break
+            else:
+                put(_DONE)
+        except BaseException as e:
+            put(_Error(e))
+        finally:
+            if hasattr(iterator, 'close'):
+                iterator.close()
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Error):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def unique(items):
+    """Yield the items of an iterable once, in order of first appearance."""
+    seen = set()
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            yield item
+
+
+def remote_row(row, path_columns, match_str, remote_str, basename_suffix=None):
+    """Copy of a catalog row with remote paths (row version of remote_paths).
+
+    Args:
+        row (dict): posix catalog row.
+        path_columns (list(str)): columns holding asset paths.
+        match_str (str): local path prefix.
+        remote_str (str): remote path prefix.
+        basename_suffix (str): appended to the basename before its extension,
+            None to keep basenames.
+
+    Returns:
+        dict: remote catalog row.
+    """
+    row = dict(row)
+    for column in path_columns:
+        path = row.get(column)
+        if not isinstance(path, str):
+            continue
+        path = path.replace(match_str, remote_str)
+        if basename_suffix:
+            path = re.sub(r'\.([^./]*)\Z', f'{basename_suffix}.\\1', path)
+        row[column] = path
+    return row
+
+
+class RemoteCatalogWriter:
+    """Writer of a remote copy of the catalog, fed with the posix rows.
+
+    Args:
+        writer (CatalogWriter): writer of the remote catalog file.
+        path_columns (list(str)): columns holding asset paths.
+        match_str (str): local path prefix.
+        remote_str (str): remote path prefix.
+        basename_suffix (str): appended to the basenames, None to keep them.
+    """
+
+    def __init__(self, writer, path_columns, match_str, remote_str, basename_suffix=None):
+        self.writer = writer
+        self.path_columns = path_columns
+        self.match_str = match_str
+        self.remote_str = remote_str
+        self.basename_suffix = basename_suffix
+
+    def write(self, row):
+        """Add a posix row to the remote catalog."""
+        self.writer.write(remote_row(row, self.path_columns, self.match_str, self.remote_str, self.basename_suffix))
+
+    def close(self):
+        """Write the remote catalog file, see CatalogWriter.close."""
+        return self.writer.close()
+
+    def discard(self):
+        """Remove the spool file without writing the remote catalog."""
+        self.writer.discard()
+
+
+def tee_rows(rows, writers):
+    """Write every row to the given writers while passing it on."""
+    for row in rows:
+        for writer in writers:
+            writer.write(row)
+        yield row
@@ -0,0 +1,142 @@
+"""Registry of the access protocols of the remote catalog copies.
+
+A catalog is generated with the paths of its source protocol (posix) and
+make_remote_catalog writes one copy per remote protocol,
+{dataset_id}-{protocol}.csv/.parquet/.json, with the path prefix of the
+source protocol replaced by the prefix of the remote protocol.
+
+The registry maps a catalog_data name to its protocols:
+
+    {
+        "zarr-glade": {
+            "posix": {"prefix": "/glade/campaign/collections/gdex/data/"},
+            "https": {"prefix": "https://data.gdex.ucar.edu/"},
+            "osdf": {"prefix": "osdf:///ncar/gdex/"}
+        }
+    }
+
+Each protocol holds:
+- prefix: path prefix of the data for that protocol.
+- basename_suffix (optional): appended to the basename before its
+  extension, for data with one copy per protocol (e.g. the reference files
+  file-remote-https.json / file-remote-osdf.json).
+- default (optional): false to only write the copy when the protocol is
+  requested explicitly (--protocols), true by default.
+
+A protocol config (json string or file) with the same layout adds
+catalog_data entries and protocols, or overrides fields of the built-in ones.
+"""
+
+import os
+import copy
+import json
+
+
+# setup global variables for BOREAS S3 bucket
+BOREAS_BUCKET_NAME = 'gdex-data'
+BOREAS_ENDPOINT_URL = 'https://boreas.hpc.ucar.edu:6443'
+
+# protocol of the paths of the generated catalog
+SOURCE_PROTOCOL = 'posix'
+
+GLADE_PREFIX = '/glade/campaign/collections/gdex/data/'
+
+BUILTIN_PROTOCOLS = {
+    'reference': {
+        SOURCE_PROTOCOL: {'prefix': GLADE_PREFIX},
+        # reference files are read from the globus end point for both protocols
+        # 'https://data-osdf.gdex.ucar.edu/' / 'osdf:///ncar/gdex/'
+        'https': {'prefix': 'https://data.gdex.ucar.edu/', 'basename_suffix': '-remote-https'},
+        'osdf': {'prefix': 'https://data.gdex.ucar.edu/', 'basename_suffix': '-remote-osdf'},
+    },
+    'zarr-glade': {
+        SOURCE_PROTOCOL: {'prefix': GLADE_PREFIX},
+        'https': {'prefix': 'https://data.gdex.ucar.edu/'},
+        # 'https://osdf-director.osg-htc.org/ncar/gdex/'
+        'osdf': {'prefix': 'osdf:///ncar/gdex/'},
+    },
+    'zarr-boreas': {
+        SOURCE_PROTOCOL: {'prefix': f'{BOREAS_ENDPOINT_URL}/{BOREAS_BUCKET_NAME}/'},
+        'https': {'prefix': 'https://osdata.gdex.ucar.edu/'},
+        # 'https://osdf-director.osg-htc.org/ncar-gdex/'
+        'osdf': {'prefix': 'osdf:///ncar-gdex/'},
+        's3': {'prefix': f's3://{BOREAS_BUCKET_NAME}/', 'default': False},
+    },
+}
+
+
+def load_protocol_registry(config=None):
+    """Built-in protocol registry updated with a protocol config.
+
+    Args:
+        config (str or dict): json string, json file or dict with the
+            registry layout, None for the built-in registry.
+
+    Returns:
+        dict: catalog_data -> protocol -> entry.
+
+    Raises:
+        ValueError: if a protocol has no prefix or a catalog_data entry has
+            no source protocol.
+    """
+    registry = copy.deepcopy(BUILTIN_PROTOCOLS)
+    if config is None:
+        return registry
+    if isinstance(config, str):
+        if os.path.isfile(config):
+            with open(config) as fh:
+                config = json.load(fh)
+        else:
+            config = json.loads(config)
+
+    for catalog_data, protocols in config.items():
+        entries = registry.setdefault(catalog_data, {})
+        for protocol, entry in protocols.items():
+            entries.setdefault(protocol, {}).update(entry)
+
+    for catalog_data, protocols in registry.items():
+        if SOURCE_PROTOCOL not in protocols:
+            raise ValueError(f'Catalog data {catalog_data} has no {SOURCE_PROTOCOL} protocol')
+        for protocol, entry in protocols.items():
+            if not isinstance(entry.get('prefix'), str):
+                raise ValueError(f'Protocol {protocol} of catalog data {catalog_data} has no prefix')
+    return registry
+
+
+def get_remote_protocols(registry, catalog_data, protocols=None):
+    """Source prefix and remote protocols of a catalog_data entry.
+
+    Args:
+        registry (dict): protocol registry (see load_protocol_registry).
+        catalog_data (str): catalog_data name.
+        protocols (list(str)): remote protocols to write, None for the
+            default protocols of the entry.
+
+    Returns:
+        (str, list(tuple)): source path prefix and the (protocol, prefix,
+            basename suffix) of each remote protocol.
+
+    Raises:
+        ValueError: if catalog_data or a protocol is not in the registry.
+    """
+    if catalog_data not in registry:
+        raise ValueError(
+            f'Unsupported catalog data type: {catalog_data} (available: {", ".join(registry)})'
+        )
+    entries = registry[catalog_data]
+    if protocols is None:
+        protocols = [
+            protocol for protocol, entry in entries.items()
+            if protocol != SOURCE_PROTOCOL and entry.get('default', True)
+        ]
+
+    remote = []
+    for protocol in protocols:
+        if protocol == SOURCE_PROTOCOL or protocol not in entries:
+            raise ValueError(
+                f'Unsupported remote protocol {protocol} for catalog data {catalog_data} '
+                f'(available: {", ".join(p for p in entries if p != SOURCE_PROTOCOL)})'
+            )
+        entry = entries[protocol]
+        remote.append((protocol, entry['prefix'], entry.get('basename_suffix')))
+    return entries[SOURCE_PROTOCOL]['prefix'], remote
@@ -0,0 +1,258 @@
+"""On-disk read-through cache of the remote reads of the native readers.
+
+With --cache_dir, the consolidated metadata, reference files and time
+chunks fetched from remote URLs (Boreas https endpoint, s3, https hosted
+references and their targets) by the native zarr/reference readers are
+kept in a SQLite file of the cache directory, so repeated builds and dry
+runs read them from local disk.
+
+A cached read is reused as long as the asset it was read for did not
+change: the fingerprint of the asset (ETag/Last-Modified of the
+consolidated metadata or reference file, mtime/size for posix files, see
+parse_cache.asset_fingerprint) is checked once per asset and build, so a
+fully cached asset costs a single metadata request. The least recently
+used reads are evicted when the cache grows over --cache_max_bytes.
+
+Hits and misses are counted per build in the SQLite file, so the reads
+of the process workers are included in the hit-rate report.
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import hashlib
+import functools
+import threading
+
+import fsspec
+
+from parse_cache import asset_fingerprint
+from session_pool import get_session_pool
+
+
+# default size limit of the cached reads (bytes)
+DEFAULT_MAX_BYTES = 2 ** 30
+
+# SQLite file of the cache directory
+CACHE_FILE = 'reads.sqlite'
+
+# number of least recently used reads looked up at a time when evicting
+EVICT_BATCH = 256
+
+
+def is_remote(url):
+    """Check if a url is read from a remote filesystem."""
+    return '://' in url and not url.startswith('file://')
+
+
+def fetch(url, start=None, end=None):
+    """Read a whole file, or the byte range [start, end) of a file, with fsspec."""
+    pool = get_session_pool()
+    if pool is not None and pool.pools(url):
+        return pool.cat_file(url, start, end)
+    fs, path = fsspec.core.url_to_fs(url)
+    if start is None and end is None:
+        return fs.cat_file(path)
+    return fs.cat_file(path, start=start, end=end)
+
+
+def read_key(url, start=None, end=None):
+    """Cache key of a read."""
+    return hashlib.sha256(f'{url}\0{start}\0{end}'.encode('utf-8')).hexdigest()
+
+
+class ReadCache:
+    """SQLite backed LRU cache of remote reads.
+
+    Args:
+        cache_dir (str): cache directory (created if missing).
+        max_bytes (int): size limit of the cached reads.
+        session (str): id of the build counting the hits and misses,
+            shared by the processes of a build.
+        storage_options (dict): fsspec storage options used to fingerprint
+            remote assets.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, session=None, storage_options=None):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.session = session or uuid.uuid4().hex
+        self.storage_options = storage_options
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+        # shared by the threads of the thread executor, guarded by _lock
+        self._conn = sqlite3.connect(os.path.join(cache_dir, CACHE_FILE), timeout=60, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS reads ('
+            'key TEXT PRIMARY KEY, url TEXT, fingerprint TEXT, size INTEGER, last_access REAL, data BLOB)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS reads_last_access ON reads (last_access)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS counters ('
+            'session TEXT PRIMARY KEY, hits INTEGER, misses INTEGER, hit_bytes INTEGER, '
+            'miss_bytes INTEGER, evicted INTEGER)'
+        )
+        self._conn.execute(
+            'INSERT OR IGNORE INTO counters VALUES (?, 0, 0, 0, 0, 0)', (self.session,)
+        )
+        self._conn.commit()
+
+    def fingerprint(self, asset):
+        """Fingerprint of an asset, fetched once per cache instance."""
+        with self._lock:
+            if asset in self._fingerprints:
+                return self._fingerprints[asset]
+        fingerprint = asset_fingerprint(asset, self.storage_options)
+        with self._lock:
+            self._fingerprints[asset] = fingerprint
+        return fingerprint
+
+    def read(self, asset, url, start=None, end=None):
+        """Read a file or byte range of an asset, from the cache when it is valid.
+
+        Args:
+            asset (str): asset the read is made for, cached reads are valid
+                while its fingerprint does not change.
+            url (str): file to read, posix files are not cached.
+            start (int): first byte of the range.
+            end (int): end of the range (exclusive).
+
+        Returns:
+            bytes: content of the file or range.
+        """
+        if not is_remote(url):
+            return fetch(url, start, end)
+        fingerprint = self.fingerprint(asset)
+        key = read_key(url, start, end)
+        with self._lock:
+            row = self._conn.execute('SELECT fingerprint, data FROM reads WHERE key = ?', (key,)).fetchone()
+            if row is not None and row[0] == fingerprint:
+                self._conn.execute('UPDATE reads SET last_access = ? WHERE key = ?', (time.time(), key))
+                self._count(hits=1, hit_bytes=len(row[1]))
+                self._conn.commit()
+                return row[1]
+
+        data = fetch(url, start, end)
+        with self._lock:
+            self._count(misses=1, miss_bytes=len(data))
+            if len(data) <= self.max_bytes:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO reads VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, url, fingerprint, len(data), time.time(), data)
+                )
+                self._evict()
+            self._conn.commit()
+        return data
+
+    def _count(self, **counts):
+        """Add to the counters of the session (in the current transaction)."""
+        assignments = ', '.join(f'{name} = {name} + ?' for name in counts)
+        self._conn.execute(
+            f'UPDATE counters SET {assignments} WHERE session = ?', (*counts.values(), self.session)
+        )
+
+    def _evict(self):
+        """Drop the least recently used reads until the cache fits in max_bytes."""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM reads').fetchone()[0]
+        evicted = 0
+        while total > self.max_bytes:
+            oldest = self._conn.execute(
+                'SELECT key, size FROM reads ORDER BY last_access LIMIT ?', (EVICT_BATCH,)
+            ).fetchall()
+            for key, size in oldest:
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute('DELETE FROM reads WHERE key = ?', (key,))
+                total -= size
+                evicted += 1
+        if evicted:
+            self._count(evicted=evicted)
+
+    def stats(self):
+        """Counters of the session (hits, misses, hit_bytes, miss_bytes, evicted) and cache size."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT hits, misses, hit_bytes, miss_bytes, evicted FROM counters WHERE session = ?',
+                (self.session,)
+            ).fetchone()
+            size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM reads').fetchone()[0]
+        stats = dict(zip(['hits', 'misses', 'hit_bytes', 'miss_bytes', 'evicted'], row))
+        stats['size'] = size
+        return stats
+
+    def report(self):
+        """Summary string of the hits and misses of the session."""
+        stats = self.stats()
+        total = stats['hits'] + stats['misses']
+        rate = 100. * stats['hits'] / total if total else 0.
+        return (f'Read cache {self.cache_dir}: {stats["hits"]} hits, {stats["misses"]} misses '
+                f'({rate:.1f}% hit rate), {stats["hit_bytes"] / 1e6:.1f} MB read from disk, '
+                f'{stats["evicted"]} evicted, {stats["size"] / 1e6:.1f}/{self.max_bytes / 1e6:.1f} MB used')
+
+    def close(self):
+        """Commit and close the cache file."""
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+# process-wide read cache of the native readers: settings of the build and
+# the cache opened by this process (a forked worker opens its own)
+_settings = None
+_cache = None
+_cache_pid = None
+
+
+def enable_read_cache(cache_dir, max_bytes=DEFAULT_MAX_BYTES, storage_options=None):
+    """Route the remote reads of the native readers through a read cache.
+
+    Returns:
+        ReadCache: cache of the calling process (see report).
+    """
+    global _settings
+    disable_read_cache()
+    _settings = {
+        'cache_dir': cache_dir, 'max_bytes': max_bytes, 'session': uuid.uuid4().hex,
+        'storage_options': storage_options,
+    }
+    return get_read_cache()
+
+
+def disable_read_cache():
+    """Stop caching the remote reads, the cache of this process is closed."""
+    global _settings, _cache, _cache_pid
+    if _cache is not None and _cache_pid == os.getpid():
+        _cache.close()
+    _settings = _cache = _cache_pid = None
+
+
+def get_read_cache():
+    """Read cache of this process, None when the read cache is not enabled."""
+    global _cache, _cache_pid
+    if _settings is None:
+        return None
+    if _cache is None or _cache_pid != os.getpid():
+        # SQLite connections must not be shared with forked workers
+        _cache = ReadCache(**_settings)
+        _cache_pid = os.getpid()
+    return _cache
+
+
+def asset_reader(asset):
+    """Function reading the files and byte ranges of an asset.
+
+    Args:
+        asset (str): path or URL of the asset.
+
+    Returns:
+        callable: read(url, start=None, end=None) -> bytes, through the
+            read cache when it is enabled.
+    """
+    cache = get_read_cache()
+    if cache is None:
+        return fetch
+    return functools.partial(cache.read, asset)
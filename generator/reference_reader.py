@@ -0,0 +1,181 @@
+"""Native kerchunk/virtualizarr reference metadata reader used by create_catalog.py.
+
+Builds a DatasetHeader straight from a reference file, without setting up an
+fsspec reference filesystem or an xarray engine:
+
+- JSON references (version 0 or 1): the inline `.zattrs`/`.zarray` entries
+  are taken from the JSON.
+- Parquet references (`.parq` directories): only the `.zmetadata` object is
+  read up front; a variable partition (`<var>/refs.<n>.parq`) is only loaded
+  when values of that variable are requested.
+
+Values are read by resolving the references of the chunks holding the
+requested elements only (inline data or a single byte range each) and
+decoding them with zarr. With a read cache (see read_cache.py), the remote
+reference files and chunks are read through it.
+"""
+
+import io
+import os
+import json
+import base64
+
+import numpy as np
+import pandas as pd
+from zarr.core.array import Array, AsyncArray
+from zarr.core.buffer import default_buffer_prototype
+from zarr.storage import MemoryStore, StorePath
+
+from dataset_header import DatasetHeader
+from zarr_reader import get_variable_header, get_group_attrs, read_coordinate_selection
+from read_cache import asset_reader
+
+
+def is_parquet_reference(path):
+    """Check if a reference path is a parquet reference directory."""
+    path = path.rstrip('/')
+    return path.endswith('.parq') or (os.path.isdir(path) and os.path.exists(os.path.join(path, '.zmetadata')))
+
+
+def _load_json_value(value):
+    """Load a metadata entry stored either as JSON text or as an object."""
+    if isinstance(value, (str, bytes)):
+        return json.loads(value)
+    return value
+
+
+def _inline_bytes(value):
+    """Bytes of an inline reference value (raw text or base64 encoded)."""
+    if isinstance(value, bytes):
+        return value
+    if value.startswith('base64:'):
+        return base64.b64decode(value[len('base64:'):])
+    return value.encode()
+
+
+def get_chunk_keys(flat_indices, shape, chunks, separator='.'):
+    """Get the chunk key and chunk index holding each flat index.
+
+    Args:
+        flat_indices (list(int)): indices into the flattened array.
+        shape (tuple(int)): array shape.
+        chunks (tuple(int)): chunk shape.
+        separator (str): zarr v2 dimension separator.
+
+    Returns:
+        dict: chunk key -> chunk index (position in the C ordered chunk grid).
+    """
+    if len(shape) == 0:
+        return {'0': 0}
+    nchunks = [-(-size // chunk) for size, chunk in zip(shape, chunks)]
+    chunk_keys = {}
+    for flat_index in flat_indices:
+        coords = np.unravel_index(flat_index, shape)
+        chunk_coords = [int(coord) // chunk for coord, chunk in zip(coords, chunks)]
+        key = separator.join(str(coord) for coord in chunk_coords)
+        chunk_keys[key] = int(np.ravel_multi_index(chunk_coords, nchunks))
+    return chunk_keys
+
+
+class ReferenceHeader(DatasetHeader):
+    """DatasetHeader of a kerchunk/virtualizarr reference file (JSON or parquet).
+
+    Args:
+        path (str): path or URL of the reference JSON file or parquet directory.
+
+    Raises:
+        KeyError: for references that can not be read natively (generators).
+    """
+
+    def __init__(self, path):
+        self.path = path.rstrip('/')
+        self.parquet = is_parquet_reference(self.path)
+        self.templates = {}
+        self.refs = {}
+        self.record_size = None
+        self.read = asset_reader(self.path)
+        if self.parquet:
+            zmetadata = json.loads(self.read(f'{self.path}/.zmetadata'))
+            metadata = zmetadata['metadata']
+            self.record_size = zmetadata['record_size']
+        else:
+            references = json.loads(self.read(self.path))
+            if 'gen' in references:
+                raise KeyError('reference generators are not supported by the native reader')
+            self.templates = references.get('templates', {})
+            self.refs = references.get('refs', references)
+            metadata = self.refs
+
+        # only the requested chunks are added to this store
+        self._chunks = {}
+        store = MemoryStore(self._chunks, read_only=True)
+        self.arrays = {}
+        self.separators = {}
+        variables = {}
+        array_names = sorted(key[:-len('/.zarray')] for key in metadata if key.endswith('/.zarray'))
+        for name in array_names:
+            if '/' in name:
+                continue
+            array_meta = dict(_load_json_value(metadata[f'{name}/.zarray']))
+            array_meta['attributes'] = _load_json_value(metadata.get(f'{name}/.zattrs', {}))
+            array = Array(AsyncArray(metadata=array_meta, store_path=StorePath(store, name)))
+            self.arrays[name] = array
+            self.separators[name] = array_meta.get('dimension_separator') or '.'
+            variables[name] = get_variable_header(array, zarr_format=2)
+
+        group_attrs = _load_json_value(metadata.get('.zattrs', {}))
+        super().__init__(get_group_attrs(group_attrs), variables)
+
+    def _render(self, url):
+        """Expand {{template}} entries of a reference url."""
+        for key, value in self.templates.items():
+            url = url.replace('{{' + key + '}}', value)
+        return url
+
+    def _fetch(self, url, offset=None, size=None):
+        """Read a whole file or a single byte range of a referenced file."""
+        if offset is None or (offset == 0 and not size):
+            return self.read(self._render(url))
+        return self.read(self._render(url), offset, offset + size)
+
+    def _json_chunk(self, name, key):
+        """Bytes of a chunk from a JSON reference, None for a missing chunk."""
+        ref = self.refs.get(f'{name}/{key}')
+        if ref is None:
+            return None
+        if isinstance(ref, (str, bytes)):
+            return _inline_bytes(ref)
+        if len(ref) == 1:
+            return self._fetch(ref[0])
+        return self._fetch(ref[0], ref[1], ref[2])
+
+    def _parquet_chunks(self, name, chunk_keys):
+        """Bytes of chunks from the parquet partitions holding them."""
+        chunks = {}
+        partitions = {}
+        for key, chunk_index in chunk_keys.items():
+            partitions.setdefault(chunk_index // self.record_size, []).append((key, chunk_index))
+        for partition, keys in partitions.items():
+            partition_bytes = self.read(f'{self.path}/{name}/refs.{partition}.parq')
+            refs = pd.read_parquet(io.BytesIO(partition_bytes), columns=['path', 'offset', 'size', 'raw'])
+            for key, chunk_index in keys:
+                ref = refs.iloc[chunk_index % self.record_size]
+                if ref['raw'] is not None and not pd.isna(ref['raw']):
+                    chunks[key] = _inline_bytes(ref['raw'])
+                elif ref['path'] is not None and not pd.isna(ref['path']):
+                    chunks[key] = self._fetch(ref['path'], int(ref['offset']), int(ref['size']))
+        return chunks
+
+    def read_values(self, name, flat_indices):
+        array = self.arrays[name]
+        chunk_keys = get_chunk_keys(flat_indices, array.shape, array.chunks, self.separators[name])
+        if self.parquet:
+            chunks = self._parquet_chunks(name, chunk_keys)
+        else:
+            chunks = {key: self._json_chunk(name, key) for key in chunk_keys}
+
+        buffer = default_buffer_prototype().buffer
+        for key, data in chunks.items():
+            if data is not None:
+                self._chunks[f'{name}/{key}'] = buffer.from_bytes(data)
+        return read_coordinate_selection(array, flat_indices)
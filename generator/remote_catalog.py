@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+"""Remote (e.g. OSDF and HTTP) copies of the posix catalogs of create_catalog.py.
+
+The copies only rewrite the path prefix of the catalog paths, nothing is
+parsed again, so this module only needs pyarrow: it is used by
+create_catalog.py --make_remote, merge_catalog.py and
+aggregate_references.py, and on its own (or as `cli.py remote`) to make the
+remote copies of an existing posix catalog without the import cost of
+create_catalog.py.
+
+Usage:
+
+python remote_catalog.py <json file/catalog file> [<json file/catalog file> ...]
+    [--catalog_data <data>]
+    [--protocol_config <json string/filename>]
+    [--protocols <protocol>]
+
+Notes:
+- the catalog files must follow the naming convention {dataset_id}-posix
+  (.csv/.parquet/.json), the copies are written next to them as
+  {dataset_id}-{protocol} with their json file.
+- the output format is taken from the catalog file: csv_and_json for .csv,
+  parquet for .parquet, single_json for a .json file without catalog_file.
+
+Example:
+python remote_catalog.py catalog/d640000-posix.json --catalog_data reference
+"""
+
+import os
+import csv
+import sys
+import json
+import argparse
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from protocols import SOURCE_PROTOCOL, load_protocol_registry, get_remote_protocols
+
+
+# catalog columns holding asset paths, rewritten in the remote copies
+PATH_COLUMNS = ('path', 'aggregated_path')
+
+
+def make_remote_json(json_filename, dataset_id, output_ext, protocols=('osdf', 'https')):
+    """Write the remote versions of the json file of a csv/parquet catalog.
+
+    Args:
+        json_filename (str): posix json file ({dataset_id}-posix.json).
+        dataset_id (str): dataset id.
+        output_ext (str): extension of the catalog file ('.csv' or '.parquet').
+        protocols (list(str)): remote protocols, one json file each.
+    """
+    with open(json_filename) as fh:
+        data = json.load(fh)
+    for protocol in protocols:
+        # catalog file next to the json file e.g. for the https version
+        #  https://data.gdex.ucar.edu/{dataset_id}/catalogs/{dataset_id}-https.csv
+        data['catalog_file'] = f'{dataset_id}-{protocol}{output_ext}'
+        outfile = json_filename.replace(f'-{SOURCE_PROTOCOL}.json', f'-{protocol}.json')
+        with open(outfile, 'w') as fh:
+            json.dump(data, fh)
+
+def remote_paths(paths, match_str, remote_str, basename_suffix=None):
+    """Replace the local prefix of catalog paths by a remote prefix.
+
+    Args:
+        paths (pyarrow.Array): catalog paths.
+        match_str (str): local path prefix.
+        remote_str (str): remote path prefix.
+        basename_suffix (str): appended to the basename before its extension
+            (e.g. data.json -> data-remote-https.json), None to keep basenames.
+
+    Returns:
+        pyarrow.Array: remote paths.
+    """
+    paths = pc.replace_substring(paths, match_str, remote_str)
+    if basename_suffix:
+        paths = pc.replace_substring_regex(paths, r'\.([^./]*)$', f'{basename_suffix}.\\1')
+    return paths
+
+def csv_field(column):
+    """Format a string column as csv fields, quoting like csv.QUOTE_MINIMAL.
+
+    Args:
+        column (pyarrow.Array): string column.
+
+    Returns:
+        pyarrow.Array: csv fields.
+    """
+    needs_quotes = pc.match_substring_regex(column, '[,"\r\n]')
+    if not pc.any(needs_quotes).as_py():
+        return column
+    quoted = pc.binary_join_element_wise('"', pc.replace_substring(column, '"', '""'), '"', '')
+    return pc.if_else(needs_quotes, quoted, column)
+
+def write_csv_lines(fh, fields):
+    """Write csv fields (one string array per column) as lines to a binary file.
+
+    The lines are joined in arrow and their data buffer is written at once.
+    """
+    lines = pc.binary_join_element_wise(*fields, ',')
+    lines = pc.binary_join_element_wise(lines, '', '\n')
+    offsets = np.frombuffer(lines.buffers()[1], dtype=np.int32)[lines.offset:lines.offset + len(lines) + 1]
+    fh.write(memoryview(lines.buffers()[2])[offsets[0]:offsets[-1]])
+
+def open_csv_strings(filename, block_size=1 << 24):
+    """Open a csv catalog for reading in blocks with every cell kept as text.
+
+    Quoted fields with commas or new lines are kept intact and empty cells
+    are read as empty strings.
+
+    Args:
+        filename (str): csv catalog.
+        block_size (int): number of bytes read at once.
+
+    Returns:
+        (list(str), pyarrow.csv.CSVStreamingReader): columns of the catalog
+            and reader of its record batches.
+    """
+    with open(filename, newline='', encoding='utf-8') as fh:
+        columns = next(csv.reader(fh), [])
+    reader = pcsv.open_csv(
+        filename,
+        read_options=pcsv.ReadOptions(block_size=block_size),
+        parse_options=pcsv.ParseOptions(newlines_in_values=True),
+        convert_options=pcsv.ConvertOptions(
+            column_types={column: pa.string() for column in columns},
+            strings_can_be_null=False,
+            quoted_strings_can_be_null=False
+        )
+    )
+    return columns, reader
+
+def make_remote_csv(filename, targets, match_str, block_size=1 << 24):
+    """Write copies of a csv catalog with remote paths from a single read.
+
+    The catalog is read in blocks with every cell kept as text (see
+    open_csv_strings) and only the path columns (PATH_COLUMNS) are
+    rewritten, with vectorized string operations (see remote_paths).
+
+    Args:
+        filename (str): posix csv catalog.
+        targets (list(tuple)): (outfile, remote path prefix, basename suffix)
+            of each remote copy.
+        match_str (str): local path prefix.
+        block_size (int): number of bytes read at once.
+    """
+    columns, reader = open_csv_strings(filename, block_size=block_size)
+    path_indices = [columns.index(column) for column in PATH_COLUMNS if column in columns]
+    handles = [open(outfile, 'wb') for outfile, _, _ in targets]
+    try:
+        header = [csv_field(pa.array([column])) for column in columns]
+        for fh in handles:
+            write_csv_lines(fh, header)
+        for batch in reader:
+            if batch.num_rows == 0:
+                continue
+            fields = [csv_field(column) for column in batch.columns]
+            for fh, (_, remote_str, basename_suffix) in zip(handles, targets):
+                for path_index in path_indices:
+                    paths = batch.column(path_index)
+                    fields[path_index] = csv_field(remote_paths(paths, match_str, remote_str, basename_suffix))
+                write_csv_lines(fh, fields)
+    finally:
+        for fh in handles:
+            fh.close()
+
+def make_remote_parquet(filename, targets, match_str):
+    """Write copies of a parquet catalog with remote paths from a single read.
+
+    Row groups, column types and encodings of the catalog are kept.
+
+    Args:
+        filename (str): posix parquet catalog.
+        targets (list(tuple)): (outfile, remote path prefix, basename suffix)
+            of each remote copy.
+        match_str (str): local path prefix.
+    """
+    parquet_file = pq.ParquetFile(filename)
+    schema = parquet_file.schema_arrow
+    path_indices = [schema.get_field_index(column) for column in PATH_COLUMNS if column in schema.names]
+    string_columns = [field.name for field in schema if field.type == 'string']
+    writers = [
+        pq.ParquetWriter(outfile, schema, use_dictionary=string_columns, write_statistics=True)
+        for outfile, _, _ in targets
+    ]
+    try:
+        for i in range(parquet_file.num_row_groups):
+            table = parquet_file.read_row_group(i)
+            for writer, (_, remote_str, basename_suffix) in zip(writers, targets):
+                remote_table = table
+                for path_index in path_indices:
+                    paths = remote_paths(table.column(path_index), match_str, remote_str, basename_suffix)
+                    remote_table = remote_table.set_column(path_index, schema.field(path_index), paths)
+                writer.write_table(remote_table, row_group_size=max(remote_table.num_rows, 1))
+    finally:
+        for writer in writers:
+            writer.close()
+
+def make_remote_single_json(filename, targets, match_str):
+    """Write copies of a single json catalog with remote paths from a single read.
+
+    The catalog is serialized once and the prefix is replaced in the text of
+    each copy (basenames are kept), which gives the same file as loading
+    and dumping the replaced text.
+
+    Args:
+        filename (str): posix json catalog.
+        targets (list(tuple)): (outfile, remote path prefix, basename suffix)
+            of each remote copy.
+        match_str (str): local path prefix.
+    """
+    with open(filename) as fh:
+        text = json.dumps(json.load(fh))
+    # prefixes as they appear inside json strings
+    match_str = json.dumps(match_str)[1:-1]
+    for outfile, remote_str, _ in targets:
+        with open(outfile, 'w') as fh:
+            fh.write(text.replace(match_str, json.dumps(remote_str)[1:-1]))
+
+def get_output_ext(output_format):
+    """Extension of the catalog file of an output format."""
+    if output_format.lower() == 'csv_and_json':
+        return '.csv'
+    if output_format.lower() == 'parquet':
+        return '.parquet'
+    if output_format.lower() == 'single_json':
+        return '.json'
+    raise ValueError(f'Unsupported output format: {output_format}')
+
+def get_remote_targets(filename, catalog_data='reference', output_format='csv_and_json',
+                       protocols=None, protocol_config=None):
+    """Remote copies of a posix catalog file, see make_remote_catalog.
+
+    Returns:
+        (str, list(tuple), list(tuple)): path prefix of the posix file, the
+            (protocol, prefix, basename suffix) of each remote protocol and
+            the (outfile, prefix, basename suffix) of each remote copy.
+    """
+    output_ext = get_output_ext(output_format)
+    # path prefix of the posix file and (protocol, prefix, basename suffix) of the copies
+    registry = load_protocol_registry(protocol_config)
+    match_str, remote = get_remote_protocols(registry, catalog_data, protocols)
+
+    targets = []
+    for protocol, remote_str, basename_suffix in remote:
+        outfile = filename.replace(f'-{SOURCE_PROTOCOL}{output_ext}', f'-{protocol}{output_ext}')
+        # check if catalog filename follows naming convention
+        if outfile == filename:
+            raise ValueError(
+                f'Filename {filename} does not follow the required naming convention of {{dataset_id}}-posix{{.csv/.json}}'
+            )
+        targets.append((outfile, remote_str, basename_suffix))
+    return match_str, remote, targets
+
+def make_remote_catalog(filename, catalog_data='reference', output_format='csv_and_json',
+                        protocols=None, protocol_config=None):
+    """
+    Make the remote (e.g. OSDF and HTTP) versions of a given file.
+
+    Parameters
+    ----------
+    filename : str
+        Local file path to the catalog file (csv, parquet or json).
+    catalog_data : str
+        The type of data to be cataloged, which determines how paths are modified.
+        Entry of the protocol registry, the built-in ones are 'reference',
+        'zarr-boreas', and 'zarr-glade'. Default is 'reference'.
+    output_format : str
+        The format of the catalog file, which determines how the file is read and modified.
+        Options are 'csv_and_json', 'single_json' and 'parquet'. Default is 'csv_and_json'.
+    protocols : list(str)
+        Remote protocols to write. Default is the default protocols of the
+        catalog_data entry (https and osdf for the built-in ones).
+    protocol_config : str or dict
+        Json string, json file or dict added to the built-in protocol
+        registry (see protocols.py).
+
+    Returns
+    -------
+    list(str)
+        The remote catalog files.
+
+    Raises
+    ------
+    ValueError
+        If the filename does not follow the required naming convention
+        of {dataset_id}-posix{.csv/.json}, or catalog_data / a protocol is
+        not in the registry.
+
+    Notes
+    -----
+    Assumes that the input filename contains paths. Every remote version
+    is created by replacing the local path prefix with the prefix of its
+    protocol, all of them from a single read of the posix file. The posix
+    protocol file name must be in the format of
+
+        {dataset_id}-{protocol}.csv or .json
+
+    Since the catalog file name is not foreced to be in that format,
+    The function will check for the filenaming convention to determine
+    if the file is valid for remote copy creation. if convention is not 
+    met, an error will be raised and the function will exit.
+
+    """
+    print(f'Making remote copies of {filename}')
+    # find name before extension
+    filename_base = os.path.basename(filename)
+    # find output directory path
+    out_dir = os.path.dirname(filename)
+    # based on catalog output format get the dataset number
+    dataset_id = filename_base.split('-')[0]
+    output_ext = get_output_ext(output_format)
+
+    # remote copies (outfile, path prefix, basename suffix) written from a single read
+    match_str, remote, targets = get_remote_targets(filename, catalog_data, output_format, protocols, protocol_config)
+
+    if output_format.lower() == 'csv_and_json' :
+        # rewrite the path column one chunk at a time
+        make_remote_csv(filename, targets, match_str)
+
+        # modify json file that is associated with csv
+        json_filename = os.path.join(out_dir, filename_base.replace('.csv', '.json'))
+        make_remote_json(json_filename, dataset_id, output_ext, [protocol for protocol, _, _ in remote])
+
+    elif output_format.lower() == 'parquet':
+        # rewrite the path column one row group at a time
+        make_remote_parquet(filename, targets, match_str)
+
+        # modify json file that is associated with parquet
+        json_filename = os.path.join(out_dir, filename_base.replace('.parquet', '.json'))
+        make_remote_json(json_filename, dataset_id, output_ext, [protocol for protocol, _, _ in remote])
+
+    elif output_format.lower() == 'single_json':
+        make_remote_single_json(filename, targets, match_str)
+
+    else:
+        raise ValueError(f'Unsupported output format: {output_format}')
+
+    return [outfile for outfile, _, _ in targets]
+
+
+def catalog_format_of(source):
+    """Catalog file and output format of a json file or catalog file.
+
+    Args:
+        source (str): json file or csv/parquet catalog file.
+
+    Returns:
+        (str, str): catalog file and its output format (csv_and_json,
+            parquet or single_json).
+    """
+    if source.endswith('.csv'):
+        return source, 'csv_and_json'
+    if source.endswith('.parquet'):
+        return source, 'parquet'
+    with open(source) as fh:
+        catalog_file = json.load(fh).get('catalog_file')
+    if catalog_file is None:
+        return source, 'single_json'
+    return catalog_format_of(os.path.join(os.path.dirname(source), os.path.basename(catalog_file)))
+
+
+def get_parser():
+    """Creates and returns the argparse parser."""
+    parser = argparse.ArgumentParser(description='Make the remote copies of posix catalogs.')
+    parser.add_argument('sources', nargs='+', metavar='<json file/catalog file>',
+                        help='Posix catalogs ({dataset_id}-posix.json/.csv/.parquet).')
+    parser.add_argument('--catalog_data', '-cd', default='reference', metavar='<data>',
+                        help='Protocol registry entry of the catalogs (see protocols.py).')
+    parser.add_argument('--protocol_config', default=None, metavar='<json string/filename>',
+                        help='Access protocols added to the built-in registry.')
+    parser.add_argument('--protocols', nargs='+', default=None, metavar='<protocol>',
+                        help='Remote protocols to write (default: the default protocols of --catalog_data).')
+    return parser
+
+
+def main(args_list):
+    """Use command line-like arguments to execute."""
+    args = get_parser().parse_args(args_list)
+    for source in args.sources:
+        catalog_file, output_format = catalog_format_of(source)
+        for outfile in make_remote_catalog(
+            catalog_file,
+            catalog_data=args.catalog_data,
+            output_format=output_format,
+            protocols=args.protocols,
+            protocol_config=args.protocol_config
+        ):
+            print(f'Remote catalog written to {outfile}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
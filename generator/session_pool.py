@@ -0,0 +1,188 @@
+"""Process-wide pool of the remote filesystems read by create_catalog.py.
+
+Without the pool, every remote asset gets its own fsspec filesystem (zarr
+creates one per store and per thread), so each store of a remote
+collection opens new connections and pays for new TLS handshakes. With the
+pool, the assets of a build share a single async filesystem per protocol
+(the Boreas https endpoint the s3:// zarr stores are read from, s3 with the
+storage_options of the build), running on the zarr event loop:
+
+- http(s) connections are kept alive between requests and assets
+  (KEEPALIVE_TIMEOUT), s3 clients use TCP keep-alive,
+- at most max_connections connections are open at a time per protocol,
+  concurrent requests beyond that wait for a free connection,
+- the xarray zarr engine, the native zarr and reference readers (see
+  zarr_reader.py, read_cache.py) read through the same filesystems.
+
+Workers of the process executor open their own pool (the sessions of the
+parent cannot be used after a fork).
+"""
+
+import os
+import functools
+import threading
+
+import fsspec
+from zarr.core.sync import sync
+from zarr.storage import FsspecStore
+
+
+# default maximum number of concurrent connections per protocol
+DEFAULT_MAX_CONNECTIONS = 16
+
+# seconds an idle http connection is kept open for the next request
+KEEPALIVE_TIMEOUT = 60
+
+# protocols read through the pool
+POOLED_PROTOCOLS = ('http', 'https', 's3')
+
+
+async def pooled_client(limit=DEFAULT_MAX_CONNECTIONS, keepalive_timeout=KEEPALIVE_TIMEOUT, **kwargs):
+    """aiohttp session of the pooled http filesystems (get_client of HTTPFileSystem).
+
+    Args:
+        limit (int): maximum number of concurrent connections.
+        keepalive_timeout (float): seconds an idle connection is kept open.
+        kwargs: aiohttp.ClientSession arguments.
+    """
+    import aiohttp
+
+    connector = aiohttp.TCPConnector(limit=limit, keepalive_timeout=keepalive_timeout)
+    return aiohttp.ClientSession(connector=connector, **kwargs)
+
+
+def get_protocol(url):
+    """Protocol of a URL, None for posix paths."""
+    if '://' not in url:
+        return None
+    return url.split('://', 1)[0]
+
+
+def pool_options(protocol, storage_options=None, max_connections=DEFAULT_MAX_CONNECTIONS):
+    """fsspec filesystem arguments of a pooled protocol.
+
+    Args:
+        protocol (str): http, https or s3.
+        storage_options (dict): fsspec storage options keyed by protocol.
+        max_connections (int): maximum number of concurrent connections.
+
+    Returns:
+        dict: filesystem arguments, with the connection limit and keep-alive.
+    """
+    options = dict((storage_options or {}).get(protocol, {}))
+    if protocol in ('http', 'https'):
+        options['get_client'] = functools.partial(pooled_client, limit=max_connections)
+    elif protocol == 's3':
+        config_kwargs = dict(options.get('config_kwargs', {}))
+        config_kwargs.setdefault('max_pool_connections', max_connections)
+        config_kwargs.setdefault('tcp_keepalive', True)
+        options['config_kwargs'] = config_kwargs
+    return options
+
+
+class SessionPool:
+    """Shared async filesystems of the remote protocols of a build.
+
+    Args:
+        storage_options (dict): fsspec storage options keyed by protocol
+            (e.g. the Boreas s3 credentials set by main).
+        max_connections (int): maximum number of concurrent connections per
+            protocol.
+    """
+
+    def __init__(self, storage_options=None, max_connections=DEFAULT_MAX_CONNECTIONS):
+        self.storage_options = storage_options
+        self.max_connections = max_connections
+        self._filesystems = {}
+        self._lock = threading.Lock()
+
+    def pools(self, url):
+        """Check if a URL is read through the pool."""
+        return get_protocol(url) in POOLED_PROTOCOLS
+
+    def filesystem(self, url):
+        """Shared filesystem of the protocol of a URL (created on first use)."""
+        protocol = get_protocol(url)
+        with self._lock:
+            if protocol not in self._filesystems:
+                # async instance owned by the pool, its session lives on the zarr loop
+                self._filesystems[protocol] = fsspec.filesystem(
+                    protocol, asynchronous=True, skip_instance_cache=True,
+                    **pool_options(protocol, self.storage_options, self.max_connections)
+                )
+            return self._filesystems[protocol]
+
+    def cat_file(self, url, start=None, end=None):
+        """Read a whole file, or the byte range [start, end) of a file."""
+        fs = self.filesystem(url)
+        return sync(fs._cat_file(fs._strip_protocol(url), start=start, end=end))
+
+    def zarr_store(self, url):
+        """Read-only zarr store of a URL on the shared filesystem."""
+        fs = self.filesystem(url)
+        path = fs._strip_protocol(url)
+        if '://' in path and not path.startswith('http'):
+            path = path.split('://', 1)[1]
+        return FsspecStore(fs=fs, path=path.rstrip('/'), read_only=True)
+
+    def close(self):
+        """Close the sessions of the shared filesystems."""
+        with self._lock:
+            filesystems = list(self._filesystems.values())
+            self._filesystems = {}
+        for fs in filesystems:
+            sync(_close_session(fs))
+
+
+async def _close_session(fs):
+    """Close the aiohttp session (http) or client (s3) of a filesystem."""
+    if getattr(fs, '_session', None) is not None:
+        await fs._session.close()
+    elif getattr(fs, '_s3', None) is not None:
+        await fs._s3.close()
+
+
+# process-wide pool: settings of the build and the pool opened by this
+# process (a forked worker opens its own)
+_settings = None
+_pool = None
+_pool_pid = None
+
+
+def enable_session_pool(storage_options=None, max_connections=DEFAULT_MAX_CONNECTIONS):
+    """Read the remote assets of the build through a shared session pool.
+
+    Returns:
+        SessionPool: pool of the calling process.
+    """
+    global _settings
+    disable_session_pool()
+    _settings = {'storage_options': storage_options, 'max_connections': max_connections}
+    return get_session_pool()
+
+
+def disable_session_pool():
+    """Stop pooling, the sessions of this process are closed."""
+    global _settings, _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
+    _settings = _pool = _pool_pid = None
+
+
+def get_session_pool():
+    """Session pool of this process, None when pooling is not enabled."""
+    global _pool, _pool_pid
+    if _settings is None:
+        return None
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = SessionPool(**_settings)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def pooled_store(url):
+    """Zarr store of a URL on the session pool, None when the URL is not pooled."""
+    pool = get_session_pool()
+    if pool is None or not pool.pools(url):
+        return None
+    return pool.zarr_store(url)
@@ -0,0 +1,179 @@
+"""Native zarr metadata reader used by create_catalog.py.
+
+Builds a DatasetHeader from the consolidated metadata of a zarr store
+(`.zmetadata` for zarr v2, the root `zarr.json` for zarr v3) without going
+through xarray.open_dataset. Only the consolidated metadata object is
+fetched up front; values are read with zarr on request, so only the chunks
+holding the requested elements are fetched. With a read cache (see
+read_cache.py), the metadata and chunks of remote stores are read through it.
+"""
+
+import re
+import json
+import asyncio
+
+import numpy as np
+from xarray.backends.zarr import FillValueCoder
+from zarr.core.array import Array, AsyncArray
+from zarr.storage import FsspecStore, LocalStore, StorePath, WrapperStore
+
+from dataset_header import DatasetHeader, VariableHeader
+from read_cache import asset_reader, get_read_cache, is_remote
+from session_pool import pooled_store
+
+
+# attribute used by xarray to store dimension names in zarr v2
+DIMENSION_KEY = '_ARRAY_DIMENSIONS'
+
+
+def _is_hidden_attr(attr):
+    """NCZarr attributes are hidden by xarray."""
+    return attr.lower().startswith('_nc')
+
+
+def read_consolidated_metadata(url, zarr_format=2):
+    """Fetch the consolidated metadata of a zarr store.
+
+    Args:
+        url (str): path or URL of the zarr store.
+        zarr_format (int): zarr version (2 or 3).
+
+    Returns:
+        (dict, dict): group attributes and array name -> array metadata dict
+            (zarr v2 metadata includes its attributes under 'attributes').
+
+    Raises:
+        KeyError: if the store has no consolidated metadata.
+    """
+    root = url.rstrip('/')
+    read = asset_reader(root)
+    if int(zarr_format) == 2:
+        metadata = json.loads(read(f'{root}/.zmetadata'))['metadata']
+        group_attrs = metadata.get('.zattrs', {})
+        arrays = {}
+        for key, array_meta in metadata.items():
+            match = re.fullmatch('([^/]+)/\\.zarray', key)
+            if match:
+                name = match.group(1)
+                arrays[name] = dict(array_meta, attributes=metadata.get(f'{name}/.zattrs', {}))
+    else:
+        metadata = json.loads(read(f'{root}/zarr.json'))
+        consolidated = metadata.get('consolidated_metadata')
+        if not consolidated:
+            raise KeyError(f'No consolidated metadata found in {root}/zarr.json')
+        group_attrs = metadata.get('attributes', {})
+        arrays = {
+            name: array_meta
+            for name, array_meta in consolidated['metadata'].items()
+            if array_meta.get('node_type') == 'array' and '/' not in name
+        }
+    return group_attrs, arrays
+
+
+class CachedStore(WrapperStore):
+    """Read-only zarr store reading whole objects through the read cache.
+
+    Args:
+        store (zarr.abc.store.Store): store of the URL.
+        url (str): URL of the zarr store, the asset of the cached reads.
+    """
+
+    def __init__(self, store, url):
+        super().__init__(store)
+        self.root = url.rstrip('/')
+        self.read = asset_reader(self.root)
+
+    async def get(self, key, prototype, byte_range=None):
+        if byte_range is not None:
+            # partial reads (sharded arrays) go to the store
+            return await self._store.get(key, prototype, byte_range)
+        try:
+            data = await asyncio.to_thread(self.read, f'{self.root}/{key}')
+        except FileNotFoundError:
+            return None
+        return prototype.buffer.from_bytes(data)
+
+
+def get_store(url):
+    """Get a read-only zarr store for a local path or fsspec URL."""
+    if '://' not in url:
+        return LocalStore(url, read_only=True)
+    # remote stores share the connections of the session pool when enabled
+    store = pooled_store(url)
+    if store is None:
+        store = FsspecStore.from_url(url, read_only=True)
+    if is_remote(url) and get_read_cache() is not None:
+        return CachedStore(store, url)
+    return store
+
+
+def get_variable_header(array, zarr_format=2):
+    """Dimensions and attributes of a zarr array as the xarray zarr backend exposes them.
+
+    Args:
+        array (zarr.Array): zarr array.
+        zarr_format (int): zarr version (2 or 3).
+
+    Returns:
+        VariableHeader: header of the array.
+    """
+    attrs = dict(array.attrs)
+    if int(zarr_format) == 2:
+        # dimension names stored as attribute, zarr fill_value is the missing value
+        dims = tuple(attrs.pop(DIMENSION_KEY))
+        attrs = {key: value for key, value in attrs.items() if not _is_hidden_attr(key)}
+        if array.fill_value is not None:
+            attrs['_FillValue'] = array.fill_value
+    else:
+        dims = tuple(array.metadata.dimension_names or ())
+        if '_FillValue' in attrs:
+            attrs['_FillValue'] = FillValueCoder.decode(attrs['_FillValue'], array.dtype)
+    return VariableHeader(dims, array.shape, np.dtype(array.dtype), attrs)
+
+
+def get_group_attrs(group_attrs):
+    """Global attributes of a zarr group as the xarray zarr backend exposes them."""
+    return {key: value for key, value in group_attrs.items() if not _is_hidden_attr(key)}
+
+
+def read_coordinate_selection(array, flat_indices):
+    """Read elements of a zarr array at flat indices.
+
+    Each chunk holding a requested element is fetched once.
+
+    Args:
+        array (zarr.Array): zarr array.
+        flat_indices (list(int)): indices into the flattened array.
+
+    Returns:
+        numpy.ndarray: raw values.
+    """
+    if array.ndim == 0:
+        return np.asarray([array[()]] * len(flat_indices))
+    selection = np.unravel_index(np.asarray(flat_indices, dtype=int), array.shape)
+    return array.get_coordinate_selection(selection)
+
+
+class ZarrHeader(DatasetHeader):
+    """DatasetHeader of a zarr store built from its consolidated metadata.
+
+    Args:
+        url (str): path or URL of the zarr store.
+        zarr_format (int): zarr version (2 or 3).
+    """
+
+    def __init__(self, url, zarr_format=2):
+        group_attrs, arrays_meta = read_consolidated_metadata(url, zarr_format)
+        store = get_store(url)
+
+        # same member ordering as zarr groups
+        self.arrays = {}
+        variables = {}
+        for name in sorted(arrays_meta):
+            array = Array(AsyncArray(metadata=arrays_meta[name], store_path=StorePath(store, name)))
+            self.arrays[name] = array
+            variables[name] = get_variable_header(array, zarr_format)
+        super().__init__(get_group_attrs(group_attrs), variables)
+
+    def read_values(self, name, flat_indices):
+        return read_coordinate_selection(self.arrays[name], flat_indices)
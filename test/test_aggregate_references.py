@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import json
+import tempfile
+import unittest
+import pandas as pd
+import xarray
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from catalog_writer import CatalogWriter, ParquetCatalogWriter
+import aggregate_references
+from aggregate_references import aggregate_catalog, make_remote_references, select_variable, load_references
+import create_catalog
+from test_file_parser import write_netcdf
+
+
+def open_reference(reference_file):
+    return xarray.open_dataset(
+        'reference://', engine='zarr',
+        backend_kwargs={'consolidated': False, 'storage_options': {'fo': reference_file}}
+    )
+
+
+class TestAggregateReferences(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.assets = []
+        # written out of time order
+        for year in [2002, 2000, 2001]:
+            self.assets.append(os.path.join(self.tmpdir.name, f'data_{year}.nc'))
+            write_netcdf(self.assets[-1], time_units=f'hours since {year}-01-01', calendar='standard')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_catalog(self, writer_class=CatalogWriter):
+        ext = 'parquet' if writer_class is ParquetCatalogWriter else 'csv'
+        rows = sum(create_catalog.parse_assets(self.assets, {'data_format': 'netcdf'}), [])
+        writer = writer_class(os.path.join(self.tmpdir.name, f'd1-posix.{ext}'))
+        writer.write_rows(rows)
+        writer.close()
+        json_file = os.path.join(self.tmpdir.name, 'd1-posix.json')
+        with open(json_file, 'w') as fh:
+            json.dump({
+                'id': 'd1-posix',
+                'attributes': [{'column_name': column, 'vocabulary': ''} for column in writer.columns],
+                'assets': {'column_name': 'path', 'format': 'netcdf'},
+                'aggregation_control': {'variable_column_name': 'variable', 'groupby_attrs': ['variable', 'short_name']},
+                'catalog_file': f'd1-posix.{ext}',
+            }, fh)
+        return json_file
+
+    def check_aggregated(self, df, reference_files):
+        self.assertEqual(len(reference_files), 2)
+        for variable in ['t2m', 'q']:
+            paths = df.loc[df['variable'] == variable, 'aggregated_path'].unique()
+            self.assertEqual(len(paths), 1)
+            ds = open_reference(paths[0])
+            self.assertEqual(list(ds.data_vars), [variable])
+            self.assertEqual(ds[variable].shape, (12, 3))
+            times = ds['time'].values
+            self.assertTrue((times[1:] > times[:-1]).all())
+            self.assertEqual(str(times[0])[:10], '2000-01-01')
+
+    def test_csv(self):
+        json_file = self.write_catalog()
+        catalog_file, reference_files = aggregate_catalog(json_file, workers=2)
+        df = pd.read_csv(catalog_file)
+        self.assertEqual(df.columns[-1], 'aggregated_path')
+        self.check_aggregated(df, reference_files)
+        with open(json_file) as fh:
+            self.assertEqual(json.load(fh)['attributes'][-1]['column_name'], 'aggregated_path')
+
+        # aggregating again replaces the column
+        aggregate_catalog(json_file)
+        self.assertEqual(list(pd.read_csv(catalog_file).columns), list(df.columns))
+
+    def test_parquet(self):
+        json_file = self.write_catalog(ParquetCatalogWriter)
+        catalog_file, reference_files = aggregate_catalog(json_file)
+        self.check_aggregated(pd.read_parquet(catalog_file), reference_files)
+
+    def test_select_and_remote(self):
+        references, names = select_variable(load_references(self.assets[0], 'netcdf'), 't2m')
+        self.assertEqual(names, ['lat', 't2m', 'time'])
+        self.assertFalse(any(key.startswith('q/') for key in references['refs']))
+
+        # chunks referenced by url, not inlined
+        aggregate_references.INLINE_THRESHOLD = 0
+        self.addCleanup(setattr, aggregate_references, 'INLINE_THRESHOLD', 100)
+        _, reference_files = aggregate_catalog(self.write_catalog())
+        config = {'test': {'posix': {'prefix': self.tmpdir.name}, 'https': {'prefix': 'https://data.org', 'basename_suffix': '-remote-https'}}}
+        make_remote_references(reference_files, catalog_data='test', protocol_config=config)
+        with open(reference_files[0].replace('.json', '-remote-https.json')) as fh:
+            text = fh.read()
+        self.assertNotIn(self.tmpdir.name, text)
+        self.assertIn('https://data.org/data_2000.nc', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import json
+import time
+import tempfile
+import unittest
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from build_metrics import BuildMetrics
+from parse_cache import ParseCache
+import create_catalog
+from test_file_parser import write_netcdf
+
+
+class TestBuildMetrics(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.kwargs = {'data_format': 'netcdf'}
+        self.assets = []
+        for i in range(3):
+            self.assets.append(os.path.join(self.tmpdir.name, f'data_{i}.nc'))
+            write_netcdf(self.assets[-1], time_units=f'hours since 200{i}-01-01', calendar='standard')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_nested_stages(self):
+        def slow_items():
+            for i in range(3):
+                time.sleep(0.05)
+                yield i
+
+        metrics = BuildMetrics('d1-posix')
+        with metrics.stage('assemble'):
+            for _ in metrics.timed('parse', slow_items()):
+                time.sleep(0.01)
+        # the parse time is not counted as assemble time
+        self.assertGreaterEqual(metrics.stages['parse'], 0.15)
+        self.assertGreaterEqual(metrics.stages['assemble'], 0.03)
+        self.assertLess(metrics.stages['assemble'], 0.1)
+
+    def test_assets(self):
+        expected = create_catalog.parse_assets(self.assets, self.kwargs)
+        cache = ParseCache(os.path.join(self.tmpdir.name, 'cache.sqlite'), parsing_kwargs=self.kwargs)
+        list(create_catalog.iter_parsed_assets(self.assets[:1], self.kwargs, cache=cache))
+
+        metrics = BuildMetrics('d1-posix', slowest=1)
+        entries = create_catalog.iter_parsed_assets(
+            self.assets, dict(self.kwargs, reader='native'), cache=cache, workers=2, metrics=metrics
+        )
+        self.assertEqual(list(entries), expected)
+        cache.close()
+        self.assertEqual(metrics.counts['cache'], 1)
+        self.assertEqual(metrics.counts['parsed'], 2)
+        self.assertEqual(metrics.rows, sum(len(items) for items in expected))
+        metrics.finish()
+
+        report_files = [os.path.join(self.tmpdir.name, name) for name in ['metrics.json', 'metrics.prom']]
+        metrics.write(report_files)
+        with open(report_files[0]) as fh:
+            report = json.load(fh)
+        files = [dict(zip(report['files']['columns'], row)) for row in report['files']['rows']]
+        self.assertEqual([record['source'] for record in files], ['cache', 'parsed', 'parsed'])
+        self.assertEqual(files[1]['reader'], 'native')
+        self.assertEqual(files[1]['variables'], 2)
+        self.assertGreater(files[1]['open_seconds'], 0)
+        self.assertEqual(len(report['slowest']), 1)
+        self.assertIn(report['slowest'][0]['path'], self.assets[1:])
+        with open(report_files[1]) as fh:
+            self.assertIn('gdex_catalog_build_assets{catalog="d1-posix",source="cache"} 1', fh.read())
+
+    def test_failure(self):
+        metrics = BuildMetrics('d1-posix')
+        self.assets[1] = os.path.join(self.tmpdir.name, 'missing.nc')
+        with self.assertRaises(FileNotFoundError):
+            list(create_catalog.iter_parsed_assets(self.assets, self.kwargs, metrics=metrics))
+        metrics.finish('failed')
+        report = metrics.to_dict()
+        self.assertEqual((report['assets']['parsed'], report['assets']['failed']), (1, 1))
+        self.assertEqual(report['failures'][0]['path'], self.assets[1])
+        self.assertTrue(report['failures'][0]['error'].startswith('FileNotFoundError'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from catalog_writer import CatalogWriter, ParquetCatalogWriter
+from catalog_index import build_index, CatalogIndex, csv_row_offsets, filter_frame
+
+
+def make_rows(nassets):
+    rows = []
+    for i in range(nassets):
+        start = np.datetime64('2000-01-01T00:00:00') + np.timedelta64(i, 'D')
+        for variable, long_name in [('t2m', 'temperature at 2 m'), ('q', 'specific "humidity",\nper mass'), ('u', '')]:
+            rows.append({
+                'path': f'/data/d1/file_{i:04d}.nc',
+                'variable': variable,
+                'short_name': variable,
+                'long_name': long_name,
+                'units': 'K' if variable == 't2m' else '',
+                'start_time': start,
+                'end_time': start + np.timedelta64(1, 'D'),
+            })
+    return rows
+
+
+class TestCatalogIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.rows = make_rows(1500)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_catalog(self, writer_class=CatalogWriter):
+        ext = 'parquet' if writer_class is ParquetCatalogWriter else 'csv'
+        catalog_file = os.path.join(self.tmpdir.name, f'd1-posix.{ext}')
+        writer = writer_class(catalog_file, batch_size=1000)
+        writer.write_rows(self.rows)
+        writer.close()
+        return catalog_file
+
+    def check_searches(self, catalog_file, df):
+        index = CatalogIndex(build_index(catalog_file))
+        for query in [{'variable': 't2m'}, {'long_name': 'temp*'}, {'long_name': 'humid'},
+                      {'variable': ['q', 'u'], 'path': '/data/d1/file_0007.nc'}, {'units': np.nan}]:
+            self.assertTrue(index.search(**query).astype(str).equals(filter_frame(df, query).astype(str)), query)
+
+        found = index.search(time_range=('2000-01-10', '2000-01-12'), variable='u')
+        self.assertEqual(list(found['path']), [f'/data/d1/file_{i:04d}.nc' for i in range(8, 12)])
+        self.assertEqual(len(index.search(time_range=('2004-01-01', None))), 3 * (1500 - 1460))
+
+    def test_csv(self):
+        catalog_file = self.write_catalog()
+        self.check_searches(catalog_file, pd.read_csv(catalog_file))
+        # only the row blocks of the matching rows are read
+        index = CatalogIndex(os.path.join(self.tmpdir.name, 'd1-posix.index'))
+        self.assertEqual(len(index.rows(variable='u', path='x')), 1500)
+        self.assertEqual(index.read_rows([0, 4499]).shape, (2, 7))
+
+    def test_parquet(self):
+        catalog_file = self.write_catalog(ParquetCatalogWriter)
+        self.check_searches(catalog_file, pd.read_parquet(catalog_file))
+
+    def test_numeric_times(self):
+        # undecoded times (the create_catalog default) are numbers
+        self.rows = [{'path': f'/data/d1/file_{i}.nc', 'variable': 't2m', 'start_time': start, 'end_time': start + 6}
+                     for i, start in enumerate([0, 6, 18, 120])]
+        self.rows.append({'path': '/data/d1/file_4.nc', 'variable': 't2m', 'start_time': 1.5, 'end_time': ''})
+        for writer_class in [CatalogWriter, ParquetCatalogWriter]:
+            index = CatalogIndex(build_index(self.write_catalog(writer_class)))
+            for time_range, expected in [((6, 18), [0, 1, 2]), ((100, None), [3]), ((None, 5), [0, 4]),
+                                         ((13, 17), []), ((12, 12.0), [1]), (('1.5', 2), [0, 4])]:
+                found = index.search(time_range=time_range)
+                self.assertEqual(list(found['path']), [f'/data/d1/file_{i}.nc' for i in expected], time_range)
+
+    def test_row_offsets(self):
+        catalog_file = self.write_catalog()
+        with open(catalog_file, 'rb') as fh:
+            text = fh.read()
+            fh.seek(0)
+            header, nrows, offsets = csv_row_offsets(fh, block_rows=2, block_size=7)
+        self.assertEqual(nrows, len(self.rows))
+        self.assertEqual(header, text[:text.index(b'\n') + 1])
+        self.assertEqual(len(offsets), nrows // 2 + 1)
+        self.assertTrue(text[offsets[1]:].startswith(b'/data/d1/file_0000.nc,u,'))
+        self.assertEqual(offsets[-1], len(text))
+
+if __name__ == '__main__':
+    unittest.main()
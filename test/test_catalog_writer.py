@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from catalog_writer import CatalogWriter, ParquetCatalogWriter, format_cell
+import create_catalog
+
+
+def make_rows(nrows):
+    return [
+        {
+            'path': f'/data/file_{i}.nc',
+            'variable': 't2m',
+            'long_name': 'air, "2m"\ntemperature',
+            'start_time': np.datetime64('2000-01-01T06:00:00') + np.timedelta64(i, 'D'),
+            'frequency': np.timedelta64(6, 'h'),
+            'level': 1000.,
+            'count': i,
+        }
+        for i in range(nrows)
+    ]
+
+
+class TestCatalogWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.csv_file = os.path.join(self.tmpdir.name, 'catalog.csv')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_same_csv_as_pandas(self):
+        rows = make_rows(7)
+        writer = CatalogWriter(self.csv_file, batch_size=3)
+        writer.write_rows(rows)
+        writer.close()
+        with open(self.csv_file) as fh:
+            self.assertEqual(fh.read(), pd.DataFrame.from_records(rows).to_csv(index=False))
+        self.assertEqual(os.listdir(self.tmpdir.name), ['catalog.csv'])
+
+    def test_same_csv_as_pandas_column_formats(self):
+        # pandas formats a column from all its values, which span several batches here
+        rows = [
+            {
+                'path': f'/data/Amon/file_{i}.nc',
+                # monthly data, every time is midnight
+                'start_time': np.datetime64('2000-01-01') + np.timedelta64(31 * i, 'D'),
+                'end_time': np.datetime64('2000-12-01T00:00') if i < 4 else np.datetime64('NaT'),
+                'frequency': np.timedelta64(1, 'D'),
+                'sub_daily': np.timedelta64(1, 'D') if i else np.timedelta64(6, 'h'),
+                'precise': np.datetime64('2000-01-01T06:00') + np.timedelta64(500 * i, 'ms'),
+                'level': [1, 2.5, 3, None, 5][i % 5],
+                'count': i,
+                'start_or_empty': np.datetime64('2000-01-01T00:00') if i else '',
+            }
+            for i in range(7)
+        ]
+        writer = CatalogWriter(self.csv_file, batch_size=2)
+        writer.write_rows(rows)
+        writer.close()
+        with open(self.csv_file) as fh:
+            text = fh.read()
+        self.assertEqual(text, pd.DataFrame.from_records(rows).to_csv(index=False))
+        self.assertIn('/data/Amon/file_1.nc,2000-02-01,2000-12-01,1 days,1 days 00:00:00,2000-01-01 06:00:00.500,2.5,1,2000-01-01T00:00\n', text)
+
+    def test_same_csv_as_pandas_columns_added_in_later_batch(self):
+        rows = [
+            {'path': 'a', 'variable': 't'},
+            {'path': 'b', 'variable': 'q', 'valid_max': 5},
+            {'path': 'c', 'variable': 'q', 'valid_max': 6, 'units': None},
+            {'path': 'd', 'variable': 'q', 'valid_max': 7, 'units': 'K'},
+            {'path': 'e', 'variable': 'q', 'valid_min': 1},
+        ]
+        for batch_size in [1, 2, 5]:
+            writer = CatalogWriter(self.csv_file, batch_size=batch_size)
+            writer.write_rows(rows)
+            writer.close()
+            with open(self.csv_file) as fh:
+                text = fh.read()
+            self.assertEqual(text, pd.DataFrame.from_records(rows).to_csv(index=False))
+            self.assertIn('b,q,5.0,,\n', text)
+
+    def test_columns_added_in_later_batch(self):
+        rows = make_rows(5)
+        rows[3]['standard_name'] = 'air_temperature'
+        writer = CatalogWriter(self.csv_file, batch_size=2)
+        writer.write_rows(rows)
+        self.assertEqual(writer.close()[-1], 'standard_name')
+        df = pd.read_csv(self.csv_file, keep_default_na=False)
+        expected = pd.DataFrame.from_records(rows)
+        self.assertEqual(list(df.columns), list(expected.columns))
+        self.assertEqual(list(df['standard_name']), ['', '', '', 'air_temperature', ''])
+        self.assertEqual(list(df['long_name']), list(expected['long_name']))
+
+    def test_format_cell(self):
+        self.assertEqual(format_cell(None), '')
+        self.assertEqual(format_cell(float('nan')), '')
+        self.assertEqual(format_cell(np.datetime64('NaT')), '')
+        self.assertEqual(format_cell(np.datetime64('2000-01-01')), '2000-01-01 00:00:00')
+        self.assertEqual(format_cell(np.timedelta64(1, 'D')), '1 days 00:00:00')
+        self.assertEqual(format_cell(6.0), '6.0')
+
+    def test_discard(self):
+        writer = CatalogWriter(self.csv_file, batch_size=2)
+        writer.write_rows(make_rows(3))
+        writer.discard()
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+    def test_parquet_types(self):
+        rows = make_rows(5)
+        rows[0]['start_time'] = ''
+        parquet_file = os.path.join(self.tmpdir.name, 'catalog.parquet')
+        writer = ParquetCatalogWriter(parquet_file, batch_size=2)
+        writer.write_rows(rows)
+        writer.close()
+        table = pq.read_table(parquet_file)
+        self.assertEqual(table.schema.field('start_time').type, pa.timestamp('ns'))
+        self.assertEqual(table.schema.field('frequency').type, pa.duration('ns'))
+        self.assertEqual(table.schema.field('count').type, pa.int64())
+        self.assertEqual(table.column('start_time').to_pylist()[:2], [None, pd.Timestamp('2000-01-02T06:00')])
+        self.assertEqual(table.column('long_name').to_pylist(), [row['long_name'] for row in rows])
+        self.assertEqual(pq.ParquetFile(parquet_file).num_row_groups, 3)
+
+    def test_parquet_partition_by_variable(self):
+        rows = make_rows(5)
+        for i, row in enumerate(rows):
+            row['variable'] = ['t2m', 'q'][i % 2]
+        parquet_file = os.path.join(self.tmpdir.name, 'catalog.parquet')
+        writer = ParquetCatalogWriter(parquet_file, batch_size=2, partition_by='variable')
+        writer.write_rows(rows)
+        writer.close()
+        metadata = pq.ParquetFile(parquet_file).metadata
+        index = metadata.schema.to_arrow_schema().get_field_index('variable')
+        stats = [metadata.row_group(i).column(index).statistics for i in range(metadata.num_row_groups)]
+        self.assertEqual([(stat.min, stat.max) for stat in stats],
+                         [('q', 'q'), ('t2m', 't2m'), ('t2m', 't2m')])
+        self.assertEqual(os.listdir(self.tmpdir.name), ['catalog.parquet'])
+
+    def test_make_remote_parquet(self):
+        rows = [{'path': f'/glade/campaign/collections/gdex/data/d1/file_{i}.json', 'variable': 't2m'}
+                for i in range(3)]
+        parquet_file = os.path.join(self.tmpdir.name, 'd1-posix.parquet')
+        writer = ParquetCatalogWriter(parquet_file)
+        writer.write_rows(rows)
+        writer.close()
+        with open(os.path.join(self.tmpdir.name, 'd1-posix.json'), 'w') as fh:
+            fh.write('{"catalog_file": "d1-posix.parquet"}')
+        create_catalog.make_remote_catalog(parquet_file, catalog_data='reference', output_format='parquet')
+        table = pq.read_table(os.path.join(self.tmpdir.name, 'd1-https.parquet'))
+        self.assertEqual(table.column('path')[0].as_py(), 'https://data.gdex.ucar.edu/d1/file_0-remote-https.json')
+        with open(os.path.join(self.tmpdir.name, 'd1-osdf.json')) as fh:
+            self.assertIn('d1-osdf.parquet', fh.read())
+
+    def test_make_remote_csv_quoted_fields(self):
+        rows = [{'path': f'/glade/campaign/collections/gdex/data/d1/a,b_{i}.json', 'variable': 't2m',
+                 'long_name': '/glade/campaign/collections/gdex/data/, "x"'} for i in range(3)]
+        csv_file = os.path.join(self.tmpdir.name, 'd1-posix.csv')
+        writer = CatalogWriter(csv_file)
+        writer.write_rows(rows)
+        writer.close()
+        with open(os.path.join(self.tmpdir.name, 'd1-posix.json'), 'w') as fh:
+            fh.write('{"catalog_file": "d1-posix.csv"}')
+        create_catalog.make_remote_catalog(csv_file, catalog_data='reference', output_format='csv_and_json')
+        df = pd.read_csv(os.path.join(self.tmpdir.name, 'd1-osdf.csv'))
+        self.assertEqual(df['path'][2], 'https://data.gdex.ucar.edu/d1/a,b_2-remote-osdf.json')
+        self.assertEqual(df['long_name'][2], rows[2]['long_name'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import json
+import tempfile
+import unittest
+import subprocess
+import contextlib
+import io
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+import cli
+from catalog_writer import CatalogWriter, ParquetCatalogWriter
+from inspect_catalog import inspect_catalog
+
+# modules the light subcommands must not import
+HEAVY_MODULES = ['xarray', 'pandas', 'ecgtools', 'zarr', 'netCDF4', 'dask', 'kerchunk']
+
+# seconds of imports allowed to the light subcommands (build takes 1-2 s)
+IMPORT_BUDGET = 1.0
+
+# imports of a subcommand in a fresh interpreter, the heavy modules loaded are printed
+IMPORT_SCRIPT = '''
+import sys
+sys.path.insert(0, {generator!r})
+import cli
+cli.load_subcommand({subcommand!r})
+print(','.join(name for name in {heavy!r} if name in sys.modules))
+'''
+
+
+def import_time(subcommand):
+    """Import time (seconds, from -X importtime) and heavy modules of a subcommand."""
+    script = IMPORT_SCRIPT.format(
+        generator=os.path.join(os.path.abspath('..'), 'generator'), subcommand=subcommand, heavy=HEAVY_MODULES
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script], capture_output=True, text=True, check=True
+    )
+    # lines of -X importtime: "import time: self [us] | cumulative | imported package"
+    microseconds = 0
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and not line.rstrip().endswith('imported package'):
+            microseconds += int(line.split(':', 1)[1].split('|')[0])
+    heavy = [name for name in result.stdout.strip().split(',') if name]
+    return microseconds / 1e6, heavy
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.rows = [
+            {'path': f'/glade/campaign/collections/gdex/data/d1/file_{i}.json', 'variable': variable,
+             'start_time': f'200{i}-01-01 00:00:00', 'end_time': f'200{i}-12-31 18:00:00'}
+            for i in range(3) for variable in ['t2m', 'q']
+        ]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _catalog(self, ext, writer_class):
+        catalog_file = os.path.join(self.tmpdir.name, f'd1-posix.{ext}')
+        writer = writer_class(catalog_file)
+        writer.write_rows(self.rows)
+        writer.close()
+        json_file = os.path.join(self.tmpdir.name, 'd1-posix.json')
+        with open(json_file, 'w') as fh:
+            json.dump({'id': 'd1-posix', 'description': 'test', 'catalog_file': f'd1-posix.{ext}'}, fh)
+        return json_file
+
+    def test_import_budget(self):
+        for subcommand in ['remote', 'modify', 'inspect']:
+            seconds, heavy = import_time(subcommand)
+            self.assertEqual(heavy, [], subcommand)
+            self.assertLess(seconds, IMPORT_BUDGET, subcommand)
+        # build does load the heavy modules
+        self.assertIn('xarray', import_time('build')[1])
+
+    def test_remote(self):
+        json_file = self._catalog('csv', CatalogWriter)
+        with contextlib.redirect_stdout(io.StringIO()):
+            cli.main(['remote', json_file, '--catalog_data', 'reference', '--protocols', 'https'])
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)),
+                         ['d1-https.csv', 'd1-https.json', 'd1-posix.csv', 'd1-posix.json'])
+        summary = inspect_catalog(os.path.join(self.tmpdir.name, 'd1-https.json'))
+        self.assertEqual(summary['catalog_file'], os.path.join(self.tmpdir.name, 'd1-https.csv'))
+        self.assertEqual(summary['distinct'], {'path': 3, 'variable': 2})
+
+    def test_inspect(self):
+        for ext, writer_class in [('csv', CatalogWriter), ('parquet', ParquetCatalogWriter)]:
+            json_file = self._catalog(ext, writer_class)
+            summary = inspect_catalog(json_file, columns=['variable', 'units'])
+            self.assertEqual(summary['id'], 'd1-posix')
+            self.assertEqual(summary['rows'], 6)
+            self.assertEqual(summary['columns'], ['path', 'variable', 'start_time', 'end_time'])
+            self.assertEqual(summary['distinct'], {'variable': 2})
+            self.assertEqual(summary['time_range'], ('2000-01-01 00:00:00', '2002-12-31 18:00:00'))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            cli.main(['inspect', json_file])
+        self.assertIn('  rows: 6\n  columns: path, variable, start_time, end_time\n  distinct path: 3', output.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import tempfile
+import unittest
+import ecgtools
+import fsspec
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from crawler import Crawler, crawl_assets
+
+# files of the test tree, excluded subtree and zarr stores at several levels
+TREE = [
+    'a.nc', 'b.json', 'sub/c.nc', 'sub/deep/d.nc', 'sub/deep/deeper/e.nc',
+    'x-remote-1/f.nc', 'x-remote-1/g/h.nc',
+    's.zarr/.zmetadata', 's.zarr/t/0', 'sub/z2.zarr/.zmetadata', 'sub/deep/z3.zarr/.zmetadata',
+]
+
+
+class TestCrawler(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        for name in TREE:
+            path = os.path.join(self.tmpdir.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'w').close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_matches_ecgtools(self):
+        for depth in [0, 1, 3]:
+            for include, exclude in [(['*.nc'], None), (['*.nc', '*.json'], ['*-remote-*'])]:
+                builder = ecgtools.Builder(
+                    paths=[self.tmpdir.name], depth=depth, include_patterns=include, exclude_patterns=exclude
+                ).get_assets()
+                assets = crawl_assets([self.tmpdir.name], depth, include, exclude, workers=4)
+                self.assertEqual(assets, builder.assets)
+
+    def test_pruning(self):
+        crawler = Crawler([self.tmpdir.name], depth=5, exclude=['*-remote-*'])
+        assets = crawler.crawl()
+        # excluded directories and the content of zarr stores are not walked
+        self.assertFalse(any('remote' in asset or '/t/' in asset for asset in assets))
+        self.assertIn(os.path.join(self.tmpdir.name, 'sub/deep/z3.zarr'), assets)
+        self.assertEqual(crawler.listed, 7)
+        self.assertEqual(sorted(crawler.iter_assets()), assets)
+
+    def test_remote(self):
+        fs = fsspec.filesystem('memory')
+        for name in TREE:
+            fs.pipe(f'/crawler/{name}', b'')
+        self.addCleanup(fs.rm, '/crawler', recursive=True)
+        builder = ecgtools.Builder(
+            paths=['memory://crawler'], depth=2, include_patterns=['*.nc'], exclude_patterns=['*-remote-*']
+        ).get_assets()
+        assets = crawl_assets(['memory://crawler'], 2, ['*.nc'], ['*-remote-*'])
+        self.assertEqual(assets, builder.assets)
+        self.assertIn('memory:///crawler/sub/z2.zarr', assets)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import time
+import random
+import tempfile
+import unittest
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from executor import map_ordered, chunked
+import create_catalog
+from test_file_parser import write_netcdf
+
+
+def slow_square(value, delay=0.):
+    time.sleep(random.random() * delay)
+    return value * value
+
+
+class TestExecutor(unittest.TestCase):
+    def test_chunked(self):
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_results_in_order(self):
+        expected = [i * i for i in range(50)]
+        for executor in ['thread', 'process']:
+            for workers in [1, 4]:
+                results = list(map_ordered(slow_square, range(50), kwargs={'delay': 0.002},
+                                           executor=executor, workers=workers, chunksize=3))
+                self.assertEqual(results, expected)
+
+    def test_unsupported_executor(self):
+        with self.assertRaises(ValueError):
+            list(map_ordered(slow_square, range(3), executor='mpi', workers=2))
+
+    def test_parse_assets_independent_of_workers(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            assets = []
+            for i in range(6):
+                assets.append(os.path.join(tmpdir, f'data_{i}.nc'))
+                write_netcdf(assets[-1], time_units=f'hours since 200{i}-01-01', calendar='standard')
+            kwargs = {'data_format': 'netcdf'}
+            serial = create_catalog.parse_assets(assets, kwargs)
+            parallel = create_catalog.parse_assets(assets, kwargs, executor='process', workers=3)
+            self.assertEqual(parallel, serial)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import json
+import tempfile
+import threading
+import unittest
+import numpy as np
+import xarray
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+import create_catalog
+
+
+def write_netcdf(file_path, time_units='hours since 2000-01-01', calendar='noleap', ntime=4, time_chunks=None):
+    """Write a small netCDF file with a time axis and two variables."""
+    ds = xarray.Dataset(
+        {
+            't2m': (('time', 'lat'), np.zeros((ntime, 3)), {'units': 'K', 'long_name': 'temperature'}),
+            'q': (('time', 'lat'), np.zeros((ntime, 3)), {'units': 'kg kg-1'}),
+        },
+        coords={
+            'time': ('time', np.arange(ntime) * 6, {'units': time_units, 'calendar': calendar}),
+            'lat': ('lat', [1., 2., 3.], {'units': 'degrees_north'}),
+        },
+    )
+    encoding = {'time': {'chunksizes': (time_chunks,)}} if time_chunks else None
+    ds.to_netcdf(file_path, encoding=encoding)
+
+# time decoding options of file_parser: undecoded, numpy datetime64, cftime
+TIME_DECODINGS = [{}, {'decode_times': True}, {'use_cftime': True}]
+
+
+class TestFileParser(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        create_catalog.DECODE_POLICY_CACHE.clear()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_cftime_decoding(self):
+        file_path = os.path.join(self.tmpdir.name, 'data_2000.nc')
+        write_netcdf(file_path)
+        items = create_catalog.file_parser(file_path, use_cftime=True)
+        self.assertEqual([item['variable'] for item in items], ['t2m', 'q'])
+        self.assertEqual(str(items[0]['start_time']), '2000-01-01 00:00:00')
+        self.assertEqual(str(items[0]['end_time']), '2000-01-01 18:00:00')
+        family = create_catalog.get_file_family(file_path)
+        self.assertEqual(create_catalog.DECODE_POLICY_CACHE[family], 'cftime')
+
+    def test_cftime_fallback_is_remembered(self):
+        # months are not decodable with a noleap calendar
+        first = os.path.join(self.tmpdir.name, 'data_2000.nc')
+        second = os.path.join(self.tmpdir.name, 'data_2001.nc')
+        write_netcdf(first, time_units='months since 2000-01-01')
+        write_netcdf(second, time_units='months since 2001-01-01')
+        items = create_catalog.file_parser(first, use_cftime=True)
+        self.assertEqual(items[0]['start_time'], 0)
+        self.assertEqual(items[0]['frequency'], 6)
+        family = create_catalog.get_file_family(second)
+        self.assertEqual(create_catalog.DECODE_POLICY_CACHE[family], 'off')
+        items = create_catalog.file_parser(second, use_cftime=True)
+        self.assertEqual(items[0]['end_time'], 18)
+
+    def test_no_time_decoding_by_default(self):
+        file_path = os.path.join(self.tmpdir.name, 'data.nc')
+        write_netcdf(file_path, calendar='standard')
+        for reader in ['xarray', 'native']:
+            items = create_catalog.file_parser(file_path, reader=reader)
+            self.assertEqual(items[0]['start_time'], 0)
+            self.assertEqual(items[0]['end_time'], 18)
+            self.assertEqual(items[0]['frequency'], 6)
+
+    def test_numpy_decoding(self):
+        file_path = os.path.join(self.tmpdir.name, 'data.nc')
+        write_netcdf(file_path, calendar='standard')
+        for reader in ['xarray', 'native']:
+            items = create_catalog.file_parser(file_path, decode_times=True, reader=reader)
+            self.assertEqual(items[0]['start_time'], np.datetime64('2000-01-01T00:00'))
+            self.assertEqual(items[0]['frequency'], np.timedelta64(6, 'h'))
+            # cftime takes precedence
+            items = create_catalog.file_parser(file_path, use_cftime=True, decode_times=True, reader=reader)
+            self.assertEqual(str(items[0]['start_time']), '2000-01-01 00:00:00')
+
+    def test_coord_summary_shared_by_variables(self):
+        ds = xarray.Dataset(
+            {'t': (('time', 'lev'), np.zeros((5, 2))), 'ps': (('time',), np.zeros(5))},
+            coords={
+                'time': ('time', np.arange(5) * 3.),
+                'lev': ('lev', [1000., 500.], {'vertical_orientation': 'down',
+                                               'standard_name': 'air_pressure', 'units': 'hPa'}),
+            },
+        )
+        coord_summary = create_catalog.get_coord_summary(ds)
+        self.assertEqual(coord_summary['time'], {'start_time': 0., 'end_time': 12., 'frequency': 3.})
+        self.assertEqual(coord_summary['lev'], {'level': 'air_pressure', 'level_units': 'hPa'})
+        var_attrs = create_catalog.get_var_attrs(ds['ps'], coord_summary)
+        self.assertEqual(var_attrs['level'], '')
+        self.assertEqual(var_attrs, create_catalog.get_var_attrs(ds['ps']))
+        self.assertEqual(create_catalog.get_var_attrs(ds['t'], coord_summary)['level_units'], 'hPa')
+
+    def test_native_zarr_reader_matches_xarray(self):
+        ds = xarray.open_dataset(self._netcdf('data.nc'))
+        ds['lev'] = ('lev', [1000.], {'vertical_orientation': 'down', 'standard_name': 'air_pressure'})
+        ds['ta'] = (('time', 'lev', 'lat'), np.zeros((4, 1, 3)), {'long_name': 'air temperature'})
+        store = os.path.join(self.tmpdir.name, 'data.zarr')
+        ds.to_zarr(store, zarr_format=2, consolidated=True, encoding={'time': {'chunks': (3,)}})
+        for decoding in TIME_DECODINGS:
+            kwargs = {'data_format': 'zarr', 'zarr_format': 2, **decoding,
+                      'var_metadata': ['long_name'], 'global_metadata': ['title']}
+            expected = create_catalog.file_parser(store, **kwargs)
+            items = create_catalog.file_parser(store, reader='native', **kwargs)
+            self.assertEqual(items, expected)
+            self.assertEqual(items[-1]['level'], 'air_pressure')
+
+    def test_native_reference_reader_matches_xarray(self):
+        from kerchunk.hdf import SingleHdf5ToZarr
+        file_path = self._netcdf('data.nc')
+        refs = os.path.join(self.tmpdir.name, 'data.json')
+        with open(refs, 'w') as fh:
+            json.dump(SingleHdf5ToZarr(file_path, inline_threshold=0).translate(), fh)
+        for decoding in TIME_DECODINGS:
+            kwargs = {'data_format': 'reference', **decoding, 'var_metadata': ['long_name']}
+            expected = create_catalog.file_parser(refs, **kwargs)
+            items = create_catalog.file_parser(refs, reader='native', **kwargs)
+            self.assertEqual(items, expected)
+
+    def test_native_parquet_reference_reader_matches_xarray(self):
+        from kerchunk.hdf import SingleHdf5ToZarr
+        from kerchunk.df import refs_to_dataframe
+        # one time value per chunk, the first, second and last time chunks
+        # are in different partitions of 3 references
+        file_path = os.path.join(self.tmpdir.name, 'data.nc')
+        write_netcdf(file_path, calendar='standard', ntime=8, time_chunks=1)
+        refs = os.path.join(self.tmpdir.name, 'data.parq')
+        refs_to_dataframe(SingleHdf5ToZarr(file_path, inline_threshold=0).translate(), refs, record_size=3)
+        self.assertEqual(sorted(os.listdir(os.path.join(refs, 'time'))),
+                         ['refs.0.parq', 'refs.1.parq', 'refs.2.parq'])
+        for decoding in TIME_DECODINGS:
+            kwargs = {'data_format': 'reference', **decoding, 'var_metadata': ['long_name']}
+            expected = create_catalog.file_parser(refs, **kwargs)
+            timings = {}
+            items = create_catalog.file_parser(refs, reader='native', timings=timings, **kwargs)
+            self.assertEqual(timings['reader'], 'native')
+            self.assertEqual(items, expected)
+
+    def test_native_netcdf_reader_matches_xarray(self):
+        file_path = os.path.join(self.tmpdir.name, 'data_2000.nc')
+        write_netcdf(file_path)
+        for decoding in TIME_DECODINGS:
+            kwargs = {**decoding, 'var_metadata': ['long_name']}
+            create_catalog.DECODE_POLICY_CACHE.clear()
+            expected = create_catalog.file_parser(file_path, **kwargs)
+            create_catalog.DECODE_POLICY_CACHE.clear()
+            items = create_catalog.file_parser(file_path, reader='native', **kwargs)
+            self.assertEqual(items, expected)
+
+    def test_native_netcdf_reader_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        paths = [self._netcdf(f'data_{i}.nc') for i in range(8)]
+        kwargs = {'reader': 'native', 'var_metadata': ['long_name']}
+        expected = [create_catalog.file_parser(path, **kwargs) for path in paths]
+        # netCDF-C is not thread safe, the reader serializes its calls
+        with ThreadPoolExecutor(8) as executor:
+            for _ in range(5):
+                items = list(executor.map(lambda path: create_catalog.file_parser(path, **kwargs), paths))
+                self.assertEqual(items, expected)
+        # the lock is the one of the xarray netCDF4 backend
+        from xarray.backends.netCDF4_ import NETCDF4_PYTHON_LOCK
+        from netcdf_reader import NetCDFHeader
+        opened = threading.Event()
+        reader = threading.Thread(target=lambda: (NetCDFHeader(paths[0]).close(), opened.set()))
+        with NETCDF4_PYTHON_LOCK:
+            reader.start()
+            self.assertFalse(opened.wait(0.2))
+        reader.join()
+        self.assertTrue(opened.is_set())
+
+    def _netcdf(self, name):
+        file_path = os.path.join(self.tmpdir.name, name)
+        write_netcdf(file_path, calendar='standard')
+        return file_path
+
+if __name__ == '__main__':
+    unittest.main()
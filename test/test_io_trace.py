@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import json
+import tempfile
+import threading
+import unittest
+import fsspec
+from fsspec.spec import AbstractFileSystem
+from fsspec.implementations.local import LocalFileSystem
+from kerchunk.hdf import SingleHdf5ToZarr
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from io_trace import IOTracer, trace_asset, enable_tracing, disable_tracing
+from build_metrics import BuildMetrics
+import create_catalog
+from test_file_parser import write_netcdf
+
+
+class TestIOTrace(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.assets = []
+        for i in range(2):
+            netcdf_file = os.path.join(self.tmpdir.name, f'data_{i}.nc')
+            write_netcdf(netcdf_file, time_units=f'hours since 200{i}-01-01', calendar='standard')
+            # chunks are read from the netCDF file through the reference
+            self.assets.append(os.path.join(self.tmpdir.name, f'data_{i}.json'))
+            with open(self.assets[-1], 'w') as fh:
+                json.dump(SingleHdf5ToZarr(netcdf_file, inline_threshold=0).translate(), fh)
+        self.tracer = IOTracer()
+        enable_tracing(self.tracer)
+        self.addCleanup(disable_tracing)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_assets_and_stages(self):
+        self.tracer.stage = 'crawl'
+        fsspec.filesystem('file').ls(self.tmpdir.name, detail=True)
+        with trace_asset(self.assets[0]) as stats:
+            create_catalog.file_parser(self.assets[0], data_format='reference', reader='native')
+        self.assertGreater(stats['requests'], 1)
+        self.assertGreater(stats['range_reads'], 0)
+        self.assertGreater(stats['bytes'], os.path.getsize(self.assets[0]))
+        # the entries listed by ls are not counted as requests
+        self.assertEqual(self.tracer.stages['crawl']['requests'], 1)
+
+        # a call made by another thread is attributed to the asset of its path
+        with trace_asset(self.assets[1]) as stats:
+            thread = threading.Thread(target=fsspec.filesystem('file').cat_file, args=(self.assets[1], 0, 10))
+            thread.start()
+            thread.join()
+        self.assertEqual((stats['requests'], stats['bytes'], stats['range_reads']), (1, 10, 1))
+        self.assertEqual(self.tracer.total()['requests'], 1)
+
+    def test_build_metrics(self):
+        metrics = BuildMetrics('d1-posix', io_tracer=self.tracer)
+        entries = create_catalog.iter_parsed_assets(
+            self.assets, {'data_format': 'reference', 'reader': 'native'}, workers=2, metrics=metrics
+        )
+        with metrics.stage('assemble'):
+            list(metrics.timed('parse', entries))
+        report = metrics.to_dict()
+        files = [dict(zip(report['files']['columns'], row)) for row in report['files']['rows']]
+        self.assertTrue(all(record['requests'] > 1 for record in files))
+        self.assertEqual(report['io']['stages']['parse']['bytes'], sum(record['bytes'] for record in files))
+        self.assertEqual(len(report['most_bytes']), 2)
+        self.assertIn('io: ', metrics.report())
+
+    def test_disable(self):
+        disable_tracing()
+        self.assertIs(LocalFileSystem.cat_file, AbstractFileSystem.cat_file)
+        self.assertEqual(fsspec.asyn.sync.__module__, 'fsspec.asyn')
+        with trace_asset(self.assets[0]) as stats:
+            fsspec.filesystem('file').cat_file(self.assets[0])
+        self.assertEqual(stats['requests'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
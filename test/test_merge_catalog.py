@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import json
+import argparse
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from catalog_writer import CatalogWriter, ParquetCatalogWriter
+from merge_catalog import find_shards, merge_catalogs, compact_catalogs
+import create_catalog
+
+
+def make_rows(nassets):
+    rows = []
+    for i in range(nassets):
+        for variable in ['t2m', 'q']:
+            rows.append({
+                'path': f'/data/d1/file_{i:03d}.nc',
+                'variable': variable,
+                'long_name': f'{variable}, "level" {i}',
+                'start_time': np.datetime64('2000-01-01T00:00:00') + np.timedelta64(i, 'D'),
+                'count': i,
+            })
+    return rows
+
+
+class TestMergeCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.rows = make_rows(20)
+        self.assets = sorted({row['path'] for row in self.rows})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_catalog(self, name, rows, writer_class=CatalogWriter, **kwargs):
+        ext = 'parquet' if writer_class is ParquetCatalogWriter else 'csv'
+        writer = writer_class(os.path.join(self.tmpdir.name, f'{name}.{ext}'), **kwargs)
+        writer.write_rows(rows)
+        writer.close()
+        with open(os.path.join(self.tmpdir.name, f'{name}.json'), 'w') as fh:
+            json.dump({'id': name, 'attributes': [], 'catalog_file': f'{name}.{ext}'}, fh)
+
+    def write_shards(self, nshards, writer_class=CatalogWriter, **kwargs):
+        for index in range(nshards):
+            assets = set(create_catalog.shard_assets(self.assets, index, nshards))
+            rows = [row for row in self.rows if row['path'] in assets]
+            name = create_catalog.shard_catalog_name('d1-posix', index, nshards)
+            self.write_catalog(name, rows, writer_class, **kwargs)
+
+    def test_shard_assets(self):
+        shards = [create_catalog.shard_assets(self.assets, index, 3) for index in range(3)]
+        self.assertEqual(sorted(sum(shards, [])), self.assets)
+        self.assertEqual(create_catalog.parse_shard('2/3'), (2, 3))
+        with self.assertRaises(argparse.ArgumentTypeError):
+            create_catalog.parse_shard('3/3')
+
+    def test_merge_csv_same_as_unsharded(self):
+        self.write_shards(3)
+        name, json_files = find_shards([self.tmpdir.name])
+        out = os.path.join(self.tmpdir.name, 'merged')
+        merge_catalogs(json_files, out, name, batch_size=7)
+        self.write_catalog('d1-posix', self.rows)
+        with open(os.path.join(self.tmpdir.name, 'd1-posix.csv')) as fh:
+            expected = fh.read()
+        with open(os.path.join(out, 'd1-posix.csv')) as fh:
+            self.assertEqual(fh.read(), expected)
+        with open(os.path.join(out, 'd1-posix.json')) as fh:
+            data = json.load(fh)
+        self.assertEqual(data['catalog_file'], 'd1-posix.csv')
+        self.assertEqual([attr['column_name'] for attr in data['attributes']][:2], ['path', 'variable'])
+
+    def test_missing_shard(self):
+        self.write_shards(3)
+        os.remove(os.path.join(self.tmpdir.name, 'd1-posix.shard-1-of-3.json'))
+        with self.assertRaises(ValueError):
+            find_shards([self.tmpdir.name])
+
+    def test_merge_parquet_partitioned(self):
+        # count is a float in some shards, level only exists in one shard
+        self.rows[0]['count'] = 0.5
+        self.rows[5]['level'] = 850.
+        self.write_shards(4, ParquetCatalogWriter, batch_size=4, partition_by='variable')
+        name, json_files = find_shards([self.tmpdir.name], catalog_name='d1-posix')
+        merge_catalogs(json_files, self.tmpdir.name, name, partition_by='variable', batch_size=4)
+        parquet_file = pq.ParquetFile(os.path.join(self.tmpdir.name, 'd1-posix.parquet'))
+        table = parquet_file.read()
+        self.assertEqual(table.schema.field('count').type, pa.float64())
+        self.assertEqual(table.schema.field('level').type, pa.float64())
+        self.assertEqual(table.num_rows, len(self.rows))
+        self.assertEqual(table.column('variable').to_pylist(), ['q'] * 20 + ['t2m'] * 20)
+        self.assertEqual(table.column('path').to_pylist()[:2], ['/data/d1/file_000.nc', '/data/d1/file_001.nc'])
+        self.assertEqual(parquet_file.metadata.num_row_groups, 10)
+
+    def test_compact(self):
+        # two runs of the same dataset, the second one re-parsed some files
+        # and pulled an extra column
+        old = self.rows[:30]
+        new = [dict(row, long_name='new', standard_name='air') for row in self.rows[20:]]
+        self.write_catalog('run1', old)
+        self.write_catalog('run2', new)
+        json_files = [os.path.join(self.tmpdir.name, f'{name}.json') for name in ['run1', 'run2']]
+        out = os.path.join(self.tmpdir.name, 'out')
+        compact_catalogs(json_files, out, 'd1-posix', sort_by=['variable', 'start_time'], batch_size=4, run_size=7)
+
+        df = pd.read_csv(os.path.join(out, 'd1-posix.csv'), dtype=str, keep_default_na=False)
+        expected = pd.concat([pd.DataFrame.from_records(old), pd.DataFrame.from_records(new)])
+        expected = expected.drop_duplicates(['path', 'variable'], keep='last')
+        expected = expected.sort_values(['variable', 'start_time', 'path'], kind='stable')
+        self.assertEqual(list(df.columns), list(expected.columns))
+        self.assertEqual(list(df['path']), list(expected['path']))
+        self.assertEqual(list(df['long_name']), list(expected['long_name'].fillna('')))
+        self.assertEqual(len(df), 40)
+        self.assertEqual(os.listdir(out), ['d1-posix.csv', 'd1-posix.json'])
+
+    def test_compact_numeric_times(self):
+        # undecoded times are numbers, written as text cells in the csv files
+        times = [0, 120, 18, 6, 12]
+        rows = [{'path': f'/data/d1/file_{i}.nc', 'variable': 't2m', 'start_time': time}
+                for i, time in enumerate(times)]
+        self.write_catalog('run1', rows[:2])
+        self.write_catalog('run2', rows[2:] + [dict(rows[0], path='/data/d1/other.nc', start_time='')])
+        json_files = [os.path.join(self.tmpdir.name, f'{name}.json') for name in ['run1', 'run2']]
+        for run_size in [2, 10]:
+            compact_catalogs(json_files, self.tmpdir.name, 'd1-posix', sort_by=['start_time'],
+                             batch_size=2, run_size=run_size)
+            df = pd.read_csv(os.path.join(self.tmpdir.name, 'd1-posix.csv'), dtype=str, keep_default_na=False)
+            self.assertEqual(list(df['start_time']), ['0', '6', '12', '18', '120', ''])
+            self.assertEqual(list(df.columns), ['path', 'variable', 'start_time'])
+
+    def test_compact_parquet(self):
+        self.write_catalog('run1', self.rows[::-1], ParquetCatalogWriter)
+        self.write_catalog('run2', self.rows[:10], ParquetCatalogWriter)
+        json_files = [os.path.join(self.tmpdir.name, f'{name}.json') for name in ['run1', 'run2']]
+        compact_catalogs(json_files, self.tmpdir.name, 'd1-posix', sort_by=['start_time'],
+                         partition_by='variable', batch_size=8, run_size=9)
+        parquet_file = pq.ParquetFile(os.path.join(self.tmpdir.name, 'd1-posix.parquet'))
+        table = parquet_file.read()
+        self.assertEqual(table.schema.field('start_time').type, pa.timestamp('ns'))
+        self.assertEqual(table.column('variable').to_pylist(), ['q'] * 20 + ['t2m'] * 20)
+        self.assertEqual(table.column('path').to_pylist()[:20], self.assets)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import gzip
+import tempfile
+import unittest
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from modify_catalog import modify_catalog, modify_catalogs, compile_rules
+
+
+def make_catalog(nrows):
+    lines = ['path,variable,long_name\n']
+    for i in range(nrows):
+        lines.append(f'/glade/data/d1/file_{i}.nc,t2m,"/glade/data/, ""{i}""\nsecond line"\n')
+        lines.append(f'/glade/data/d10/file_{i}.nc,q,\n')
+    return ''.join(lines)
+
+
+class TestModifyCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.tmpdir.name, 'd1-posix.csv')
+        self.text = make_catalog(50)
+        with open(self.input_file, 'w') as fh:
+            fh.write(self.text)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def read(self, name):
+        with open(os.path.join(self.tmpdir.name, name)) as fh:
+            return fh.read()
+
+    def test_single_rule_same_as_replace(self):
+        output_file = os.path.join(self.tmpdir.name, 'out.csv')
+        report = modify_catalog(self.input_file, output_file, '/glade/data/', 'https://data.org/', block_size=64)
+        self.assertEqual(self.read('out.csv'), self.text.replace('/glade/data/', 'https://data.org/'))
+        self.assertEqual(report['bytes'], len(self.text))
+        self.assertEqual(report['replacements'], 150)
+
+    def test_rules_single_pass(self):
+        output_file = os.path.join(self.tmpdir.name, 'out.csv')
+        rules = [('/glade/data/', '/glade/data/archive/'), ('/glade/data/d10/', '/d10/'), ('t2m', 'tas')]
+        modify_catalog(self.input_file, output_file, rules=rules, block_size=100)
+        text = self.read('out.csv')
+        self.assertIn('/glade/data/archive/d1/file_3.nc,tas,"/glade/data/archive/, ""3""\n', text)
+        self.assertIn('/d10/file_3.nc,q,\n', text)
+        self.assertNotIn('archive/archive', text)
+        with self.assertRaises(ValueError):
+            compile_rules([('a\nb', 'c')])
+
+    def test_gzip_in_place(self):
+        gz_file = os.path.join(self.tmpdir.name, 'd1-posix.csv.gz')
+        with gzip.open(gz_file, 'wt') as fh:
+            fh.write(self.text)
+        modify_catalog(gz_file, gz_file, '/glade/data/', 's3://bucket/')
+        with gzip.open(gz_file, 'rt') as fh:
+            self.assertEqual(fh.read(), self.text.replace('/glade/data/', 's3://bucket/'))
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['d1-posix.csv', 'd1-posix.csv.gz'])
+
+    def test_directory(self):
+        for i in range(3):
+            with open(os.path.join(self.tmpdir.name, f'd{i}-posix.json'), 'w') as fh:
+                fh.write('{"catalog_file": "/glade/data/d1-posix.csv"}')
+        output_dir = os.path.join(self.tmpdir.name, 'out')
+        reports = modify_catalogs(self.tmpdir.name, output_dir, [('/glade/data/', '/new/')],
+                                  pattern='*.json', workers=2)
+        self.assertEqual([os.path.basename(report['output_file']) for report in reports],
+                         ['d0-posix.json', 'd1-posix.json', 'd2-posix.json'])
+        self.assertEqual(sorted(os.listdir(output_dir)), ['d0-posix.json', 'd1-posix.json', 'd2-posix.json'])
+        self.assertEqual(self.read('out/d2-posix.json'), '{"catalog_file": "/new/d1-posix.csv"}')
+
+    def test_missing_file(self):
+        output_file = os.path.join(self.tmpdir.name, 'out.csv')
+        self.assertIsNone(modify_catalog(output_file + '.missing', output_file, 'a', 'b'))
+        self.assertFalse(os.path.exists(output_file))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import time
+import tempfile
+import unittest
+import numpy as np
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from parse_cache import ParseCache, asset_fingerprint
+import create_catalog
+from test_file_parser import write_netcdf
+
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.asset = os.path.join(self.tmpdir.name, 'a.nc')
+        with open(self.asset, 'w') as fh:
+            fh.write('data')
+        self.cache_file = os.path.join(self.tmpdir.name, 'cache.sqlite')
+        self.items = [{'path': self.asset, 'variable': 't2m',
+                       'start_time': np.datetime64('2000-01-01T00:00:00.000000000')}]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_hit_after_put(self):
+        cache = ParseCache(self.cache_file, parsing_kwargs={'data_format': 'netcdf'})
+        fingerprint = cache.fingerprint(self.asset)
+        self.assertIsNone(cache.get(self.asset, fingerprint))
+        cache.put(self.asset, fingerprint, self.items)
+        cache.close()
+
+        cache = ParseCache(self.cache_file, parsing_kwargs={'data_format': 'netcdf'})
+        items = cache.get(self.asset, cache.fingerprint(self.asset))
+        cache.close()
+        self.assertEqual(items, self.items)
+        self.assertIsInstance(items[0]['start_time'], np.datetime64)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_changed_file_is_a_miss(self):
+        fingerprint = asset_fingerprint(self.asset)
+        time.sleep(0.01)
+        with open(self.asset, 'a') as fh:
+            fh.write('more data')
+        self.assertNotEqual(fingerprint, asset_fingerprint(self.asset))
+
+    def test_rebuild_and_options_mismatch(self):
+        cache = ParseCache(self.cache_file, parsing_kwargs={'data_format': 'netcdf'})
+        fingerprint = cache.fingerprint(self.asset)
+        cache.put(self.asset, fingerprint, self.items)
+        cache.close()
+
+        cache = ParseCache(self.cache_file, parsing_kwargs={'data_format': 'netcdf'}, rebuild=True)
+        self.assertIsNone(cache.get(self.asset, fingerprint))
+        cache.close()
+        cache = ParseCache(self.cache_file, parsing_kwargs={'data_format': 'netcdf', 'ignore_vars': ['x']})
+        self.assertIsNone(cache.get(self.asset, fingerprint))
+        cache.close()
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_parse_assets_streams_hits_and_misses_in_order(self):
+        assets = []
+        for i in range(4):
+            assets.append(os.path.join(self.tmpdir.name, f'data_{i}.nc'))
+            write_netcdf(assets[-1], time_units=f'hours since 200{i}-01-01', calendar='standard')
+        kwargs = {'data_format': 'netcdf'}
+        cache = ParseCache(self.cache_file, parsing_kwargs=kwargs)
+        expected = create_catalog.parse_assets(assets, kwargs, cache=cache)
+        cache.close()
+
+        time.sleep(0.01)
+        write_netcdf(assets[2], time_units='hours since 2002-01-01', calendar='standard')
+        cache = ParseCache(self.cache_file, parsing_kwargs=kwargs)
+        entries = create_catalog.iter_parsed_assets(assets, kwargs, cache=cache, workers=2)
+        self.assertEqual(list(entries), expected)
+        cache.close()
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import tempfile
+import unittest
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from parse_journal import ParseJournal
+from parse_cache import ParseCache
+import create_catalog
+from test_file_parser import write_netcdf
+
+
+class TestParseJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.journal_file = os.path.join(self.tmpdir.name, 'catalog.journal')
+        self.kwargs = {'data_format': 'netcdf'}
+        self.assets = []
+        for i in range(4):
+            self.assets.append(os.path.join(self.tmpdir.name, f'data_{i}.nc'))
+            write_netcdf(self.assets[-1], time_units=f'hours since 200{i}-01-01', calendar='standard')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_resume_after_failure(self):
+        expected = create_catalog.parse_assets(self.assets, self.kwargs)
+        good_asset = self.assets[2]
+        self.assets[2] = os.path.join(self.tmpdir.name, 'missing.nc')
+
+        journal = ParseJournal(self.journal_file, parsing_kwargs=self.kwargs)
+        entries = create_catalog.iter_parsed_assets(self.assets, self.kwargs, workers=2, journal=journal)
+        with self.assertRaises(FileNotFoundError):
+            list(entries)
+        journal.close()
+        self.assertEqual(journal.parsed, 2)
+
+        # the failed asset is parsed again, the others come from the journal
+        self.assets[2] = os.path.join(self.tmpdir.name, 'missing.nc')
+        os.rename(good_asset, self.assets[2])
+        expected[2] = create_catalog.parse_assets([self.assets[2]], self.kwargs)[0]
+        journal = ParseJournal(self.journal_file, parsing_kwargs=self.kwargs, resume=True)
+        cache = ParseCache(os.path.join(self.tmpdir.name, 'cache.sqlite'), parsing_kwargs=self.kwargs)
+        entries = create_catalog.iter_parsed_assets(self.assets, self.kwargs, cache=cache, journal=journal)
+        self.assertEqual(list(entries), expected)
+        cache.close()
+        journal.close()
+        self.assertEqual((journal.resumed, journal.parsed), (2, 2))
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_start_over_and_options_mismatch(self):
+        journal = ParseJournal(self.journal_file, parsing_kwargs=self.kwargs)
+        journal.put(self.assets[0], [{'path': self.assets[0]}])
+        journal.close()
+
+        journal = ParseJournal(self.journal_file, parsing_kwargs=self.kwargs)
+        self.assertFalse(journal.contains(self.assets[0]))
+        journal.put(self.assets[0], [{'path': self.assets[0]}])
+        journal.close()
+        with self.assertRaises(ValueError):
+            ParseJournal(self.journal_file, parsing_kwargs={'data_format': 'zarr'}, resume=True)
+        journal = ParseJournal(self.journal_file, parsing_kwargs=self.kwargs, resume=True)
+        self.assertTrue(journal.contains(self.assets[0]))
+        self.assertEqual(journal.load(self.assets[0]), [{'path': self.assets[0]}])
+        journal.close()
+
+if __name__ == '__main__':
+    unittest.main()
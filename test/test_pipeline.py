@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import time
+import threading
+import tempfile
+import unittest
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from pipeline import produce, unique, remote_row, RemoteCatalogWriter, tee_rows
+from catalog_writer import CatalogWriter
+from parse_cache import ParseCache
+import create_catalog
+from test_file_parser import write_netcdf
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_backpressure(self):
+        produced = []
+
+        def items():
+            for i in range(20):
+                produced.append(i)
+                yield i
+
+        consumed = []
+        for item in produce(items(), maxsize=3):
+            time.sleep(0.005)
+            consumed.append(item)
+            # the producer is at most the queue size (plus the item it holds) ahead
+            self.assertLessEqual(len(produced) - len(consumed), 4)
+        self.assertEqual(consumed, list(range(20)))
+
+    def test_errors(self):
+        def failing():
+            yield 1
+            raise ValueError('bad asset')
+
+        with self.assertRaisesRegex(ValueError, 'bad asset'):
+            list(produce(failing()))
+
+        # a consumer stopping early stops and closes the producer
+        closed = threading.Event()
+
+        def endless():
+            try:
+                while True:
+                    yield 1
+            finally:
+                closed.set()
+
+        stream = produce(endless(), maxsize=2)
+        next(stream)
+        stream.close()
+        self.assertTrue(closed.is_set())
+        self.assertEqual(list(unique(['b', 'a', 'b'])), ['b', 'a'])
+
+    def test_remote_writers(self):
+        rows = [
+            {'path': '/glade/d1/a.json', 'variable': 'q', 'aggregated_path': '/glade/d1/agg.json'},
+            {'path': '/glade/d1/b.json', 'variable': '/glade/d1'},
+        ]
+        self.assertEqual(
+            remote_row(rows[0], ['path', 'aggregated_path'], '/glade/', 'https://data/', '-remote-https'),
+            {'path': 'https://data/d1/a-remote-https.json', 'variable': 'q',
+             'aggregated_path': 'https://data/d1/agg-remote-https.json'}
+        )
+        remote_file = os.path.join(self.tmpdir.name, 'd1-https.csv')
+        remote_writer = RemoteCatalogWriter(CatalogWriter(remote_file), ['path'], '/glade/', 'https://data/')
+        self.assertEqual(list(tee_rows(rows, [remote_writer])), rows)
+        remote_writer.close()
+        with open(remote_file) as fh:
+            self.assertEqual(
+                fh.read(),
+                'path,variable,aggregated_path\n'
+                'https://data/d1/a.json,q,/glade/d1/agg.json\n'
+                'https://data/d1/b.json,/glade/d1,\n'
+            )
+
+    def test_streamed_parse(self):
+        assets = []
+        for i in range(5):
+            assets.append(os.path.join(self.tmpdir.name, f'data_{i}.nc'))
+            write_netcdf(assets[-1], time_units=f'hours since 200{i}-01-01', calendar='standard')
+        kwargs = {'data_format': 'netcdf'}
+        expected = create_catalog.parse_assets(assets, kwargs)
+
+        # cached and parsed assets, the parse stage runs in its own thread
+        cache = ParseCache(os.path.join(self.tmpdir.name, 'cache.sqlite'), parsing_kwargs=kwargs)
+        list(create_catalog.iter_parsed_assets(assets[:2], kwargs, cache=cache))
+        entries = produce(create_catalog.iter_parsed_assets(produce(iter(assets), maxsize=1), kwargs, cache=cache))
+        self.assertEqual(list(entries), expected)
+        self.assertEqual((cache.hits, cache.misses), (2, 5))
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import json
+import tempfile
+import unittest
+import pandas as pd
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from protocols import load_protocol_registry, get_remote_protocols
+from catalog_writer import CatalogWriter
+import create_catalog
+
+
+class TestProtocols(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_builtin_defaults(self):
+        registry = load_protocol_registry()
+        match_str, remote = get_remote_protocols(registry, 'zarr-boreas')
+        self.assertEqual(match_str, 'https://boreas.hpc.ucar.edu:6443/gdex-data/')
+        self.assertEqual([protocol for protocol, _, _ in remote], ['https', 'osdf'])
+        _, remote = get_remote_protocols(registry, 'zarr-boreas', ['s3'])
+        self.assertEqual(remote, [('s3', 's3://gdex-data/', None)])
+        with self.assertRaises(ValueError):
+            get_remote_protocols(registry, 'zarr-glade', ['s3'])
+        with self.assertRaises(ValueError):
+            get_remote_protocols(registry, 'unknown')
+
+    def test_config(self):
+        config = {
+            'reference': {'https': {'prefix': 'https://mirror.org/'}},
+            'campaign': {
+                'posix': {'prefix': '/campaign/'},
+                'web': {'prefix': 'https://web.org/', 'basename_suffix': '-web'},
+            },
+        }
+        config_file = os.path.join(self.tmpdir.name, 'protocols.json')
+        with open(config_file, 'w') as fh:
+            json.dump(config, fh)
+        registry = load_protocol_registry(config_file)
+        self.assertEqual(registry['reference']['https'],
+                         {'prefix': 'https://mirror.org/', 'basename_suffix': '-remote-https'})
+        self.assertEqual(get_remote_protocols(registry, 'campaign')[1], [('web', 'https://web.org/', '-web')])
+        with self.assertRaises(ValueError):
+            load_protocol_registry('{"campaign": {"web": {"prefix": "https://web.org/"}}}')
+
+    def test_make_remote_protocols(self):
+        rows = [{'path': f'/campaign/d1/file_{i}.nc', 'variable': 't2m'} for i in range(3)]
+        csv_file = os.path.join(self.tmpdir.name, 'd1-posix.csv')
+        writer = CatalogWriter(csv_file)
+        writer.write_rows(rows)
+        writer.close()
+        with open(os.path.join(self.tmpdir.name, 'd1-posix.json'), 'w') as fh:
+            fh.write('{"catalog_file": "d1-posix.csv"}')
+        config = {'campaign': {
+            'posix': {'prefix': '/campaign/'},
+            'https': {'prefix': 'https://web.org/'},
+            's3': {'prefix': 's3://bucket/'},
+            'osdf': {'prefix': 'osdf:///bucket/', 'basename_suffix': '-osdf'},
+        }}
+        create_catalog.make_remote_catalog(csv_file, catalog_data='campaign', protocol_config=config)
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), [
+            'd1-https.csv', 'd1-https.json', 'd1-osdf.csv', 'd1-osdf.json',
+            'd1-posix.csv', 'd1-posix.json', 'd1-s3.csv', 'd1-s3.json'
+        ])
+        df = pd.read_csv(os.path.join(self.tmpdir.name, 'd1-osdf.csv'))
+        self.assertEqual(df['path'][1], 'osdf:///bucket/d1/file_1-osdf.nc')
+        with open(os.path.join(self.tmpdir.name, 'd1-s3.json')) as fh:
+            self.assertEqual(json.load(fh)['catalog_file'], 'd1-s3.csv')
+
+    def test_make_remote_single_json(self):
+        json_file = os.path.join(self.tmpdir.name, 'd1-posix.json')
+        data = {'catalog_dict': [{'path': '/glade/campaign/collections/gdex/data/d1/f.zarr', 'variable': 't2m'}]}
+        with open(json_file, 'w') as fh:
+            json.dump(data, fh, indent=2)
+        create_catalog.make_remote_catalog(json_file, catalog_data='zarr-glade', output_format='single_json')
+        with open(os.path.join(self.tmpdir.name, 'd1-osdf.json')) as fh:
+            text = fh.read()
+        self.assertEqual(json.loads(text)['catalog_dict'][0]['path'], 'osdf:///ncar/gdex/d1/f.zarr')
+        self.assertEqual(text, json.dumps(json.loads(text)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import json
+import tempfile
+import unittest
+import fsspec
+from kerchunk.hdf import SingleHdf5ToZarr
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from read_cache import ReadCache, enable_read_cache, disable_read_cache
+import create_catalog
+from test_file_parser import write_netcdf
+
+
+class TestReadCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmpdir.name, 'cache')
+        # memory:// files stand in for a remote object store
+        self.fs = fsspec.filesystem('memory')
+        netcdf_file = os.path.join(self.tmpdir.name, 'data.nc')
+        write_netcdf(netcdf_file, time_units='hours since 2000-01-01', calendar='standard')
+        with open(netcdf_file, 'rb') as fh:
+            self.fs.pipe('/read_cache/data.nc', fh.read())
+        self.references = SingleHdf5ToZarr('memory://read_cache/data.nc', inline_threshold=0).translate()
+        self.asset = 'memory://read_cache/data.json'
+        self.fs.pipe('/read_cache/data.json', json.dumps(self.references).encode())
+        self.kwargs = {'data_format': 'reference', 'reader': 'native'}
+        self.addCleanup(disable_read_cache)
+
+    def tearDown(self):
+        self.fs.rm('/read_cache', recursive=True)
+        self.tmpdir.cleanup()
+
+    def parse(self):
+        """Parse the asset in a new build, returns the items and cache stats."""
+        cache = enable_read_cache(self.cache_dir)
+        items = create_catalog.file_parser(self.asset, **self.kwargs)
+        stats = cache.stats()
+        disable_read_cache()
+        return items, stats
+
+    def test_hits(self):
+        expected = create_catalog.file_parser(self.asset, **self.kwargs)
+        items, stats = self.parse()
+        self.assertEqual(items, expected)
+        self.assertGreater(stats['misses'], 0)
+
+        # the second build reads everything from the cache
+        reads = stats['hits'] + stats['misses']
+        items, stats = self.parse()
+        self.assertEqual(items, expected)
+        self.assertEqual((stats['hits'], stats['misses']), (reads, 0))
+
+    def test_invalidation(self):
+        _, first = self.parse()
+        # a changed reference file invalidates the reads of the asset
+        self.fs.pipe('/read_cache/data.json', json.dumps(self.references, indent=1).encode())
+        _, stats = self.parse()
+        self.assertEqual(stats['misses'], first['misses'])
+        self.assertEqual(stats['hits'], first['hits'])
+
+    def test_eviction(self):
+        for name in ['a', 'b', 'c']:
+            self.fs.pipe(f'/read_cache/{name}', name.encode() * 60)
+        cache = ReadCache(self.cache_dir, max_bytes=150)
+        cache.read(self.asset, 'memory://read_cache/a')
+        cache.read(self.asset, 'memory://read_cache/b')
+        # a is the most recently used read when c is added, b is evicted
+        cache.read(self.asset, 'memory://read_cache/a')
+        self.assertEqual(cache.read(self.asset, 'memory://read_cache/c'), b'c' * 60)
+        cache.read(self.asset, 'memory://read_cache/a')
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evicted']), (2, 3, 1))
+        self.assertEqual(stats['size'], 120)
+        # posix files are not cached
+        cache.read(self.asset, os.path.join(self.tmpdir.name, 'data.nc'), 0, 8)
+        self.assertEqual(cache.stats()['misses'], 3)
+        cache.close()
+
+    def test_needs_native_reader(self):
+        for reader in [{}, {'reader': 'xarray'}]:
+            with self.assertRaisesRegex(ValueError, '--reader native'):
+                create_catalog.create_catalog(
+                    [self.tmpdir.name], out=self.tmpdir.name, catalog_name='d1-posix',
+                    cache_dir=self.cache_dir, **reader
+                )
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+if __name__ == '__main__':
+    unittest.main()
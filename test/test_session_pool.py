@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import functools
+import tempfile
+import threading
+import unittest
+import xarray
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.join(os.path.abspath('..'),'generator'))
+from session_pool import enable_session_pool, disable_session_pool, get_session_pool, pooled_store
+import create_catalog
+from test_file_parser import write_netcdf
+
+
+class ZarrRequestHandler(SimpleHTTPRequestHandler):
+    """Serves the zarr stores with keep-alive, records the client port of every request."""
+    protocol_version = 'HTTP/1.1'
+
+    def __init__(self, *args, requests=None, **kwargs):
+        self.requests = requests
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        self.requests.append(self.client_address[1])
+
+
+class TestSessionPool(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.stores = []
+        for i in range(4):
+            netcdf_file = os.path.join(self.tmpdir.name, f'data_{i}.nc')
+            write_netcdf(netcdf_file, time_units=f'hours since 200{i}-01-01', calendar='standard')
+            self.stores.append(f'data_{i}.zarr')
+            with xarray.open_dataset(netcdf_file) as ds:
+                ds.to_zarr(os.path.join(self.tmpdir.name, self.stores[-1]), zarr_format=2, consolidated=True)
+        # local stand-in of the Boreas https endpoint
+        self.requests = []
+        handler = functools.partial(ZarrRequestHandler, directory=self.tmpdir.name, requests=self.requests)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.kwargs = {'data_format': 'zarr', 'zarr_format': 2}
+
+    def tearDown(self):
+        disable_session_pool()
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def expected(self, store, **kwargs):
+        items = create_catalog.file_parser(os.path.join(self.tmpdir.name, store), **self.kwargs, **kwargs)
+        return [dict(item, path=f'{self.url}/{store}') for item in items]
+
+    def test_shared_connections(self):
+        expected = [self.expected(store, reader='native') for store in self.stores]
+        pool = enable_session_pool(max_connections=2)
+        urls = [f'{self.url}/{store}' for store in self.stores]
+        entries = create_catalog.iter_parsed_assets(urls, dict(self.kwargs, reader='native'), workers=4)
+        self.assertEqual(list(entries), expected)
+        # the assets reuse at most max_connections kept-alive connections
+        self.assertLessEqual(len(set(self.requests)), 2)
+        self.assertGreater(len(self.requests), len(self.stores))
+        self.assertIs(pool.filesystem(urls[0]), pool.filesystem(urls[-1]))
+
+    def test_xarray_reader(self):
+        expected = self.expected(self.stores[0])
+        enable_session_pool(max_connections=1)
+        items = create_catalog.file_parser(f'{self.url}/{self.stores[0]}', **self.kwargs)
+        self.assertEqual(items, expected)
+        self.assertEqual(len(set(self.requests)), 1)
+
+    def test_disable(self):
+        enable_session_pool()
+        self.assertIsNotNone(pooled_store(f'{self.url}/{self.stores[0]}'))
+        self.assertIsNone(pooled_store(os.path.join(self.tmpdir.name, self.stores[0])))
+        disable_session_pool()
+        self.assertIsNone(get_session_pool())
+        self.assertIsNone(pooled_store(f'{self.url}/{self.stores[0]}'))
+
+if __name__ == '__main__':
+    unittest.main()